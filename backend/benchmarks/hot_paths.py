@@ -0,0 +1,282 @@
+"""
+Benchmarks of the schedule, timeline and serializer hot paths.
+
+Each dataset size gets a freshly generated database (in a temporary SQLite
+file) filled by equipment.load_data.generate_load_data(): milestone
+structures with four milestones, one project per 100 sales and the given
+number of equipment sales, with their payment ledger.
+Every benchmark runs --repeat times and reports min / median / mean
+seconds. Results are written as JSON (by default to
+benchmarks/results/<commit>.json) so two commits can be compared:
+
+    python benchmarks/hot_paths.py --sizes 1000,10000
+    python benchmarks/hot_paths.py --compare benchmarks/results/<old>.json
+
+With --compare, benchmarks slower than --threshold times the old median
+are listed and the exit status is 1.
+
+Usage (from the backend directory):
+    python benchmarks/hot_paths.py [--sizes 1000,10000,100000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+SALES_PER_PROJECT = 100
+STRUCTURES = 10
+# Sales passed to the per-sale benchmarks
+SAMPLE_SIZE = 100
+
+BENCHMARKS = []
+
+
+def benchmark(name, setup=None):
+    """Register a benchmark; setup(data) runs untimed before every repeat."""
+    def register(func):
+        BENCHMARKS.append((name, func, setup))
+        return func
+    return register
+
+
+def clear_payload_cache(data):
+    from milestone_backend import payload_cache
+    payload_cache.get_cache().clear()
+
+
+def warm_payload_cache(data):
+    clear_payload_cache(data)
+    data['client'].get('/api/equipment/sales/schedules/')
+    data['client'].get('/api/projects/timelines/')
+
+
+@benchmark('get_milestone_schedule')
+def bench_get_milestone_schedule(data):
+    for sale in data['sample_sales']:
+        sale.get_milestone_schedule()
+
+
+@benchmark('calculate_payment_schedule')
+def bench_calculate_payment_schedule(data):
+    from utils.calculations import calculate_payment_schedule
+
+    for sale in data['sample_sales']:
+        calculate_payment_schedule(sale.total_amount, data['milestones'], sale.project_start_date.isoformat())
+
+
+@benchmark('get_project_timeline')
+def bench_get_project_timeline(data):
+    from projects.models import Project
+
+    for project in Project.objects.with_timeline():
+        project.get_project_timeline()
+
+
+@benchmark('EquipmentSaleSerializer')
+def bench_equipment_sale_serializer(data):
+    from equipment.models import EquipmentSale
+    from equipment.serializers import EquipmentSaleSerializer
+
+    EquipmentSaleSerializer(EquipmentSale.objects.with_structure(), many=True).data
+
+
+@benchmark('ProjectTimelineSerializer')
+def bench_project_timeline_serializer(data):
+    from projects.models import Project
+    from projects.serializers import ProjectTimelineSerializer
+
+    ProjectTimelineSerializer(Project.objects.with_timeline(), many=True).data
+
+
+@benchmark('GET /api/equipment/sales/')
+def bench_sale_list(data):
+    get(data, '/api/equipment/sales/')
+
+
+@benchmark('GET /api/equipment/sales/schedules/ (cold)', setup=clear_payload_cache)
+def bench_schedules_cold(data):
+    get(data, '/api/equipment/sales/schedules/')
+
+
+@benchmark('GET /api/equipment/sales/schedules/ (warm)', setup=warm_payload_cache)
+def bench_schedules_warm(data):
+    get(data, '/api/equipment/sales/schedules/')
+
+
+@benchmark('GET /api/projects/timelines/ (cold)', setup=clear_payload_cache)
+def bench_timelines_cold(data):
+    get(data, '/api/projects/timelines/')
+
+
+@benchmark('GET /api/projects/timelines/ (warm)', setup=warm_payload_cache)
+def bench_timelines_warm(data):
+    get(data, '/api/projects/timelines/')
+
+
+def get(data, url):
+    response = data['client'].get(url)
+    if response.status_code != 200:
+        raise RuntimeError(f"GET {url} returned {response.status_code}")
+    return response.content
+
+
+def generate_data(size, seed=0):
+    """Create structures, projects and `size` sales with their ledger."""
+    from equipment.load_data import generate_load_data
+
+    generate_load_data(
+        structures=STRUCTURES,
+        projects=max(1, size // SALES_PER_PROJECT),
+        sales=size,
+        seed=seed,
+        prefix='Benchmark'
+    )
+
+
+def run_size(size, repeat, selected):
+    from django.core.management import call_command
+    from django.test import Client
+    from equipment.models import EquipmentSale
+
+    call_command('flush', interactive=False, verbosity=0)
+    clear_payload_cache(None)
+    started = time.perf_counter()
+    generate_data(size)
+    print(f"{size} sales generated in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    sample_sales = list(
+        EquipmentSale.objects.with_structure().filter(milestone_structure__isnull=False)[:SAMPLE_SIZE]
+    )
+    data = {
+        'client': Client(),
+        'sample_sales': sample_sales,
+        'milestones': [
+            {
+                'id': milestone.id,
+                'name': milestone.name,
+                'payment_percentage': milestone.payment_percentage,
+                'net_terms_days': milestone.net_terms_days,
+                'days_after_previous': milestone.days_after_previous,
+            }
+            for milestone in sample_sales[0].milestone_structure.milestones.all()
+        ],
+    }
+
+    results = []
+    for name, func, setup in BENCHMARKS:
+        if selected and not any(pattern in name for pattern in selected):
+            continue
+        timings = []
+        for _ in range(repeat):
+            if setup:
+                setup(data)
+            start = time.perf_counter()
+            func(data)
+            timings.append(time.perf_counter() - start)
+        result = {
+            'name': name,
+            'size': size,
+            'repeat': repeat,
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.fmean(timings),
+        }
+        results.append(result)
+        print(f"{name:<48}{size:>8}{result['median'] * 1000:>12.1f} ms", file=sys.stderr)
+    return results
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline_path, threshold):
+    """Print median ratios against a previous run; return the regressions."""
+    with open(baseline_path) as f:
+        baseline = {(r['name'], r['size']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\n{'benchmark':<48}{'size':>8}{'old ms':>10}{'new ms':>10}{'ratio':>8}")
+    for result in results:
+        old = baseline.get((result['name'], result['size']))
+        if old is None:
+            continue
+        ratio = result['median'] / old['median'] if old['median'] else float('inf')
+        flag = ' !' if ratio > threshold else ''
+        print(
+            f"{result['name']:<48}{result['size']:>8}"
+            f"{old['median'] * 1000:>10.1f}{result['median'] * 1000:>10.1f}{ratio:>8.2f}{flag}"
+        )
+        if ratio > threshold:
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000', help="Comma-separated numbers of sales")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument('--select', action='append', default=[], help="Only run benchmarks containing this text")
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="Earlier result file to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['DATABASE_PATH'] = str(Path(tmp.name) / 'benchmark.sqlite3')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'milestone_backend.settings')
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.test.utils import setup_test_environment
+
+    # Turns off DEBUG (no query logging) and allows the test client's host
+    setup_test_environment(debug=False)
+    call_command('migrate', verbosity=0)
+
+    results = []
+    for size in [int(size) for size in args.sizes.split(',')]:
+        results.extend(run_size(size, args.repeat, args.select))
+
+    commit = get_commit()
+    output = Path(args.output) if args.output else RESULTS_DIR / f'{commit}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database_profile': os.environ.get('DATABASE_PROFILE', 'default'),
+            'results': results,
+        }, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    tmp.cleanup()
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+"""
+HTTP load test replaying the frontend's API call patterns.
+
+Each scenario is one page load or edit in the Vue app and sends the same
+requests as the Pinia store actions it triggers, in parallel where the page
+does (Promise.all or un-awaited loads in onMounted):
+
+    dashboard      structures, sales and projects lists (Dashboard.vue)
+    equipment      the same three lists (EquipmentSaleForm.vue)
+    projects       projects list (Projects.vue)
+    milestones     structures list (MilestoneForm.vue)
+    project_chart  the three lists, then one project's timeline (GanttChart.vue)
+    sale_chart     the three lists, then one sale's schedule (GanttChart.vue)
+    edit_sale      PUT a sale, then reload the sales list (EquipmentSaleForm.vue)
+
+--users virtual users each run scenarios picked by weight (--mix) back to
+back for --duration seconds, over keep-alive connections like a browser
+tab. Latency percentiles and throughput are reported per endpoint.
+
+Without --url, a dataset is generated with generate_load_data into a
+temporary SQLite file and `manage.py runserver` is started on it (with the
+DATABASE_PROFILE / SERIALIZE_WRITES of the environment). Pass --url to
+test a server you started yourself, e.g. with production workers. The
+driver is a single asyncio process; when it is near 100% CPU, run it on
+another machine or lower --users.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --sales 10000 --users 20 --duration 60
+    python benchmarks/load_test.py --url http://localhost:8000 --mix dashboard=1,project_chart=3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIO_WEIGHTS = {
+    'dashboard': 25,
+    'equipment': 15,
+    'projects': 10,
+    'milestones': 10,
+    'project_chart': 20,
+    'sale_chart': 15,
+    'edit_sale': 5,
+}
+
+# Fields sent by EquipmentSaleForm.vue when a sale is saved
+SALE_FIELDS = ('name', 'vendor', 'sale_type', 'quantity', 'total_amount', 'project', 'project_start_date')
+
+# Browsers open at most 6 connections per host
+MAX_CONNECTIONS_PER_USER = 6
+
+
+class Connection:
+    """A minimal HTTP/1.1 keep-alive client connection."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        """Send a request; returns (status, body bytes)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        headers = [
+            f'{method} {path} HTTP/1.1',
+            f'Host: {self.host}:{self.port}',
+            'Accept: application/json',
+        ]
+        if body is not None:
+            headers += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+        self.writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode() + (body or b''))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Connection closed by server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in response_headers:
+            content = await self.reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            content = await self.read_chunked()
+        else:
+            content = await self.reader.read()
+            response_headers['connection'] = 'close'
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+        return status, content
+
+    async def read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readline()
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    """Latencies and errors per endpoint; recording starts after the warm-up."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.scenarios = defaultdict(int)
+        self.recording = False
+        self.started = None
+        self.stopped = None
+
+    def start(self):
+        self.recording = True
+        self.started = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.stopped = time.perf_counter()
+
+    def record(self, endpoint, seconds, ok):
+        if not self.recording:
+            return
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self):
+        duration = self.stopped - self.started
+        rows = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(latencies),
+                'errors': self.errors[endpoint],
+                'requests_per_second': len(latencies) / duration,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'max_ms': latencies[-1] * 1000,
+            })
+        return {
+            'duration': duration,
+            'requests': sum(row['requests'] for row in rows),
+            'errors': sum(row['errors'] for row in rows),
+            'scenarios': dict(self.scenarios),
+            'endpoints': rows,
+        }
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+
+class User:
+    """One virtual user (browser tab) with its own connections."""
+
+    def __init__(self, host, port, stats, dataset, rng):
+        self.host = host
+        self.port = port
+        self.stats = stats
+        self.dataset = dataset
+        self.rng = rng
+        self.idle = []
+
+    async def request(self, method, path, endpoint, body=None):
+        connection = self.idle.pop() if self.idle else Connection(self.host, self.port)
+        start = time.perf_counter()
+        try:
+            status, content = await connection.request(method, path, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            connection.close()
+            self.stats.record(endpoint, time.perf_counter() - start, False)
+            return None
+        self.stats.record(endpoint, time.perf_counter() - start, status < 400)
+        if len(self.idle) < MAX_CONNECTIONS_PER_USER:
+            self.idle.append(connection)
+        else:
+            connection.close()
+        return content
+
+    def get(self, path, endpoint=None):
+        return self.request('GET', path, endpoint or f'GET {path}')
+
+    async def load_lists(self):
+        await asyncio.gather(
+            self.get('/api/milestones/structures/'),
+            self.get('/api/equipment/sales/'),
+            self.get('/api/projects/'),
+        )
+
+    async def dashboard(self):
+        await self.load_lists()
+
+    async def equipment(self):
+        await self.load_lists()
+
+    async def projects(self):
+        await self.get('/api/projects/')
+
+    async def milestones(self):
+        await self.get('/api/milestones/structures/')
+
+    async def project_chart(self):
+        await self.load_lists()
+        if self.dataset['projects']:
+            project_id = self.rng.choice(self.dataset['projects'])
+            await self.get(f'/api/projects/{project_id}/timeline/', 'GET /api/projects/{id}/timeline/')
+
+    async def sale_chart(self):
+        await self.load_lists()
+        if self.dataset['sales']:
+            sale = self.rng.choice(self.dataset['sales'])
+            await self.get(f"/api/equipment/sales/{sale['id']}/schedule/", 'GET /api/equipment/sales/{id}/schedule/')
+
+    async def edit_sale(self):
+        if not self.dataset['sales']:
+            return
+        sale = self.rng.choice(self.dataset['sales'])
+        data = {field: sale[field] for field in SALE_FIELDS}
+        data['quantity'] = self.rng.randint(1, 100)
+        data['milestone_structure_id'] = (sale.get('milestone_structure') or {}).get('id')
+        await self.request(
+            'PUT', f"/api/equipment/sales/{sale['id']}/", 'PUT /api/equipment/sales/{id}/',
+            json.dumps(data).encode()
+        )
+        await self.get('/api/equipment/sales/')
+
+    async def run(self, scenarios, weights, deadline, think_time):
+        while time.perf_counter() < deadline:
+            scenario = self.rng.choices(scenarios, weights)[0]
+            await getattr(self, scenario)()
+            if self.stats.recording:
+                self.stats.scenarios[scenario] += 1
+            if think_time:
+                await asyncio.sleep(self.rng.expovariate(1 / think_time))
+        for connection in self.idle:
+            connection.close()
+
+
+async def load_dataset(host, port):
+    """Fetch the sale and project ids the chart and edit scenarios pick from."""
+    connection = Connection(host, port)
+    try:
+        status, sales = await connection.request('GET', '/api/equipment/sales/')
+        status, projects = await connection.request('GET', '/api/projects/')
+    finally:
+        connection.close()
+    return {
+        'sales': json.loads(sales),
+        'projects': [project['id'] for project in json.loads(projects)],
+    }
+
+
+async def run_load(host, port, args, mix):
+    stats = Stats()
+    dataset = await load_dataset(host, port)
+    rng = random.Random(args.seed)
+    scenarios = list(mix)
+    weights = [mix[scenario] for scenario in scenarios]
+
+    deadline = time.perf_counter() + args.warmup + args.duration
+    users = [
+        User(host, port, stats, dataset, random.Random(rng.random())).run(scenarios, weights, deadline, args.think_time)
+        for _ in range(args.users)
+    ]
+    tasks = asyncio.gather(*users)
+    await asyncio.sleep(args.warmup)
+    stats.start()
+    await tasks
+    stats.stop()
+    return stats.summary()
+
+
+def parse_mix(value):
+    """Parse 'dashboard=3,project_chart=1' into scenario weights."""
+    if not value:
+        return dict(SCENARIO_WEIGHTS)
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIO_WEIGHTS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIO_WEIGHTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def manage(*args, env):
+    subprocess.run([sys.executable, 'manage.py', *args], cwd=BACKEND_DIR, env=env, check=True)
+
+
+def start_server(tmp, args):
+    """Generate a dataset in a temporary database and start runserver on it."""
+    env = {**os.environ, 'DATABASE_PATH': str(Path(tmp) / 'load_test.sqlite3')}
+    manage('migrate', '--verbosity', '0', env=env)
+    manage(
+        'generate_load_data',
+        '--structures', str(args.structures),
+        '--projects', str(max(1, args.sales // 100)),
+        '--sales', str(args.sales),
+        '--seed', str(args.seed),
+        env=env
+    )
+    port = get_free_port()
+    server = subprocess.Popen(
+        [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("runserver exited during startup")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("runserver did not start within 30s")
+
+
+def print_summary(summary, users):
+    print(
+        f"\n{summary['requests']} requests, {summary['errors']} errors in {summary['duration']:.1f}s "
+        f"({summary['requests'] / summary['duration']:.1f} req/s, {users} users)"
+    )
+    print(f"{'endpoint':<44}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for row in summary['endpoints']:
+        print(
+            f"{row['endpoint']:<44}{row['requests']:>10}{row['errors']:>8}{row['requests_per_second']:>9.1f}"
+            f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}"
+        )
+    print("\nscenarios: " + ', '.join(f"{name} {count}" for name, count in sorted(summary['scenarios'].items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Server to test (default: start runserver on a generated dataset)")
+    parser.add_argument('--users', type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument('--duration', type=float, default=30, help="Measured seconds")
+    parser.add_argument('--warmup', type=float, default=3, help="Seconds run before measuring")
+    parser.add_argument('--think-time', type=float, default=0, help="Mean pause between a user's scenarios")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(''), help="Scenario weights, e.g. dashboard=3,sale_chart=1")
+    parser.add_argument('--sales', type=int, default=2000, help="Sales in the generated dataset")
+    parser.add_argument('--structures', type=int, default=20, help="Milestone structures in the generated dataset")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the dataset and the users")
+    parser.add_argument('--output', help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    server = None
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        if args.url:
+            url = args.url
+        else:
+            server, url = start_server(tmp.name, args)
+        parts = urlsplit(url)
+        summary = asyncio.run(run_load(parts.hostname, parts.port or 80, args, args.mix))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        tmp.cleanup()
+
+    print_summary(summary, args.users)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': url, 'users': args.users, 'mix': args.mix, **summary}, f, indent=2)
+    if summary['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
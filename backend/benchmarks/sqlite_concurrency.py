@@ -0,0 +1,120 @@
+"""
+Concurrency benchmark for the SQLite database profiles.
+
+Each configuration runs in its own process against a fresh database file.
+Worker threads send a mix of equipment sale creates and list reads through
+the full Django request stack (middleware included), like a threaded WSGI
+server would. The benchmark reports throughput and the number of requests
+that failed with "database is locked" or an error status.
+
+Usage (from the backend directory):
+    python benchmarks/sqlite_concurrency.py --threads 8 --requests 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+CONFIGURATIONS = {
+    'default': {'DATABASE_PROFILE': 'default'},
+    'production': {'DATABASE_PROFILE': 'production'},
+    'production+serialized': {'DATABASE_PROFILE': 'production', 'SERIALIZE_WRITES': '1'},
+}
+
+
+def run_worker(threads, requests, write_ratio):
+    """Run the workload with the settings given by the environment; print JSON."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'milestone_backend.settings')
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import OperationalError, connection
+    from django.test import Client
+
+    call_command('migrate', verbosity=0)
+    connection.close()
+
+    errors = []
+    failures = []
+    barrier = threading.Barrier(threads + 1)
+
+    def work(worker):
+        client = Client(SERVER_NAME='localhost')
+        barrier.wait()
+        for i in range(requests):
+            try:
+                if (i % 100) < write_ratio * 100:
+                    response = client.post('/api/equipment/sales/', {
+                        'name': f'Sale {worker}-{i}',
+                        'quantity': 1,
+                        'total_amount': '1000.00',
+                        'project_start_date': '2024-01-01',
+                    }, content_type='application/json')
+                else:
+                    response = client.get('/api/equipment/sales/', {'page_size': 20})
+            except OperationalError:
+                errors.append(i)
+                continue
+            if response.status_code >= 400:
+                failures.append(response.status_code)
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+
+    total = threads * requests
+    print(json.dumps({
+        'requests': total,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(total / elapsed, 1),
+        'locked_errors': len(errors),
+        'failed': len(failures),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8, help="Concurrent worker threads")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per thread")
+    parser.add_argument('--write-ratio', type=float, default=0.5, help="Share of requests that write")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.threads, args.requests, args.write_ratio)
+        return
+
+    print(f"{'configuration':<24}{'req/s':>10}{'seconds':>10}{'locked':>8}{'failed':>8}")
+    for name, env in CONFIGURATIONS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            result = subprocess.run(
+                [sys.executable, __file__, '--worker',
+                 '--threads', str(args.threads),
+                 '--requests', str(args.requests),
+                 '--write-ratio', str(args.write_ratio)],
+                env={**os.environ, **env, 'DATABASE_PATH': str(Path(tmp) / 'bench.sqlite3')},
+                capture_output=True, text=True, check=True,
+            )
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{name:<24}{stats['requests_per_second']:>10}{stats['seconds']:>10}{stats['locked_errors']:>8}{stats['failed']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Bulk persistence of equipment sales.
+
+bulk_create() and bulk_update() bypass model signals, so save_sales()
+performs their side effects itself: the payment ledger is synced for sales
+whose schedule changed, and cached payloads of the sales and their projects
+are dropped.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from .ledger import DEFAULT_CHUNK_SIZE, sync_sale_schedules
+from .models import EquipmentSale
+from .signals import invalidate_sale_payloads
+
+
+def save_sales(new_sales=(), changed_sales=(), update_fields=(), batch_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert and update many sales inside one transaction.
+
+    Args:
+        new_sales: Unsaved EquipmentSale instances to insert
+        changed_sales: Loaded EquipmentSale instances with modified attributes
+        update_fields: Names of the fields modified on changed_sales
+        batch_size: Rows per INSERT / UPDATE statement
+    """
+    new_sales = list(new_sales)
+    changed_sales = list(changed_sales)
+
+    with transaction.atomic():
+        if new_sales:
+            EquipmentSale.objects.bulk_create(new_sales, batch_size=batch_size)
+        if changed_sales:
+            # auto_now is not applied by bulk_update()
+            now = timezone.now()
+            for sale in changed_sales:
+                sale.updated_at = now
+            EquipmentSale.objects.bulk_update(
+                changed_sales,
+                sorted({*update_fields, 'updated_at'}),
+                batch_size=batch_size
+            )
+
+        sales = new_sales + changed_sales
+        sync_sale_schedules([sale for sale in sales if sale.schedule_changed()])
+        invalidate_sale_payloads(
+            [sale.pk for sale in sales],
+            [sale.project_id for sale in sales]
+            + [getattr(sale, '_loaded_project_id', None) for sale in changed_sales]
+        )
+
+    for sale in sales:
+        sale._loaded_project_id = sale.project_id
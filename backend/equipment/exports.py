@@ -0,0 +1,156 @@
+"""
+Flat exports of the payment ledger.
+
+Rows are read from PaymentScheduleEntry with a chunked values_list()
+iterator and written out chunk by chunk, so memory use does not depend on
+the number of payments exported. CSV is streamed over HTTP; Arrow IPC and
+Parquet files (for pandas / polars) are written by the
+export_payment_ledger command and need the optional pyarrow package.
+"""
+
+import csv
+import io
+
+from django.http import StreamingHttpResponse
+from .models import PaymentScheduleEntry
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (column name, PaymentScheduleEntry lookup)
+SCHEDULE_EXPORT_COLUMNS = (
+    ('sale_id', 'sale_id'),
+    ('sale_name', 'sale__name'),
+    ('project_id', 'sale__project_id'),
+    ('project_name', 'sale__project__name'),
+    ('vendor', 'sale__vendor'),
+    ('sale_type', 'sale_type'),
+    ('milestone_id', 'milestone_id'),
+    ('milestone_name', 'milestone__name'),
+    ('milestone_order', 'order'),
+    ('payment_percentage', 'milestone__payment_percentage'),
+    ('payment_amount', 'payment_amount'),
+    ('start_days', 'start_days'),
+    ('end_days', 'end_days'),
+    ('due_date', 'due_date'),
+    ('payment_due_date', 'payment_due_date'),
+    ('net_terms_days', 'milestone__net_terms_days'),
+)
+
+
+def iter_schedule_rows(entries=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield one tuple per payment, in SCHEDULE_EXPORT_COLUMNS order.
+    Entries are ordered by sale and milestone order, which the
+    (sale, order) unique index serves without a sort.
+    """
+    if entries is None:
+        entries = PaymentScheduleEntry.objects.all()
+    lookups = [lookup for _, lookup in SCHEDULE_EXPORT_COLUMNS]
+    return entries.order_by('sale_id', 'order').values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def iter_schedule_csv(entries=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the payment schedule as CSV text, one chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column for column, _ in SCHEDULE_EXPORT_COLUMNS])
+
+    for count, row in enumerate(iter_schedule_rows(entries, chunk_size), start=1):
+        writer.writerow(row)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def schedule_csv_response(entries=None, filename='payment-schedule.csv'):
+    """StreamingHttpResponse with the payment schedule of the given entries as CSV."""
+    response = StreamingHttpResponse(iter_schedule_csv(entries), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+LEDGER_FILE_FORMATS = ('parquet', 'arrow')
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImportError("Arrow and Parquet exports require pyarrow (pip install pyarrow)") from exc
+    return pyarrow
+
+
+def get_ledger_schema():
+    """Arrow schema of the exported ledger, in SCHEDULE_EXPORT_COLUMNS order."""
+    pa = _import_pyarrow()
+    types = {
+        'sale_id': pa.int64(),
+        'sale_name': pa.string(),
+        'project_id': pa.int64(),
+        'project_name': pa.string(),
+        'vendor': pa.string(),
+        'sale_type': pa.string(),
+        'milestone_id': pa.int64(),
+        'milestone_name': pa.string(),
+        'milestone_order': pa.int32(),
+        'payment_percentage': pa.decimal128(5, 2),
+        'payment_amount': pa.decimal128(18, 6),
+        'start_days': pa.int32(),
+        'end_days': pa.int32(),
+        'due_date': pa.date32(),
+        'payment_due_date': pa.date32(),
+        'net_terms_days': pa.int32(),
+    }
+    return pa.schema([(column, types[column]) for column, _ in SCHEDULE_EXPORT_COLUMNS])
+
+
+def iter_ledger_record_batches(entries=None, batch_size=EXPORT_CHUNK_SIZE):
+    """Yield the ledger as Arrow record batches of up to batch_size rows."""
+    pa = _import_pyarrow()
+    schema = get_ledger_schema()
+
+    def make_batch(rows):
+        columns = zip(*rows)
+        return pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+            schema=schema
+        )
+
+    rows = []
+    for row in iter_schedule_rows(entries, batch_size):
+        rows.append(row)
+        if len(rows) >= batch_size:
+            yield make_batch(rows)
+            rows = []
+    if rows:
+        yield make_batch(rows)
+
+
+def write_ledger_file(path, file_format='parquet', entries=None, batch_size=EXPORT_CHUNK_SIZE):
+    """
+    Write the ledger to an Arrow IPC ('arrow', memory-mappable with
+    pyarrow.ipc / polars.read_ipc) or Parquet file, one record batch at a time.
+
+    Returns:
+        Number of rows written
+    """
+    pa = _import_pyarrow()
+    schema = get_ledger_schema()
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(path, schema)
+    elif file_format == 'arrow':
+        writer = pa.ipc.new_file(path, schema)
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    count = 0
+    with writer:
+        for batch in iter_ledger_record_batches(entries, batch_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
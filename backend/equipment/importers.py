@@ -0,0 +1,205 @@
+"""
+Streaming import of equipment sales from CSV or JSON Lines.
+
+Rows are parsed one at a time and inserted in fixed-size chunks with
+bulk_create (see bulk.save_sales()), so memory stays bounded by the chunk
+size however large the file is. Invalid rows are collected as errors and
+skipped instead of aborting the import. Each chunk commits on its own.
+
+Columns (CSV header or JSON keys): name, quantity, total_amount and
+project_start_date (YYYY-MM-DD) are required; vendor, sale_type,
+milestone_structure_id and project are optional.
+"""
+
+import csv
+import json
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from milestones.models import PaymentMilestoneStructure
+from projects.models import Project
+from utils.validators import validate_equipment_sale_data
+from .bulk import save_sales
+from .ledger import DEFAULT_CHUNK_SIZE
+from .models import EquipmentSale
+
+
+FILE_FORMATS = ('csv', 'jsonl')
+
+REQUIRED_COLUMNS = ('name', 'quantity', 'total_amount', 'project_start_date')
+
+# EquipmentSale.total_amount has max_digits=12, decimal_places=2
+MAX_TOTAL_AMOUNT = Decimal('1e10')
+
+# Errors kept in the result; further ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+
+class SaleImportError(ValueError):
+    """Raised when a file cannot be imported at all (e.g. missing columns)."""
+
+
+@dataclass
+class SaleImportResult:
+    created: int = 0
+    error_count: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+
+def get_file_format(filename):
+    """Guess the file format from a file name; returns None if unknown."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return None
+
+
+def iter_rows(stream, file_format):
+    """
+    Yield (line number, row dict) pairs from a text stream.
+    Rows that cannot be decoded are yielded as (line number, None).
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise SaleImportError(f"Missing columns: {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise SaleImportError(f"Unsupported format: {file_format}")
+
+
+def _optional_id(value):
+    if value is None or value == '':
+        return None
+    return int(value)
+
+
+def parse_row(row):
+    """
+    Convert one raw row into EquipmentSale field values.
+
+    Returns:
+        Tuple of (attrs, error_message); attrs is None when the row is invalid
+    """
+    missing = [column for column in REQUIRED_COLUMNS if row.get(column) in (None, '')]
+    if missing:
+        return None, f"Missing values: {', '.join(missing)}"
+
+    try:
+        quantity = int(row['quantity'])
+    except (TypeError, ValueError):
+        return None, "Quantity must be an integer"
+    if isinstance(row['quantity'], float) and not row['quantity'].is_integer():
+        return None, "Quantity must be an integer"
+    try:
+        total_amount = Decimal(str(row['total_amount']).strip())
+    except InvalidOperation:
+        return None, "Total amount must be a number"
+    if not total_amount.is_finite() or total_amount.as_tuple().exponent < -2:
+        return None, "Total amount must have at most 2 decimal places"
+    if total_amount >= MAX_TOTAL_AMOUNT:
+        return None, "Total amount is too large"
+    try:
+        project_start_date = date.fromisoformat(str(row['project_start_date']).strip())
+    except ValueError:
+        return None, "Project start date must be in YYYY-MM-DD format"
+    try:
+        milestone_structure_id = _optional_id(row.get('milestone_structure_id'))
+        project_id = _optional_id(row.get('project'))
+    except (TypeError, ValueError):
+        return None, "Milestone structure and project must be ids"
+
+    name = str(row['name']).strip()
+    vendor = str(row.get('vendor') or '').strip()
+    is_valid, error_message = validate_equipment_sale_data(name, quantity, total_amount, vendor)
+    if not is_valid:
+        return None, error_message
+
+    sale_type = row.get('sale_type') or 'vendor'
+    if sale_type not in dict(EquipmentSale.SALE_TYPE_CHOICES):
+        return None, f"Invalid sale type: {sale_type}"
+
+    return {
+        'name': name,
+        'vendor': vendor,
+        'sale_type': sale_type,
+        'quantity': quantity,
+        'total_amount': total_amount,
+        'project_start_date': project_start_date,
+        'milestone_structure_id': milestone_structure_id,
+        'project_id': project_id,
+    }, None
+
+
+def import_sales(stream, file_format, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import equipment sales from a text stream.
+
+    Args:
+        stream: Text file object (CSV with a header row, or JSON Lines)
+        file_format: 'csv' or 'jsonl'
+        chunk_size: Rows validated and inserted per batch
+
+    Returns:
+        SaleImportResult with the number of sales created and per-line errors
+    """
+    result = SaleImportResult()
+    chunk = []
+    for line_number, row in iter_rows(stream, file_format):
+        if row is None:
+            result.add_error(line_number, "Invalid JSON object")
+            continue
+        attrs, error_message = parse_row(row)
+        if error_message:
+            result.add_error(line_number, error_message)
+            continue
+        chunk.append((line_number, attrs))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, result)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, result)
+    return result
+
+
+def _import_chunk(chunk, result):
+    """Check a chunk's references with one IN query each, then bulk insert it."""
+    structure_ids = {attrs['milestone_structure_id'] for _, attrs in chunk} - {None}
+    project_ids = {attrs['project_id'] for _, attrs in chunk} - {None}
+    structures = set(
+        PaymentMilestoneStructure.objects.filter(id__in=structure_ids).values_list('id', flat=True)
+    ) if structure_ids else set()
+    projects = set(
+        Project.objects.filter(id__in=project_ids).values_list('id', flat=True)
+    ) if project_ids else set()
+
+    sales = []
+    for line_number, attrs in chunk:
+        if attrs['milestone_structure_id'] is not None and attrs['milestone_structure_id'] not in structures:
+            result.add_error(line_number, "Milestone structure does not exist")
+        elif attrs['project_id'] is not None and attrs['project_id'] not in projects:
+            result.add_error(line_number, "Project does not exist")
+        else:
+            sales.append(EquipmentSale(**attrs))
+
+    save_sales(sales)
+    result.created += len(sales)
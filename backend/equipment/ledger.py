@@ -0,0 +1,179 @@
+"""
+Maintenance of the materialized payment ledger (PaymentScheduleEntry).
+
+Entries are rebuilt per sale whenever a sale's schedule-relevant fields
+change and per structure whenever its milestones change, using the batch
+schedule engine. Readers can then fetch schedules with indexed queries.
+"""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncQuarter, TruncWeek
+from milestones.compiled import get_compiled_structures
+from utils.calculations import calculate_payment_schedules_batch
+from .models import EquipmentSale, PaymentScheduleEntry
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+CASH_FLOW_GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'quarter': TruncQuarter,
+}
+
+
+def build_schedule_entries(sales):
+    """
+    Build unsaved PaymentScheduleEntry objects for the given sales.
+    Sales sharing a structure are computed together in one vectorized pass.
+    """
+    sales_by_structure = {}
+    for sale in sales:
+        if sale.milestone_structure_id is not None:
+            sales_by_structure.setdefault(sale.milestone_structure_id, []).append(sale)
+
+    compiled_structures = get_compiled_structures(sales_by_structure)
+    entries = []
+
+    for structure_id, structure_sales in sales_by_structure.items():
+        compiled = compiled_structures[structure_id]
+        if not len(compiled):
+            continue
+
+        batch = calculate_payment_schedules_batch(
+            total_amounts=[sale.total_amount for sale in structure_sales],
+            start_dates=[sale.project_start_date for sale in structure_sales],
+            days_after_previous=compiled.days_after_previous,
+            payment_percentages=compiled.payment_percentages,
+            net_terms_days=compiled.net_terms_days,
+            business_calendar=compiled.business_calendar,
+        )
+        start_days = batch['start_days'].tolist()
+        end_days = batch['end_days'].tolist()
+        due_dates = batch['due_dates'].tolist()
+        payment_due_dates = batch['payment_due_dates'].tolist()
+        amount_units = batch['payment_amount_units'].tolist()
+
+        for row, sale in enumerate(structure_sales):
+            for col, milestone_id in enumerate(compiled.ids):
+                entries.append(PaymentScheduleEntry(
+                    sale_id=sale.id,
+                    milestone_id=milestone_id,
+                    order=col,
+                    start_days=start_days[row][col],
+                    end_days=end_days[row][col],
+                    due_date=due_dates[row][col],
+                    payment_due_date=payment_due_dates[row][col],
+                    payment_amount=Decimal(amount_units[row][col]).scaleb(-6),
+                    sale_type=sale.sale_type,
+                ))
+
+    return entries
+
+
+def sync_sale_schedules(sales):
+    """
+    Replace the ledger entries of the given sales with freshly computed ones.
+    """
+    sales = list(sales)
+    if not sales:
+        return
+
+    entries = build_schedule_entries(sales)
+    with transaction.atomic():
+        PaymentScheduleEntry.objects.filter(sale_id__in=[sale.id for sale in sales]).delete()
+        PaymentScheduleEntry.objects.bulk_create(entries, batch_size=DEFAULT_CHUNK_SIZE)
+
+    for sale in sales:
+        sale._loaded_schedule_values = sale.get_schedule_values()
+
+
+def sync_structure_schedules(structure_id, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild the ledger entries of every sale using a milestone structure.
+    """
+    sales = EquipmentSale.objects.filter(milestone_structure_id=structure_id).order_by('pk')
+    with transaction.atomic():
+        _sync_in_chunks(sales, chunk_size)
+
+
+def rebuild_schedule_ledger(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rebuild the whole ledger from scratch.
+    Returns the number of entries written.
+    """
+    with transaction.atomic():
+        PaymentScheduleEntry.objects.all().delete()
+        _sync_in_chunks(EquipmentSale.objects.order_by('pk'), chunk_size)
+        return PaymentScheduleEntry.objects.count()
+
+
+def _sync_in_chunks(sales, chunk_size):
+    chunk = []
+    for sale in sales.iterator(chunk_size=chunk_size):
+        chunk.append(sale)
+        if len(chunk) >= chunk_size:
+            sync_sale_schedules(chunk)
+            chunk = []
+    sync_sale_schedules(chunk)
+
+
+def get_ledger_schedules(entries):
+    """
+    Group ledger entries into schedules keyed by sale id.
+    Accepts a PaymentScheduleEntry queryset (e.g. filtered by sale or
+    project) and returns lists in the format of get_milestone_schedule().
+    """
+    schedules = {}
+    for entry in entries.select_related('milestone').order_by('sale_id', 'order'):
+        schedules.setdefault(entry.sale_id, []).append(entry.to_schedule_row())
+    return schedules
+
+
+def get_cash_flow(entries, granularity='month'):
+    """
+    Bucket ledger entries by payment due date.
+    Grouping and summing happen in the database; one row comes back per
+    period and sale type. Vendor sales are outflows, customer sales inflows.
+    Returns a list of buckets ordered by period, each with inflow, outflow,
+    net, running cumulative net and the number of payments.
+    """
+    trunc = CASH_FLOW_GRANULARITIES[granularity]
+    rows = entries.annotate(
+        period=trunc('payment_due_date')
+    ).values('period', 'sale_type').annotate(
+        total=Sum('payment_amount'),
+        payments=Count('id'),
+    ).order_by('period', 'sale_type')
+
+    buckets = []
+    for row in rows:
+        if not buckets or buckets[-1]['period'] != row['period']:
+            buckets.append({
+                'period': row['period'],
+                'inflow': Decimal('0'),
+                'outflow': Decimal('0'),
+                'payments': 0,
+            })
+        bucket = buckets[-1]
+        key = 'inflow' if row['sale_type'] == 'customer' else 'outflow'
+        bucket[key] += row['total']
+        bucket['payments'] += row['payments']
+
+    cumulative_net = Decimal('0')
+    for bucket in buckets:
+        net = bucket['inflow'] - bucket['outflow']
+        cumulative_net += net
+        bucket.update({
+            'period': bucket['period'].isoformat(),
+            'inflow': float(bucket['inflow']),
+            'outflow': float(bucket['outflow']),
+            'net': float(net),
+            'cumulative_net': float(cumulative_net),
+        })
+
+    return buckets
@@ -0,0 +1,206 @@
+"""
+Synthetic data for benchmarks and query-plan work.
+
+generate_load_data() creates milestone structures, projects and equipment
+sales (with their payment ledger) using bulk_create in fixed-size chunks.
+Milestones, by far the largest table, are written with a plain
+executemany() instead: they have no signals or defaults to apply, and
+Django's per-value INSERT compilation costs several times more than SQLite
+itself.
+Values are drawn from a seeded random generator, so the same arguments
+always produce the same dataset. Distributions are skewed the way real
+data is: a few structures, projects and vendors account for most sales,
+amounts are log-normal and most sales are vendor sales.
+"""
+
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.db import connection, transaction
+from milestones.compiled import invalidate_compiled_structure
+from milestones.models import PaymentMilestone, PaymentMilestoneStructure
+from projects.models import Project
+from .bulk import save_sales
+from .ledger import DEFAULT_CHUNK_SIZE
+from .models import EquipmentSale
+
+
+FIRST_START_DATE = date(2023, 1, 1)
+START_DATE_SPAN_DAYS = 3 * 365
+
+DAYS_AFTER_PREVIOUS_CHOICES = ([15, 30, 45, 60, 90, 180], [2, 5, 3, 4, 2, 1])
+NET_TERMS_CHOICES = ([0, 15, 30, 45, 60, 90], [2, 2, 6, 2, 2, 1])
+
+# Share of sales with a project / a milestone structure / sale type 'customer'
+PROJECT_SHARE = 0.8
+STRUCTURE_SHARE = 0.9
+CUSTOMER_SHARE = 0.3
+
+VENDORS = 200
+MAX_TOTAL_AMOUNT = Decimal('999999999.99')
+
+
+@dataclass
+class LoadDataResult:
+    structures: int = 0
+    milestones: int = 0
+    projects: int = 0
+    sales: int = 0
+    schedule_entries: int = 0
+
+
+def get_percentages(rng, count):
+    """Split 100% into `count` random percentages with 2 decimals."""
+    weights = [rng.uniform(0.5, 2.0) for _ in range(count)]
+    total = sum(weights)
+    hundredths = [int(weight / total * 10000) for weight in weights]
+    hundredths[-1] += 10000 - sum(hundredths)
+    return [Decimal(value).scaleb(-2) for value in hundredths]
+
+
+def get_skewed_weights(rng, count):
+    """
+    Cumulative Pareto weights (for random.choices(cum_weights=...)), so a
+    few items are picked much more often than the rest.
+    """
+    return list(accumulate(rng.paretovariate(1.2) for _ in range(count)))
+
+
+def choose(rng, population, cum_weights, count):
+    """Draw `count` items at once; far cheaper than one choices() call each."""
+    return rng.choices(population, cum_weights=cum_weights, k=count)
+
+
+def insert_milestones(rows):
+    """Insert (structure_id, name, payment_percentage, net_terms_days, days_after_previous, order) rows."""
+    fields = ['structure', 'name', 'payment_percentage', 'net_terms_days', 'days_after_previous', 'order']
+    columns = ', '.join(
+        connection.ops.quote_name(PaymentMilestone._meta.get_field(name).column) for name in fields
+    )
+    sql = (
+        f"INSERT INTO {connection.ops.quote_name(PaymentMilestone._meta.db_table)} ({columns}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))})"
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+    # No sales use the new structures yet, so unlike notify_milestones_changed()
+    # only stale compiled forms (of reused ids) need dropping
+    for structure_id in {row[0] for row in rows}:
+        invalidate_compiled_structure(structure_id)
+
+
+def chunked(count, chunk_size):
+    for start in range(0, count, chunk_size):
+        yield range(start, min(start + chunk_size, count))
+
+
+def generate_load_data(
+    structures=100,
+    milestones_per_structure=4,
+    projects=100,
+    sales=10000,
+    seed=0,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    prefix='Load'
+):
+    """
+    Create a synthetic dataset.
+
+    Args:
+        structures: Number of milestone structures
+        milestones_per_structure: Milestones in each structure
+        projects: Number of projects
+        sales: Number of equipment sales
+        seed: Random seed
+        chunk_size: Rows per INSERT batch (and per transaction)
+        prefix: Start of generated names; structure names must be unique,
+            so use a new prefix to add a second dataset
+
+    Returns:
+        LoadDataResult with the number of rows created per table
+    """
+    rng = random.Random(seed)
+    result = LoadDataResult()
+
+    net_terms, net_terms_weights = NET_TERMS_CHOICES
+    net_terms_weights = list(accumulate(net_terms_weights))
+    intervals, interval_weights = DAYS_AFTER_PREVIOUS_CHOICES
+    interval_weights = list(accumulate(interval_weights))
+
+    structure_ids = []
+    for chunk in chunked(structures, chunk_size):
+        with transaction.atomic():
+            created = PaymentMilestoneStructure.objects.bulk_create([
+                PaymentMilestoneStructure(name=f'{prefix} Structure {i}') for i in chunk
+            ])
+            structure_ids.extend(structure.id for structure in created)
+            count = len(created) * milestones_per_structure
+            net_terms_days = iter(choose(rng, net_terms, net_terms_weights, count))
+            days_after_previous = iter(choose(rng, intervals, interval_weights, count))
+            milestones = [
+                (
+                    structure.id,
+                    f'Milestone {order + 1}',
+                    str(percentage),
+                    next(net_terms_days),
+                    0 if order == 0 else next(days_after_previous),
+                    order,
+                )
+                for structure in created
+                for order, percentage in enumerate(get_percentages(rng, milestones_per_structure))
+            ]
+            insert_milestones(milestones)
+        result.milestones += len(milestones)
+    result.structures = len(structure_ids)
+
+    project_start_dates = {}
+    for chunk in chunked(projects, chunk_size):
+        created = Project.objects.bulk_create([
+            Project(
+                name=f'{prefix} Project {i}',
+                start_date=FIRST_START_DATE + timedelta(days=rng.randrange(START_DATE_SPAN_DAYS)),
+            )
+            for i in chunk
+        ])
+        project_start_dates.update((project.id, project.start_date) for project in created)
+    result.projects = len(project_start_dates)
+
+    project_ids = list(project_start_dates)
+    project_weights = get_skewed_weights(rng, len(project_ids))
+    structure_weights = get_skewed_weights(rng, len(structure_ids))
+    vendor_weights = get_skewed_weights(rng, VENDORS)
+
+    for chunk in chunked(sales, chunk_size):
+        count = len(chunk)
+        sale_projects = choose(rng, project_ids, project_weights, count) if project_ids else [None] * count
+        sale_structures = choose(rng, structure_ids, structure_weights, count) if structure_ids else [None] * count
+        sale_vendors = choose(rng, range(1, VENDORS + 1), vendor_weights, count)
+        new_sales = []
+        for i, project_id, structure_id, vendor in zip(chunk, sale_projects, sale_structures, sale_vendors):
+            if rng.random() >= PROJECT_SHARE:
+                project_id = None
+            if rng.random() >= STRUCTURE_SHARE:
+                structure_id = None
+            first_date = project_start_dates.get(project_id) or (
+                FIRST_START_DATE + timedelta(days=rng.randrange(START_DATE_SPAN_DAYS))
+            )
+            amount = Decimal(round(rng.lognormvariate(11, 1.2), 2)).quantize(Decimal('0.01'))
+            new_sales.append(EquipmentSale(
+                name=f'{prefix} Sale {i}',
+                vendor=f'Vendor {vendor}',
+                sale_type='customer' if rng.random() < CUSTOMER_SHARE else 'vendor',
+                quantity=min(int(rng.paretovariate(1.5)), 100),
+                total_amount=min(max(amount, Decimal('100.00')), MAX_TOTAL_AMOUNT),
+                milestone_structure_id=structure_id,
+                project_id=project_id,
+                project_start_date=first_date + timedelta(days=rng.randrange(180)),
+            ))
+            if structure_id is not None:
+                result.schedule_entries += milestones_per_structure
+        save_sales(new_sales, batch_size=chunk_size)
+        result.sales += len(new_sales)
+
+    return result
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from equipment.exports import EXPORT_CHUNK_SIZE, LEDGER_FILE_FORMATS, write_ledger_file
+from equipment.models import PaymentScheduleEntry
+
+
+class Command(BaseCommand):
+    help = "Export the payment schedule ledger to a Parquet or Arrow IPC file (requires pyarrow)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Output file")
+        parser.add_argument(
+            '--format',
+            choices=LEDGER_FILE_FORMATS,
+            help="File format (default: arrow for .arrow/.feather/.ipc paths, parquet otherwise)",
+        )
+        parser.add_argument(
+            '--project',
+            type=int,
+            action='append',
+            help="Only export payments of this project (repeatable)",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help="Rows per record batch",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            file_format = 'arrow' if path.lower().endswith(('.arrow', '.feather', '.ipc')) else 'parquet'
+
+        entries = PaymentScheduleEntry.objects.all()
+        if options['project']:
+            entries = entries.filter(sale__project_id__in=options['project'])
+
+        try:
+            count = write_ledger_file(path, file_format, entries, batch_size=options['batch_size'])
+        except (ImportError, OSError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Exported {count} payments to {path}"))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from equipment.ledger import DEFAULT_CHUNK_SIZE
+from equipment.load_data import generate_load_data
+
+
+class Command(BaseCommand):
+    help = "Generate synthetic milestone structures, projects and equipment sales for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--structures', type=int, default=100, help="Number of milestone structures")
+        parser.add_argument('--milestones', type=int, default=4, help="Milestones per structure")
+        parser.add_argument('--projects', type=int, default=100, help="Number of projects")
+        parser.add_argument('--sales', type=int, default=10000, help="Number of equipment sales")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Rows inserted per batch",
+        )
+        parser.add_argument(
+            '--prefix',
+            default='Load',
+            help="Start of generated names; use a new one to add a second dataset",
+        )
+
+    def handle(self, *args, **options):
+        if options['milestones'] < 1 or options['chunk_size'] < 1:
+            raise CommandError("--milestones and --chunk-size must be at least 1")
+
+        start = time.perf_counter()
+        try:
+            result = generate_load_data(
+                structures=options['structures'],
+                milestones_per_structure=options['milestones'],
+                projects=options['projects'],
+                sales=options['sales'],
+                seed=options['seed'],
+                chunk_size=options['chunk_size'],
+                prefix=options['prefix'],
+            )
+        except IntegrityError as e:
+            raise CommandError(f"{e} (structure names exist already, pass another --prefix)")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.structures} structures, {result.milestones} milestones, "
+            f"{result.projects} projects, {result.sales} sales and "
+            f"{result.schedule_entries} payment schedule entries in {time.perf_counter() - start:.1f}s"
+        ))
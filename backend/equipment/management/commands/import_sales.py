@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from equipment.importers import FILE_FORMATS, SaleImportError, get_file_format, import_sales
+from equipment.ledger import DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = "Import equipment sales from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import")
+        parser.add_argument(
+            '--format',
+            choices=FILE_FORMATS,
+            help="File format (default: guessed from the file extension)",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of rows validated and inserted per batch",
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or get_file_format(options['path'])
+        if file_format is None:
+            raise CommandError("Cannot guess the file format, pass --format")
+
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                result = import_sales(stream, file_format, chunk_size=options['chunk_size'])
+        except (OSError, UnicodeDecodeError, SaleImportError) as e:
+            raise CommandError(str(e))
+
+        for error in result.errors:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... and {result.error_count - len(result.errors)} more errors")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} equipment sales ({result.error_count} rows skipped)"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from equipment.ledger import DEFAULT_CHUNK_SIZE, rebuild_schedule_ledger
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized payment schedule ledger from all equipment sales."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help="Number of sales computed and inserted per batch",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_schedule_ledger(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt payment schedule ledger with {count} entries"))
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:38
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+
+
+def populate_ledger(apps, schema_editor):
+    """
+    Materialize schedules of existing sales (see equipment.ledger).
+
+    A frozen copy of the calendar-day schedule calculation as it was when
+    this migration was written, so later changes to utils.calculations do
+    not change what it does.
+    """
+    EquipmentSale = apps.get_model('equipment', 'EquipmentSale')
+    PaymentMilestone = apps.get_model('milestones', 'PaymentMilestone')
+    PaymentScheduleEntry = apps.get_model('equipment', 'PaymentScheduleEntry')
+
+    milestones_by_structure = {}
+    for milestone in PaymentMilestone.objects.order_by('structure_id', 'order'):
+        milestones_by_structure.setdefault(milestone.structure_id, []).append(milestone)
+
+    for structure_id, milestones in milestones_by_structure.items():
+        offsets = []
+        end_days = 0
+        for milestone in milestones:
+            start_days = end_days
+            end_days += milestone.days_after_previous
+            offsets.append((start_days, end_days))
+
+        entries = []
+        for sale in EquipmentSale.objects.filter(milestone_structure_id=structure_id):
+            for order, (milestone, (start_days, end_days)) in enumerate(zip(milestones, offsets)):
+                due_date = sale.project_start_date + timedelta(days=end_days)
+                entries.append(PaymentScheduleEntry(
+                    sale_id=sale.id,
+                    milestone_id=milestone.id,
+                    order=order,
+                    start_days=start_days,
+                    end_days=end_days,
+                    due_date=due_date,
+                    payment_due_date=due_date + timedelta(days=milestone.net_terms_days),
+                    # Two decimal places times two decimal places, divided by 100, is exact
+                    payment_amount=sale.total_amount * milestone.payment_percentage / 100,
+                    sale_type=sale.sale_type,
+                ))
+        PaymentScheduleEntry.objects.bulk_create(entries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_alter_equipmentsale_milestone_structure'),
+        ('milestones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentScheduleEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveIntegerField(help_text='Order of the milestone within its structure')),
+                ('start_days', models.PositiveIntegerField()),
+                ('end_days', models.PositiveIntegerField()),
+                ('due_date', models.DateField()),
+                ('payment_due_date', models.DateField()),
+                ('payment_amount', models.DecimalField(decimal_places=6, help_text='Exact payment amount (total amount x percentage)', max_digits=18)),
+                ('sale_type', models.CharField(choices=[('vendor', 'Vendor Sale'), ('customer', 'Customer Sale')], max_length=10)),
+                ('milestone', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_entries', to='milestones.paymentmilestone')),
+                ('sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_entries', to='equipment.equipmentsale')),
+            ],
+            options={
+                'verbose_name_plural': 'payment schedule entries',
+                'ordering': ['sale', 'order'],
+                'indexes': [models.Index(fields=['payment_due_date', 'sale_type'], name='equipment_p_payment_e79a55_idx')],
+                'unique_together': {('sale', 'order')},
+            },
+        ),
+        migrations.RunPython(populate_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0003_paymentscheduleentry'),
+        ('milestones', '0001_initial'),
+        ('projects', '0002_project_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='equipmentsale',
+            name='project',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Project this sale belongs to (optional)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='equipment_sales', to='projects.project'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentsale',
+            index=models.Index(fields=['created_at'], name='equipment_e_created_b188ef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentsale',
+            index=models.Index(fields=['project', 'created_at'], name='equipment_e_project_1f32b6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentsale',
+            index=models.Index(fields=['sale_type', 'project_start_date'], name='equipment_e_sale_ty_48bd43_idx'),
+        ),
+    ]
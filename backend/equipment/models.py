@@ -1,7 +1,53 @@
 from django.db import models
+from django.db.models import Count, Max, Prefetch
 from django.core.validators import MinValueValidator
-from datetime import timedelta
-from milestones.models import PaymentMilestoneStructure
+import numpy as np
+from milestones.models import PaymentMilestoneStructure, PaymentMilestone
+from milestones.compiled import get_compiled_structure, get_compiled_structures
+from utils.calculations import calculate_payment_schedules_batch, iter_payment_schedule
+
+
+class EquipmentSaleQuerySet(models.QuerySet):
+    """QuerySet with the prefetch plans used by the sale endpoints."""
+
+    SCHEDULE_VALIDATORS = {
+        'sales_updated_at': Max('updated_at'),
+        'structures_updated_at': Max('milestone_structure__updated_at'),
+        'sales': Count('id'),
+    }
+
+    def with_structure(self):
+        """
+        Load each sale's milestone structure and its ordered milestones, as
+        nested by EquipmentSaleSerializer, in two queries in total.
+        """
+        return self.select_related('milestone_structure').prefetch_related(
+            Prefetch('milestone_structure__milestones', queryset=PaymentMilestone.objects.order_by('order'))
+        )
+
+    def schedule_validators(self):
+        """
+        Aggregate what the schedules of these sales depend on into one row:
+        the latest sale and structure updated_at and the number of sales.
+        Milestone changes bump their structure's updated_at.
+        Returns None when there are no sales.
+        """
+        validators = self.order_by().aggregate(**self.SCHEDULE_VALIDATORS)
+        return validators if validators['sales'] else None
+
+    async def aschedule_validators(self):
+        """Async version of schedule_validators()."""
+        validators = await self.order_by().aaggregate(**self.SCHEDULE_VALIDATORS)
+        return validators if validators['sales'] else None
+
+    def schedule_validators_by_sale(self):
+        """
+        schedule_validators() of each sale in one GROUP BY query, as dicts
+        that also hold the sale id, in the queryset's order.
+        """
+        # Meta.ordering is not applied to GROUP BY queries
+        ordering = self.query.order_by or self.model._meta.ordering
+        return self.values('id').annotate(**self.SCHEDULE_VALIDATORS).order_by(*ordering)
 
 
 class EquipmentSale(models.Model):
@@ -44,6 +90,8 @@ class EquipmentSale(models.Model):
         on_delete=models.CASCADE,
         null=True,
         blank=True,
+        # Covered by the (project, created_at) index in Meta
+        db_index=False,
         related_name='equipment_sales',
         help_text="Project this sale belongs to (optional)"
     )
@@ -53,12 +101,47 @@ class EquipmentSale(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = EquipmentSaleQuerySet.as_manager()
+
+    # Fields that feed PaymentScheduleEntry rows; see ledger.py
+    SCHEDULE_FIELDS = ('total_amount', 'project_start_date', 'milestone_structure_id', 'sale_type')
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Default ordering of the sale list
+            models.Index(fields=['created_at']),
+            # A project's sales, newest first (ProjectQuerySet.with_sales)
+            models.Index(fields=['project', 'created_at']),
+            models.Index(fields=['sale_type', 'project_start_date']),
+        ]
 
     def __str__(self):
         return f"{self.name} - ${self.total_amount}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_schedule_values = instance.get_schedule_values()
+        # Lets signal receivers find the project a sale was moved away from
+        instance._loaded_project_id = instance.__dict__.get('project_id')
+        return instance
+
+    def get_schedule_values(self):
+        """
+        Values of the fields that determine this sale's payment schedule.
+        Deferred fields are reported as None rather than fetched.
+        """
+        return tuple(self.__dict__.get(field) for field in self.SCHEDULE_FIELDS)
+
+    def schedule_changed(self):
+        """
+        Check whether the schedule-relevant fields changed since the sale was
+        loaded or last synced to the payment ledger.
+        """
+        loaded = getattr(self, '_loaded_schedule_values', None)
+        return loaded is None or loaded != self.get_schedule_values()
+
     @property
     def unit_price(self):
         """Calculate unit price based on total amount and quantity."""
@@ -72,36 +155,72 @@ class EquipmentSale(models.Model):
         """
         if not self.milestone_structure:
             return []
-            
-        milestones = self.milestone_structure.milestones.all().order_by('order')
-        schedule = []
-        cumulative_days = 0
         
-        for milestone in milestones:
-            # Calculate start and end dates
-            start_days = cumulative_days
-            end_days = cumulative_days + milestone.days_after_previous
-            
-            # Calculate payment amounts
-            payment_amount = (self.total_amount * milestone.payment_percentage) / 100
-            due_date = self.project_start_date + timedelta(days=end_days)
-            payment_due_date = due_date + timedelta(days=milestone.net_terms_days)
+        compiled = get_compiled_structure(self.milestone_structure)
+        return list(iter_payment_schedule(self.total_amount, compiled, self.project_start_date))
+    
+    @classmethod
+    def get_milestone_schedules(cls, sales):
+        """
+        Generate milestone schedules for many sales at once.
+        Sales are grouped by milestone structure and each group is computed in
+        a single vectorized pass. Returns a dict mapping sale id to the same
+        list get_milestone_schedule() would return for that sale.
+        """
+        structure_field = cls._meta.get_field('milestone_structure')
+        sales_by_structure = {}
+        structures = {}
+        schedules = {}
+        for sale in sales:
+            schedules[sale.id] = []
+            if sale.milestone_structure_id is not None:
+                sales_by_structure.setdefault(sale.milestone_structure_id, []).append(sale)
+                # Prefer loaded instances so the cache can check updated_at
+                if structure_field.is_cached(sale):
+                    structures[sale.milestone_structure_id] = sale.milestone_structure
+                else:
+                    structures.setdefault(sale.milestone_structure_id, sale.milestone_structure_id)
+        
+        compiled_structures = get_compiled_structures(structures.values())
+        
+        for structure_id, structure_sales in sales_by_structure.items():
+            compiled = compiled_structures[structure_id]
+            if not len(compiled):
+                continue
             
-            schedule.append({
-                'id': milestone.id,
-                'name': milestone.name,
-                'start_days': start_days,
-                'end_days': end_days,
-                'payment_percentage': float(milestone.payment_percentage),
-                'payment_amount': float(payment_amount),
-                'due_date': due_date.isoformat(),
-                'payment_due_date': payment_due_date.isoformat(),
-                'net_terms_days': milestone.net_terms_days,
-            })
+            batch = calculate_payment_schedules_batch(
+                total_amounts=[sale.total_amount for sale in structure_sales],
+                start_dates=[sale.project_start_date for sale in structure_sales],
+                days_after_previous=compiled.days_after_previous,
+                payment_percentages=compiled.payment_percentages,
+                net_terms_days=compiled.net_terms_days,
+                business_calendar=compiled.business_calendar,
+            )
+            start_days = batch['start_days'].tolist()
+            end_days = batch['end_days'].tolist()
+            due_dates = np.datetime_as_string(batch['due_dates']).tolist()
+            payment_due_dates = np.datetime_as_string(batch['payment_due_dates']).tolist()
+            payment_amounts = batch['payment_amounts'].tolist()
+            payment_percentages = [float(p) for p in compiled.payment_percentages]
+            net_terms_days = compiled.net_terms_days.tolist()
             
-            cumulative_days = end_days
+            for row, sale in enumerate(structure_sales):
+                schedules[sale.id] = [
+                    {
+                        'id': compiled.ids[col],
+                        'name': compiled.names[col],
+                        'start_days': start_days[row][col],
+                        'end_days': end_days[row][col],
+                        'payment_percentage': payment_percentages[col],
+                        'payment_amount': payment_amounts[row][col],
+                        'due_date': due_dates[row][col],
+                        'payment_due_date': payment_due_dates[row][col],
+                        'net_terms_days': net_terms_days[col],
+                    }
+                    for col in range(len(compiled))
+                ]
         
-        return schedule
+        return schedules
     
     def can_assign_milestone_structure(self):
         """
@@ -119,4 +238,61 @@ class EquipmentSale(models.Model):
             raise ValueError("A milestone structure is already assigned to this sale")
         
         self.milestone_structure = milestone_structure
-        self.save()
\ No newline at end of file
+        self.save()
+
+
+class PaymentScheduleEntry(models.Model):
+    """
+    Materialized row of an EquipmentSale's payment schedule.
+    Maintained incrementally by signals (see ledger.py) so schedules,
+    timelines and cash-flow reports can be read with plain indexed queries.
+    """
+    sale = models.ForeignKey(
+        EquipmentSale,
+        on_delete=models.CASCADE,
+        related_name='schedule_entries'
+    )
+    milestone = models.ForeignKey(
+        PaymentMilestone,
+        on_delete=models.CASCADE,
+        related_name='schedule_entries'
+    )
+    order = models.PositiveIntegerField(help_text="Order of the milestone within its structure")
+    start_days = models.PositiveIntegerField()
+    end_days = models.PositiveIntegerField()
+    due_date = models.DateField()
+    payment_due_date = models.DateField()
+    payment_amount = models.DecimalField(
+        max_digits=18,
+        decimal_places=6,
+        help_text="Exact payment amount (total amount x percentage)"
+    )
+    sale_type = models.CharField(max_length=10, choices=EquipmentSale.SALE_TYPE_CHOICES)
+
+    class Meta:
+        ordering = ['sale', 'order']
+        unique_together = ['sale', 'order']
+        indexes = [
+            models.Index(fields=['payment_due_date', 'sale_type']),
+        ]
+        verbose_name_plural = 'payment schedule entries'
+
+    def __str__(self):
+        return f"{self.sale_id} - {self.milestone_id} due {self.payment_due_date}"
+
+    def to_schedule_row(self):
+        """
+        Format this entry like a row of EquipmentSale.get_milestone_schedule().
+        Expects milestone to be loaded with select_related.
+        """
+        return {
+            'id': self.milestone_id,
+            'name': self.milestone.name,
+            'start_days': self.start_days,
+            'end_days': self.end_days,
+            'payment_percentage': float(self.milestone.payment_percentage),
+            'payment_amount': float(self.payment_amount),
+            'due_date': self.due_date.isoformat(),
+            'payment_due_date': self.payment_due_date.isoformat(),
+            'net_terms_days': self.milestone.net_terms_days,
+        }
@@ -49,10 +49,131 @@ class EquipmentSaleScheduleSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
     
     def get_milestone_schedule(self, obj):
-        """Get the milestone schedule data for gantt chart."""
+        """
+        Get the milestone schedule data for gantt chart.
+        Uses schedules precomputed in bulk when passed in the context.
+        """
+        schedules = self.context.get('milestone_schedules')
+        if schedules is not None:
+            return schedules.get(obj.id, [])
         return obj.get_milestone_schedule()
 
 
+class EquipmentSaleBulkListSerializer(serializers.ListSerializer):
+    """
+    Validates a list of sales in one pass.
+    Referenced milestone structures, projects and sales to update are each
+    resolved with a single IN query. Errors are reported per row, in
+    request order, with {} for rows that are valid.
+    """
+    
+    def to_internal_value(self, data):
+        rows = super().to_internal_value(data)
+        errors = self.resolve_references(rows)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return rows
+    
+    def resolve_references(self, rows):
+        """Check that every referenced object exists; returns per-row errors."""
+        from milestones.models import PaymentMilestoneStructure
+        from projects.models import Project
+        
+        structure_ids = {row['milestone_structure_id'] for row in rows if row.get('milestone_structure_id') is not None}
+        project_ids = {row['project_id'] for row in rows if row.get('project_id') is not None}
+        sale_ids = [row['id'] for row in rows if 'id' in row]
+        
+        structures = set(
+            PaymentMilestoneStructure.objects.filter(id__in=structure_ids).values_list('id', flat=True)
+        ) if structure_ids else set()
+        projects = set(
+            Project.objects.filter(id__in=project_ids).values_list('id', flat=True)
+        ) if project_ids else set()
+        self.instances = EquipmentSale.objects.in_bulk(sale_ids) if sale_ids else {}
+        
+        errors = []
+        seen = set()
+        for row in rows:
+            row_errors = {}
+            if 'id' in row:
+                if row['id'] not in self.instances:
+                    row_errors['id'] = ['Equipment sale does not exist']
+                elif row['id'] in seen:
+                    row_errors['id'] = ['Equipment sale appears more than once']
+                seen.add(row['id'])
+            if row.get('milestone_structure_id') is not None and row['milestone_structure_id'] not in structures:
+                row_errors['milestone_structure_id'] = ['Milestone structure does not exist']
+            if row.get('project_id') is not None and row['project_id'] not in projects:
+                row_errors['project'] = ['Project does not exist']
+            errors.append(row_errors)
+        return errors
+    
+    def save(self, **kwargs):
+        """
+        Persist every row with bulk_create / bulk_update.
+        Returns the saved sales in request order.
+        """
+        from .bulk import save_sales
+        
+        sales = []
+        new_sales = []
+        changed_sales = []
+        update_fields = set()
+        for attrs in self.validated_data:
+            attrs = {**attrs, **kwargs}
+            pk = attrs.pop('id', None)
+            if pk is None:
+                sale = EquipmentSale(**attrs)
+                new_sales.append(sale)
+            else:
+                sale = self.instances[pk]
+                for field, value in attrs.items():
+                    setattr(sale, field, value)
+                update_fields.update(attrs)
+                changed_sales.append(sale)
+            sales.append(sale)
+        
+        save_sales(new_sales, changed_sales, update_fields)
+        self.instance = sales
+        return sales
+
+
+class EquipmentSaleBulkSerializer(serializers.ModelSerializer):
+    """
+    One row of a bulk create/update request.
+    Rows with an id update only the fields they contain; rows without one
+    create a sale and need every field a regular create needs.
+    """
+    id = serializers.IntegerField(required=False)
+    milestone_structure_id = NullableIntegerField(required=False, allow_null=True)
+    project = NullableIntegerField(source='project_id', required=False, allow_null=True)
+    
+    create_required_fields = ['name', 'quantity', 'total_amount', 'project_start_date']
+    
+    class Meta:
+        model = EquipmentSale
+        fields = [
+            'id', 'name', 'vendor', 'sale_type', 'quantity', 'total_amount',
+            'milestone_structure_id', 'project', 'project_start_date'
+        ]
+        extra_kwargs = {
+            'name': {'required': False},
+            'quantity': {'required': False},
+            'total_amount': {'required': False},
+            'project_start_date': {'required': False},
+        }
+        list_serializer_class = EquipmentSaleBulkListSerializer
+    
+    def validate(self, attrs):
+        if 'id' not in attrs:
+            missing = [field for field in self.create_required_fields if field not in attrs]
+            if missing:
+                raise serializers.ValidationError({
+                    field: ['This field is required.'] for field in missing
+                })
+        return attrs
+
+
 class MilestoneAssignmentSerializer(serializers.Serializer):
     """Serializer for assigning milestone structures to equipment sales."""
     milestone_structure_id = serializers.IntegerField()
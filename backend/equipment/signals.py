@@ -0,0 +1,52 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from milestones.models import PaymentMilestoneStructure
+from milestones.signals import milestones_changed
+from milestone_backend import payload_cache
+from .models import EquipmentSale
+from .ledger import sync_sale_schedules, sync_structure_schedules
+
+
+def invalidate_sale_payloads(sale_ids, project_ids):
+    """Drop cached schedules of the given sales and timelines of their projects."""
+    payload_cache.invalidate(payload_cache.SCHEDULE, sale_ids)
+    payload_cache.invalidate(payload_cache.TIMELINE, set(project_ids))
+
+
+def invalidate_structure_payloads(structure_id):
+    """Drop cached payloads of every sale using a structure, and their projects."""
+    rows = EquipmentSale.objects.filter(
+        milestone_structure_id=structure_id
+    ).values_list('id', 'project_id')
+    sale_ids, project_ids = zip(*rows) if rows else ((), ())
+    invalidate_sale_payloads(sale_ids, project_ids)
+
+
+@receiver(post_save, sender=EquipmentSale)
+def sale_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created or instance.schedule_changed():
+        sync_sale_schedules([instance])
+    invalidate_sale_payloads(
+        [instance.pk],
+        [instance.project_id, getattr(instance, '_loaded_project_id', None)]
+    )
+    instance._loaded_project_id = instance.project_id
+
+
+@receiver(post_delete, sender=EquipmentSale)
+def sale_deleted(sender, instance, **kwargs):
+    invalidate_sale_payloads([instance.pk], [instance.project_id])
+
+
+@receiver(post_save, sender=PaymentMilestoneStructure)
+def structure_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_structure_payloads(instance.pk)
+
+
+@receiver(milestones_changed)
+def structure_milestones_changed(sender, structure_id, **kwargs):
+    sync_structure_schedules(structure_id)
+    invalidate_structure_payloads(structure_id)
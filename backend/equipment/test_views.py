@@ -1,11 +1,24 @@
+import base64
+import csv
+import io
+import json
+from unittest.mock import patch
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from rest_framework.test import APITestCase
 from rest_framework import status
 from decimal import Decimal
 from datetime import date, timedelta
 from milestones.models import PaymentMilestoneStructure, PaymentMilestone
-from .models import EquipmentSale
+from milestone_backend import payload_cache
+from projects.models import Project
+from .models import EquipmentSale, PaymentScheduleEntry
+from .exports import iter_schedule_csv
+from .views import EquipmentSaleViewSet
 
 
 class EquipmentSaleAPITest(APITestCase):
@@ -315,6 +328,522 @@ class EquipmentSaleAPITest(APITestCase):
             self.assertEqual(milestone['payment_amount'], expected_amounts[i])
 
 
+class EquipmentSaleScheduleStreamingAPITest(APITestCase):
+    """Test cases for the streaming mode of the schedules endpoint."""
+    
+    def setUp(self):
+        """Set up more sales than fit in one streamed chunk."""
+        structure = PaymentMilestoneStructure.objects.create(name='Streaming Structure')
+        for i in range(2):
+            PaymentMilestone.objects.create(
+                structure=structure,
+                name=f'Payment {i + 1}',
+                payment_percentage=Decimal('50.00'),
+                net_terms_days=15,
+                days_after_previous=30 * i,
+                order=i
+            )
+        for i in range(5):
+            EquipmentSale.objects.create(
+                name=f'Streamed Sale {i}',
+                quantity=1,
+                total_amount=Decimal('100.00') * (i + 1),
+                milestone_structure=structure if i != 2 else None,
+                project_start_date=date(2024, 1, 1)
+            )
+        self.url = reverse('equipmentsale-schedules')
+    
+    def test_streamed_payload_matches_regular_payload(self):
+        """Test that streaming yields the same JSON as the regular response."""
+        regular = self.client.get(self.url)
+        
+        with patch.object(EquipmentSaleViewSet, 'stream_chunk_size', 2):
+            streamed = self.client.get(self.url, {'stream': 'true'})
+            self.assertTrue(streamed.streaming)
+            chunks = list(streamed.streaming_content)
+        
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        # Opening bracket, three chunks of sales, closing bracket
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(b''.join(chunks), regular.content)
+    
+    def test_streamed_empty_list(self):
+        """Test streaming when there are no sales."""
+        EquipmentSale.objects.all().delete()
+        
+        response = self.client.get(self.url, {'stream': '1'})
+        
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+
+class EquipmentSalePaginationAPITest(APITestCase):
+    """Test cases for keyset pagination of the sales list."""
+    
+    def setUp(self):
+        """Set up sales, several of them sharing a created_at timestamp."""
+        self.sales = [
+            EquipmentSale.objects.create(
+                name=f'Paged Sale {i}',
+                quantity=1,
+                total_amount=Decimal('100.00'),
+                project_start_date=date(2024, 1, 1)
+            )
+            for i in range(7)
+        ]
+        tied = self.sales[0].created_at
+        EquipmentSale.objects.filter(pk__in=[s.pk for s in self.sales[2:5]]).update(created_at=tied)
+        self.expected = list(
+            EquipmentSale.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.url = reverse('equipmentsale-list')
+    
+    def test_list_without_pagination_params(self):
+        """Test that the list stays a plain array unless pagination is requested."""
+        response = self.client.get(self.url)
+        
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+    
+    def test_walk_all_pages(self):
+        """Test that following next links visits every sale once, in order."""
+        seen = []
+        url = self.url + '?page_size=3'
+        pages = 0
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertFalse(any('OFFSET' in q['sql'] for q in queries.captured_queries))
+            seen.extend(sale['id'] for sale in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, self.expected)
+    
+    def test_invalid_page_size_falls_back(self):
+        """Test that an invalid page size falls back to the default."""
+        response = self.client.get(self.url, {'page_size': 'abc'})
+        self.assertEqual(len(response.data['results']), 7)
+        self.assertIsNone(response.data['next'])
+    
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_tampered_cursor_values(self):
+        """Test that cursors with values of the wrong type are rejected."""
+        created_at = self.sales[0].created_at.isoformat()
+        for values in (['garbage', 1], [12345, 1], [created_at, 'x'], [None, 1], [created_at, None], [created_at]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            response = self.client.get(self.url, {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, values)
+
+
+class EquipmentSaleScheduleCSVExportTest(APITestCase):
+    """Test cases for the CSV export of all payment schedules."""
+    
+    def setUp(self):
+        """Set up three sales with a two-milestone structure and one without."""
+        structure = PaymentMilestoneStructure.objects.create(name='Export Structure')
+        for i in range(2):
+            PaymentMilestone.objects.create(
+                structure=structure,
+                name=f'Payment {i + 1}',
+                payment_percentage=Decimal('50.00'),
+                net_terms_days=15,
+                days_after_previous=30 * i,
+                order=i
+            )
+        self.project = Project.objects.create(name='Export Project', start_date=date(2024, 1, 1))
+        self.sales = [
+            EquipmentSale.objects.create(
+                name=f'Export Sale {i}',
+                vendor='Acme, Inc.',
+                quantity=1,
+                total_amount=Decimal('100.00') * (i + 1),
+                milestone_structure=structure,
+                project=self.project if i == 0 else None,
+                project_start_date=date(2024, 1, 1)
+            )
+            for i in range(3)
+        ]
+        EquipmentSale.objects.create(
+            name='No Structure',
+            quantity=1,
+            total_amount=Decimal('50.00'),
+            project_start_date=date(2024, 1, 1)
+        )
+        self.url = '/api/equipment/sales/schedules.csv'
+    
+    def read_csv(self, response):
+        self.assertTrue(response.streaming)
+        return list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+    
+    def test_schedules_csv(self):
+        """Test that every payment of every sale is exported as one row."""
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = self.read_csv(response)
+        self.assertEqual(len(rows), 6)
+        first = rows[0]
+        self.assertEqual(first['sale_id'], str(self.sales[0].id))
+        self.assertEqual(first['vendor'], 'Acme, Inc.')
+        self.assertEqual(first['project_name'], 'Export Project')
+        self.assertEqual(first['milestone_name'], 'Payment 1')
+        self.assertEqual(Decimal(first['payment_amount']), Decimal('50.00'))
+        self.assertEqual(first['payment_due_date'], '2024-01-16')
+        self.assertEqual(rows[1]['due_date'], '2024-01-31')
+    
+    def test_format_query_parameter(self):
+        """Test that ?format=csv selects the CSV export as well."""
+        response = self.client.get(reverse('equipmentsale-schedules'), {'format': 'csv'})
+        
+        self.assertEqual(len(self.read_csv(response)), 6)
+    
+    def test_csv_is_written_in_chunks(self):
+        """Test that rows are yielded a chunk at a time."""
+        chunks = list(iter_schedule_csv(chunk_size=2))
+        
+        # Header with the first two rows, two more chunks, then the remainder
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(chunks[-1], '')
+        self.assertEqual(len(list(csv.reader(io.StringIO(''.join(chunks))))), 7)
+
+
+class EquipmentSaleConditionalGetAPITest(APITestCase):
+    """Test cases for ETag on the schedule endpoints."""
+    
+    def setUp(self):
+        """Set up two sales sharing a structure."""
+        self.structure = PaymentMilestoneStructure.objects.create(name='Conditional Structure')
+        self.milestone = PaymentMilestone.objects.create(
+            structure=self.structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+        self.sales = [
+            EquipmentSale.objects.create(
+                name=f'Conditional Sale {i}',
+                quantity=1,
+                total_amount=Decimal('500.00'),
+                milestone_structure=self.structure,
+                project_start_date=date(2024, 1, 1)
+            )
+            for i in range(2)
+        ]
+        self.url = reverse('equipmentsale-schedule', kwargs={'pk': self.sales[0].pk})
+        self.list_url = reverse('equipmentsale-schedules')
+    
+    def test_if_none_match_returns_not_modified(self):
+        """Test that a matching ETag costs one query and returns no body."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(cached.content, b'')
+    
+    def test_delete_older_sale_is_modified(self):
+        """Test that deleting a sale other than the latest updated one is not answered with a 304."""
+        response = self.client.get(self.list_url)
+        
+        self.sales[0].delete()
+        fresh = self.client.get(
+            self.list_url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=http_date()
+        )
+        
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(fresh.data), 1)
+        
+        # If-Modified-Since alone is never enough
+        fresh = self.client.get(self.list_url, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(fresh.status_code, status.HTTP_200_OK)
+    
+    def test_milestone_change_invalidates_etag(self):
+        """Test that editing a milestone changes the validator of its sales."""
+        etag = self.client.get(self.url)['ETag']
+        
+        self.milestone.net_terms_days = 45
+        self.milestone.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['milestone_schedule'][0]['net_terms_days'], 45)
+    
+    def test_deleted_sale_invalidates_list_etag(self):
+        """Test that deleting a sale changes the validator of the list."""
+        etag = self.client.get(self.list_url)['ETag']
+        
+        self.sales[1].delete()
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+    
+    def test_missing_sale(self):
+        """Test that unknown or malformed ids still return 404."""
+        response = self.client.get(reverse('equipmentsale-schedule', kwargs={'pk': 99999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        response = self.client.get(reverse('equipmentsale-schedule', kwargs={'pk': 'abc'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EquipmentSaleSchedulePayloadCacheTest(APITestCase):
+    """Test caching and invalidation of schedule payloads."""
+    
+    def setUp(self):
+        """Set up a sale with a one-milestone structure."""
+        payload_cache.get_cache().clear()
+        self.structure = PaymentMilestoneStructure.objects.create(name='Cached Structure')
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+        self.sale = EquipmentSale.objects.create(
+            name='Cached Sale',
+            quantity=1,
+            total_amount=Decimal('500.00'),
+            milestone_structure=self.structure,
+            project_start_date=date(2024, 1, 1)
+        )
+        self.url = reverse('equipmentsale-schedule', kwargs={'pk': self.sale.pk})
+    
+    def test_schedule_served_from_cache(self):
+        """Test that a cached schedule only costs the validator query."""
+        first = self.client.get(self.url)
+        
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url)
+        
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(payload_cache.get_stats()['schedule']['hits'], 1)
+    
+    def test_sale_change_invalidates(self):
+        """Test that saving a sale refreshes its schedule."""
+        self.client.get(self.url)
+        
+        self.sale.total_amount = Decimal('800.00')
+        self.sale.save()
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['milestone_schedule'][0]['payment_amount'], 800.0)
+    
+    def test_structure_change_invalidates(self):
+        """Test that renaming a structure refreshes the schedules using it."""
+        self.client.get(self.url)
+        
+        self.structure.name = 'Renamed Structure'
+        self.structure.save()
+        
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['milestone_structure']['name'], 'Renamed Structure')
+    
+    def test_deleted_sale(self):
+        """Test that a deleted sale is not served from the cache."""
+        self.client.get(self.url)
+        
+        self.sale.delete()
+        
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EquipmentSaleBulkAPITest(APITestCase):
+    """Test cases for the bulk create/update endpoint."""
+    
+    def setUp(self):
+        """Set up a structure, a project and an existing sale."""
+        self.structure = PaymentMilestoneStructure.objects.create(name='Bulk Structure')
+        for i in range(2):
+            PaymentMilestone.objects.create(
+                structure=self.structure,
+                name=f'Payment {i + 1}',
+                payment_percentage=Decimal('50.00'),
+                net_terms_days=30,
+                days_after_previous=30 * i,
+                order=i
+            )
+        self.project = Project.objects.create(name='Bulk Project', start_date=date(2024, 1, 1))
+        self.sale = EquipmentSale.objects.create(
+            name='Existing Sale',
+            quantity=1,
+            total_amount=Decimal('100.00'),
+            project_start_date=date(2024, 1, 1)
+        )
+        self.url = reverse('equipmentsale-bulk')
+    
+    def make_rows(self, count):
+        return [
+            {
+                'name': f'Bulk Sale {i}',
+                'quantity': 2,
+                'total_amount': '1000.00',
+                'milestone_structure_id': self.structure.id,
+                'project': self.project.id,
+                'project_start_date': '2024-02-01',
+            }
+            for i in range(count)
+        ]
+    
+    def post(self, rows):
+        return self.client.post(self.url, rows, format='json')
+    
+    def test_bulk_create(self):
+        """Test that rows are created with their ledger entries, in order."""
+        response = self.post(self.make_rows(3))
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([sale['name'] for sale in response.data], ['Bulk Sale 0', 'Bulk Sale 1', 'Bulk Sale 2'])
+        self.assertEqual(response.data[0]['milestone_structure']['id'], self.structure.id)
+        self.assertEqual(self.project.equipment_sales.count(), 3)
+        self.assertEqual(
+            PaymentScheduleEntry.objects.filter(sale_id__in=[sale['id'] for sale in response.data]).count(),
+            6
+        )
+    
+    def test_bulk_create_query_count(self):
+        """Test that validation and inserts do not grow with the number of rows."""
+        # Warm the compiled structure cache used by the ledger sync
+        self.post(self.make_rows(1))
+        with CaptureQueriesContext(connection) as small:
+            self.post(self.make_rows(2))
+        with CaptureQueriesContext(connection) as large:
+            self.post(self.make_rows(40))
+        
+        self.assertEqual(len(small), len(large))
+    
+    def test_bulk_update(self):
+        """Test that rows with an id update only the given fields."""
+        rows = [
+            {'id': self.sale.id, 'total_amount': '400.00', 'milestone_structure_id': self.structure.id},
+            *self.make_rows(1),
+        ]
+        
+        response = self.post(rows)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.sale.refresh_from_db()
+        self.assertEqual(self.sale.name, 'Existing Sale')
+        self.assertEqual(self.sale.total_amount, Decimal('400.00'))
+        self.assertGreater(self.sale.updated_at, self.sale.created_at)
+        schedule = self.client.get(reverse('equipmentsale-schedule', kwargs={'pk': self.sale.pk}))
+        self.assertEqual(
+            [row['payment_amount'] for row in schedule.data['milestone_schedule']],
+            [200.0, 200.0]
+        )
+    
+    def test_bulk_update_only(self):
+        """Test that an update-only request returns 200."""
+        response = self.post([{'id': self.sale.id, 'name': 'Renamed Sale'}])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['name'], 'Renamed Sale')
+    
+    def test_bulk_per_row_errors(self):
+        """Test that invalid rows are reported by position and nothing is saved."""
+        rows = self.make_rows(4)
+        rows[1]['milestone_structure_id'] = 99999
+        del rows[2]['name']
+        rows[3] = {'id': 99999, 'name': 'Missing Sale'}
+        
+        response = self.post(rows)
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('name', response.data[2])
+        self.assertEqual(EquipmentSale.objects.count(), 1)
+        
+        del rows[2]
+        response = self.post(rows)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('milestone_structure_id', response.data[1])
+        self.assertIn('id', response.data[2])
+    
+    def test_bulk_duplicate_ids(self):
+        """Test that a sale cannot be updated twice in one request."""
+        response = self.post([{'id': self.sale.id}, {'id': self.sale.id}])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data[1])
+    
+    def test_bulk_requires_list(self):
+        """Test that a single object is rejected."""
+        response = self.post(self.make_rows(1)[0])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class EquipmentSaleImportAPITest(APITestCase):
+    """Test cases for the file import endpoint."""
+    
+    def setUp(self):
+        self.url = reverse('equipmentsale-import')
+    
+    def test_import_csv_upload(self):
+        """Test that an uploaded CSV is imported and errors are reported."""
+        upload = SimpleUploadedFile(
+            'sales.csv',
+            b"name,quantity,total_amount,project_start_date\n"
+            b"Pump,2,1000.00,2024-01-01\n"
+            b",1,10.00,2024-01-01\n",
+            content_type='text/csv'
+        )
+        
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['errors'], [{'line': 3, 'error': 'Missing values: name'}])
+        self.assertTrue(EquipmentSale.objects.filter(name='Pump').exists())
+    
+    def test_import_jsonl_with_explicit_format(self):
+        """Test that file_format overrides the file extension."""
+        upload = SimpleUploadedFile(
+            'export.txt',
+            b'{"name": "Pump", "quantity": 1, "total_amount": "5.00", "project_start_date": "2024-01-01"}\n'
+        )
+        
+        response = self.client.post(self.url, {'file': upload, 'file_format': 'jsonl'}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+    
+    def test_import_invalid_requests(self):
+        """Test missing files, unknown formats and missing columns."""
+        response = self.client.post(self.url, {}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        upload = SimpleUploadedFile('sales.xlsx', b'data')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertIn('file_format', response.data)
+        
+        upload = SimpleUploadedFile('sales.csv', b'name\nPump\n')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Missing columns', response.data['detail'])
+
+
 class EquipmentSaleMilestoneAssignmentAPITest(APITestCase):
     """Test cases for milestone assignment API endpoint."""
     
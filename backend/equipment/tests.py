@@ -1,9 +1,22 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
+from django.db import connection
 from decimal import Decimal
 from datetime import date, timedelta
 from milestones.models import PaymentMilestoneStructure, PaymentMilestone
-from .models import EquipmentSale
+from milestones.compiled import clear_compiled_structures
+from projects.models import Project
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
+import importlib.util
+import os
+import tempfile
+import unittest
+from .models import EquipmentSale, PaymentScheduleEntry
+from .exports import iter_ledger_record_batches
+from .importers import SaleImportError, import_sales
+from .ledger import get_ledger_schedules
 from .serializers import EquipmentSaleSerializer
 
 
@@ -282,6 +295,468 @@ class EquipmentSaleIntegrationTest(TestCase):
         self.assertEqual(schedule2[0]['payment_amount'], 2000.0)
 
 
+class EquipmentSaleBatchScheduleTest(TestCase):
+    """Test cases for the vectorized batch schedule engine."""
+    
+    def setUp(self):
+        """Set up structures with uneven percentages and terms."""
+        self.thirds = PaymentMilestoneStructure.objects.create(name="Thirds")
+        for i, (percentage, days, net_terms) in enumerate([
+            ('33.33', 0, 0), ('33.33', 45, 10), ('33.34', 17, 60)
+        ]):
+            PaymentMilestone.objects.create(
+                structure=self.thirds,
+                name=f"Payment {i + 1}",
+                payment_percentage=Decimal(percentage),
+                net_terms_days=net_terms,
+                days_after_previous=days,
+                order=i
+            )
+        
+        self.single = PaymentMilestoneStructure.objects.create(name="Single")
+        PaymentMilestone.objects.create(
+            structure=self.single,
+            name="Full Payment",
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=90,
+            order=0
+        )
+        
+        self.empty = PaymentMilestoneStructure.objects.create(name="Empty")
+        
+        amounts = ['12345.67', '0.01', '999999.99', '100000.00', '7.77']
+        structures = [self.thirds, self.single, self.thirds, self.empty, None]
+        self.sales = [
+            EquipmentSale.objects.create(
+                name=f"Batch Sale {i}",
+                quantity=1,
+                total_amount=Decimal(amount),
+                milestone_structure=structure,
+                project_start_date=date(2024, 2, 28) + timedelta(days=i)
+            )
+            for i, (amount, structure) in enumerate(zip(amounts, structures))
+        ]
+    
+    def test_batch_matches_per_sale_schedule(self):
+        """Test that batch schedules are identical to per-sale schedules."""
+        schedules = EquipmentSale.get_milestone_schedules(self.sales)
+        
+        self.assertEqual(set(schedules), {sale.id for sale in self.sales})
+        for sale in self.sales:
+            self.assertEqual(schedules[sale.id], sale.get_milestone_schedule())
+    
+    def test_batch_without_structure_or_milestones(self):
+        """Test that sales without milestones get empty schedules."""
+        schedules = EquipmentSale.get_milestone_schedules(self.sales[3:])
+        
+        self.assertEqual(schedules[self.sales[3].id], [])
+        self.assertEqual(schedules[self.sales[4].id], [])
+    
+    def test_batch_queries(self):
+        """Test that the batch engine loads milestones with a single query."""
+        clear_compiled_structures()
+        with self.assertNumQueries(1):
+            EquipmentSale.get_milestone_schedules(self.sales)
+
+
+class PaymentScheduleLedgerTest(TestCase):
+    """Test cases for the materialized payment schedule ledger."""
+    
+    def setUp(self):
+        """Set up a structure and a sale using it."""
+        self.structure = PaymentMilestoneStructure.objects.create(name="Ledger Structure")
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name="Down Payment",
+            payment_percentage=Decimal('33.33'),
+            net_terms_days=0,
+            days_after_previous=0,
+            order=0
+        )
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name="Final Payment",
+            payment_percentage=Decimal('66.67'),
+            net_terms_days=30,
+            days_after_previous=45,
+            order=1
+        )
+        self.sale = EquipmentSale.objects.create(
+            name="Ledger Sale",
+            quantity=1,
+            total_amount=Decimal('1234.56'),
+            milestone_structure=self.structure,
+            project_start_date=date(2024, 1, 1)
+        )
+    
+    def ledger_schedule(self, sale):
+        entries = PaymentScheduleEntry.objects.filter(sale=sale)
+        return get_ledger_schedules(entries).get(sale.id, [])
+    
+    def test_entries_created_with_sale(self):
+        """Test that creating a sale materializes its schedule."""
+        entries = list(PaymentScheduleEntry.objects.filter(sale=self.sale))
+        
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(entries[1].payment_amount, Decimal('823.081152'))
+        self.assertEqual(entries[1].payment_due_date, date(2024, 3, 16))
+        self.assertEqual(entries[1].sale_type, 'vendor')
+        self.assertEqual(self.ledger_schedule(self.sale), self.sale.get_milestone_schedule())
+    
+    def test_entries_follow_sale_changes(self):
+        """Test that schedule-relevant sale changes rewrite the entries."""
+        self.sale.total_amount = Decimal('2000.00')
+        self.sale.project_start_date = date(2024, 6, 1)
+        self.sale.sale_type = 'customer'
+        self.sale.save()
+        
+        self.assertEqual(self.ledger_schedule(self.sale), self.sale.get_milestone_schedule())
+        self.assertEqual(
+            set(PaymentScheduleEntry.objects.filter(sale=self.sale).values_list('sale_type', flat=True)),
+            {'customer'}
+        )
+    
+    def test_business_day_structure(self):
+        """Test that switching a structure to business days reschedules its sales."""
+        self.structure.business_days = True
+        self.structure.save()
+        
+        entries = list(PaymentScheduleEntry.objects.filter(sale=self.sale).order_by('order'))
+        # 45 and 30 business days are 9 and 6 full weeks
+        self.assertEqual(entries[1].due_date, date(2024, 3, 4))
+        self.assertEqual(entries[1].payment_due_date, date(2024, 4, 15))
+        # Offsets stay calendar days from the start date, as the Gantt chart plots them
+        self.assertEqual((entries[1].start_days, entries[1].end_days), (0, 63))
+        sale = EquipmentSale.objects.get(pk=self.sale.pk)
+        self.assertEqual(self.ledger_schedule(sale), sale.get_milestone_schedule())
+        self.assertEqual(EquipmentSale.get_milestone_schedules([sale])[sale.id], sale.get_milestone_schedule())
+    
+    def test_business_day_offsets_from_weekend_start(self):
+        """Test that end_days reaches the due date when the start is not a business day."""
+        PaymentMilestone.objects.filter(structure=self.structure, order=1).update(days_after_previous=5)
+        self.structure.business_days = True
+        self.structure.save()
+        sale = EquipmentSale.objects.create(
+            name="Weekend Sale",
+            quantity=1,
+            total_amount=Decimal('100.00'),
+            milestone_structure=self.structure,
+            project_start_date=date(2024, 1, 6)
+        )
+        
+        schedule = sale.get_milestone_schedule()
+        
+        self.assertEqual(schedule[0]['due_date'], '2024-01-08')
+        self.assertEqual(schedule[1]['due_date'], '2024-01-15')
+        self.assertEqual([(m['start_days'], m['end_days']) for m in schedule], [(0, 2), (2, 9)])
+        self.assertEqual(self.ledger_schedule(sale), schedule)
+        self.assertEqual(EquipmentSale.get_milestone_schedules([sale])[sale.id], schedule)
+    
+    def test_unrelated_sale_changes_skip_ledger(self):
+        """Test that renaming a sale leaves its entries untouched."""
+        sale = EquipmentSale.objects.get(pk=self.sale.pk)
+        sale.name = "Renamed Sale"
+        
+        with self.assertNumQueries(1):
+            sale.save()
+    
+    def test_entries_follow_milestone_changes(self):
+        """Test that editing a structure's milestones resyncs its sales."""
+        milestone = self.structure.milestones.get(order=1)
+        milestone.days_after_previous = 60
+        milestone.save()
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name="Retention",
+            payment_percentage=Decimal('0.00'),
+            days_after_previous=10,
+            order=2
+        )
+        
+        schedule = self.ledger_schedule(self.sale)
+        self.assertEqual(len(schedule), 3)
+        self.assertEqual(schedule[1]['end_days'], 60)
+        self.assertEqual(schedule, self.sale.get_milestone_schedule())
+    
+    def test_entries_follow_structure_assignment(self):
+        """Test that assigning a structure materializes the schedule."""
+        sale = EquipmentSale.objects.create(
+            name="Unassigned Sale",
+            quantity=1,
+            total_amount=Decimal('500.00'),
+            project_start_date=date(2024, 1, 1)
+        )
+        self.assertFalse(PaymentScheduleEntry.objects.filter(sale=sale).exists())
+        
+        sale.assign_milestone_structure(self.structure)
+        
+        self.assertEqual(PaymentScheduleEntry.objects.filter(sale=sale).count(), 2)
+    
+    def test_rebuild_command(self):
+        """Test that the rebuild command recreates the ledger from scratch."""
+        PaymentScheduleEntry.objects.all().delete()
+        out = StringIO()
+        
+        call_command('rebuild_payment_schedule', '--chunk-size', '1', stdout=out)
+        
+        self.assertIn("2 entries", out.getvalue())
+        self.assertEqual(self.ledger_schedule(self.sale), self.sale.get_milestone_schedule())
+
+
+class SaleImportTest(TestCase):
+    """Test cases for the streaming CSV / JSON Lines importer."""
+    
+    def setUp(self):
+        """Set up a structure for imported sales to reference."""
+        self.structure = PaymentMilestoneStructure.objects.create(name='Import Structure')
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+    
+    def make_csv(self):
+        return StringIO(
+            "name,vendor,sale_type,quantity,total_amount,project_start_date,milestone_structure_id\n"
+            f"Pump,Acme,vendor,2,1000.00,2024-01-01,{self.structure.id}\n"
+            "Valve,,customer,1,250.50,2024-02-01,\n"
+            "Broken,,vendor,0,100.00,2024-01-01,\n"
+            "Orphan,,vendor,1,100.00,2024-01-01,99999\n"
+            f"Motor,,vendor,3,3000,2024-03-01,{self.structure.id}\n"
+            "Late,,vendor,1,100.00,not-a-date,\n"
+        )
+    
+    def test_import_csv(self):
+        """Test that valid rows are inserted and invalid ones reported by line."""
+        result = import_sales(self.make_csv(), 'csv', chunk_size=2)
+        
+        self.assertEqual(result.created, 3)
+        self.assertEqual(result.error_count, 3)
+        self.assertEqual(
+            sorted((error['line'], error['error']) for error in result.errors),
+            [
+                (4, 'Quantity must be greater than 0'),
+                (5, 'Milestone structure does not exist'),
+                (7, 'Project start date must be in YYYY-MM-DD format'),
+            ]
+        )
+        pump = EquipmentSale.objects.get(name='Pump')
+        self.assertEqual(pump.vendor, 'Acme')
+        self.assertEqual(pump.milestone_structure, self.structure)
+        self.assertEqual(EquipmentSale.objects.get(name='Valve').sale_type, 'customer')
+        # The ledger is populated for the imported sales with a structure
+        self.assertEqual(PaymentScheduleEntry.objects.count(), 2)
+    
+    def test_import_jsonl(self):
+        """Test JSON Lines input, including malformed lines."""
+        stream = StringIO(
+            f'{{"name": "Pump", "quantity": 2, "total_amount": 1000.5, "project_start_date": "2024-01-01", '
+            f'"milestone_structure_id": {self.structure.id}}}\n'
+            '\n'
+            '{"name": "Half", "quantity": 1.5, "total_amount": 10, "project_start_date": "2024-01-01"}\n'
+            'not json\n'
+        )
+        
+        result = import_sales(stream, 'jsonl')
+        
+        self.assertEqual(result.created, 1)
+        self.assertEqual(EquipmentSale.objects.get().total_amount, Decimal('1000.50'))
+        self.assertEqual(
+            [(error['line'], error['error']) for error in result.errors],
+            [(3, 'Quantity must be an integer'), (4, 'Invalid JSON object')]
+        )
+    
+    def test_import_missing_columns(self):
+        """Test that a CSV without the required columns is rejected up front."""
+        with self.assertRaises(SaleImportError):
+            import_sales(StringIO("name,quantity\nPump,1\n"), 'csv')
+    
+    def test_import_command(self):
+        """Test the import_sales management command."""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write(self.make_csv().getvalue())
+        self.addCleanup(os.remove, f.name)
+        out = StringIO()
+        
+        call_command('import_sales', f.name, '--chunk-size', '2', stdout=out, stderr=StringIO())
+        
+        self.assertIn('Imported 3 equipment sales (3 rows skipped)', out.getvalue())
+        
+        with self.assertRaises(CommandError):
+            call_command('import_sales', f.name + '.txt', stdout=StringIO())
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+class LedgerArrowExportTest(TestCase):
+    """Test cases for the Arrow / Parquet ledger export."""
+    
+    def setUp(self):
+        """Set up five sales on a two-milestone structure."""
+        structure = PaymentMilestoneStructure.objects.create(name='Arrow Structure')
+        for i in range(2):
+            PaymentMilestone.objects.create(
+                structure=structure,
+                name=f'Payment {i + 1}',
+                payment_percentage=Decimal('50.00'),
+                net_terms_days=10,
+                days_after_previous=20 * i,
+                order=i
+            )
+        for i in range(5):
+            EquipmentSale.objects.create(
+                name=f'Arrow Sale {i}',
+                sale_type='customer' if i % 2 else 'vendor',
+                quantity=1,
+                total_amount=Decimal('100.01') * (i + 1),
+                milestone_structure=structure,
+                project_start_date=date(2024, 1, 1)
+            )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+    
+    def test_record_batches(self):
+        """Test that the ledger is split into batches of the requested size."""
+        batches = list(iter_ledger_record_batches(batch_size=4))
+        
+        self.assertEqual([batch.num_rows for batch in batches], [4, 4, 2])
+        self.assertEqual(batches[0].schema.field('payment_amount').type.scale, 6)
+    
+    def test_export_parquet(self):
+        """Test the Parquet export matches the ledger."""
+        import pyarrow.parquet as pq
+        path = os.path.join(self.tmpdir.name, 'ledger.parquet')
+        out = StringIO()
+        
+        call_command('export_payment_ledger', path, '--batch-size', '3', stdout=out)
+        
+        table = pq.read_table(path)
+        self.assertIn('Exported 10 payments', out.getvalue())
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(
+            sum(table.column('payment_amount').to_pylist()),
+            sum(PaymentScheduleEntry.objects.values_list('payment_amount', flat=True))
+        )
+        self.assertEqual(table.column('payment_due_date').to_pylist()[0], date(2024, 1, 11))
+    
+    def test_export_arrow(self):
+        """Test that the Arrow IPC file can be memory-mapped."""
+        import pyarrow as pa
+        path = os.path.join(self.tmpdir.name, 'ledger.arrow')
+        
+        call_command('export_payment_ledger', path, stdout=StringIO())
+        
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(set(table.column('sale_type').to_pylist()), {'vendor', 'customer'})
+
+
+class LoadDataTest(TestCase):
+    """Test the synthetic dataset generator."""
+
+    def generate(self, seed=0, prefix='Load'):
+        out = StringIO()
+        call_command(
+            'generate_load_data', '--structures', '5', '--projects', '3', '--sales', '50',
+            '--seed', str(seed), '--chunk-size', '7', '--prefix', prefix, stdout=out
+        )
+        return out.getvalue()
+
+    def test_generate_load_data(self):
+        """Test the row counts, the percentage totals and the ledger."""
+        output = self.generate()
+        
+        self.assertIn("Created 5 structures, 20 milestones, 3 projects, 50 sales", output)
+        self.assertEqual(PaymentMilestone.objects.count(), 20)
+        self.assertFalse(PaymentMilestoneStructure.objects.over_allocated().exists())
+        for structure in PaymentMilestoneStructure.objects.all():
+            total = sum(m.payment_percentage for m in structure.milestones.all())
+            self.assertEqual(total, Decimal('100.00'))
+        with_structure = EquipmentSale.objects.filter(milestone_structure__isnull=False).count()
+        self.assertEqual(PaymentScheduleEntry.objects.count(), with_structure * 4)
+
+    def test_generate_load_data_is_deterministic(self):
+        """Test that the same seed produces the same sales."""
+        fields = ('vendor', 'sale_type', 'quantity', 'total_amount', 'project_start_date')
+        self.generate(seed=3, prefix='A')
+        first = list(EquipmentSale.objects.order_by('id').values_list(*fields))
+        self.generate(seed=3, prefix='B')
+        second = list(EquipmentSale.objects.order_by('id').values_list(*fields))[len(first):]
+        
+        self.assertEqual(first, second)
+
+    def test_generate_load_data_existing_prefix(self):
+        """Test that reusing a prefix is reported as a command error."""
+        self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN is SQLite syntax")
+class QueryPlanTest(TestCase):
+    """Test that the hot query paths are served by indexes."""
+    
+    def explain(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return "\n".join(row[-1] for row in cursor.fetchall())
+    
+    def index_name(self, model, fields):
+        return next(index.name for index in model._meta.indexes if index.fields == fields)
+    
+    def test_sale_list(self):
+        """Test that the default sale ordering reads the created_at index."""
+        plan = self.explain(EquipmentSale.objects.all()[:20])
+        
+        self.assertIn(self.index_name(EquipmentSale, ['created_at']), plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+    
+    def test_project_sales(self):
+        """Test that a project's sales are searched by the composite index."""
+        plan = self.explain(EquipmentSale.objects.filter(project_id=1).order_by('-created_at'))
+        
+        self.assertIn(f"USING INDEX {self.index_name(EquipmentSale, ['project', 'created_at'])}", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+    
+    def test_sales_by_type_and_start_date(self):
+        """Test filtering by sale type and a project start date range."""
+        plan = self.explain(
+            EquipmentSale.objects.filter(sale_type='vendor', project_start_date__gte=date(2024, 1, 1))
+        )
+        
+        self.assertIn(
+            f"USING INDEX {self.index_name(EquipmentSale, ['sale_type', 'project_start_date'])} "
+            "(sale_type=? AND project_start_date>?)",
+            plan
+        )
+    
+    def test_structure_sales(self):
+        """Test that sales of a structure use the foreign key index."""
+        plan = self.explain(EquipmentSale.objects.filter(milestone_structure_id=1))
+        
+        self.assertIn("USING INDEX", plan)
+        self.assertIn("(milestone_structure_id=?)", plan)
+    
+    def test_structure_milestones(self):
+        """Test that a structure's ordered milestones need no sort."""
+        plan = self.explain(PaymentMilestone.objects.filter(structure_id=1).order_by('order'))
+        
+        self.assertIn("(structure_id=?)", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+    
+    def test_project_list(self):
+        """Test that the default project ordering reads the created_at index."""
+        plan = self.explain(Project.objects.all()[:20])
+        
+        self.assertIn(self.index_name(Project, ['created_at']), plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
 class EquipmentSaleMilestoneAssignmentTest(TestCase):
     """Test cases for milestone assignment functionality."""
     
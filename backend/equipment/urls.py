@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EquipmentSaleViewSet
+from .views import EquipmentSaleViewSet, EquipmentSaleScheduleView, EquipmentSaleSchedulesView
 
 router = DefaultRouter()
 router.register(r'sales', EquipmentSaleViewSet)
 
 urlpatterns = [
+    # Async JSON reads; take precedence over the router's routes for the same paths
+    path('sales/schedules/', EquipmentSaleSchedulesView.as_view(), name='equipmentsale-schedules'),
+    path('sales/<str:pk>/schedule/', EquipmentSaleScheduleView.as_view(), name='equipmentsale-schedule'),
     path('', include(router.urls)),
 ]
 
@@ -1,9 +1,28 @@
+import io
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
-from .models import EquipmentSale
-from .serializers import EquipmentSaleSerializer, EquipmentSaleScheduleSerializer, MilestoneAssignmentSerializer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from .models import EquipmentSale, PaymentScheduleEntry
+from .exports import schedule_csv_response
+from .importers import FILE_FORMATS, SaleImportError, get_file_format, import_sales
+from .ledger import get_ledger_schedules
+from .serializers import (
+    EquipmentSaleSerializer,
+    EquipmentSaleBulkSerializer,
+    EquipmentSaleScheduleSerializer,
+    MilestoneAssignmentSerializer
+)
 from milestones.models import PaymentMilestoneStructure
+from milestone_backend.conditional import conditional_get
+from milestone_backend.async_views import AsyncPayloadView, get_action_view
+from milestone_backend.payload_cache import SCHEDULE, get_payload, get_payloads, get_version, get_versions
+from milestone_backend.renderers import CSVRenderer
 
 class EquipmentSaleViewSet(viewsets.ModelViewSet):
     """
@@ -12,6 +31,18 @@ class EquipmentSaleViewSet(viewsets.ModelViewSet):
     """
     queryset = EquipmentSale.objects.all()
     serializer_class = EquipmentSaleSerializer
+    # Keyset pagination order; the last field must be unique
+    ordering = ('-created_at', '-id')
+    # Sales serialized per chunk when ?stream=true is used on schedules
+    stream_chunk_size = 500
+    # Maximum number of rows accepted by the bulk action
+    bulk_max_size = 5000
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            return queryset.with_structure()
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'schedule':
@@ -59,20 +90,148 @@ class EquipmentSaleViewSet(viewsets.ModelViewSet):
         """
         Get the milestone schedule for a specific equipment sale.
         Returns data formatted for gantt chart visualization.
+        Supports conditional GET via ETag; the payload
+        itself is served from the payload cache.
         """
-        equipment_sale = self.get_object()
-        serializer = self.get_serializer(equipment_sale)
-        return Response(serializer.data)
+        try:
+            validators = self.get_queryset().filter(pk=pk).schedule_validators()
+        except (TypeError, ValueError):
+            # Malformed pk, answered with a 404 by get_schedule_response()
+            validators = None
+        return conditional_get(request, validators, lambda: self.get_schedule_response(validators))
+    
+    def get_schedule_response(self, validators):
+        try:
+            pk = int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+        payload = get_schedule_payload(pk, validators)
+        if payload is None:
+            raise Http404
+        return Response(payload)
     
-    @action(detail=False, methods=['get'])
-    def schedules(self, request):
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer]
+    )
+    def schedules(self, request, format=None):
         """
         Get milestone schedules for all equipment sales.
         Returns data formatted for gantt chart visualization.
+        Pass ?stream=true to receive the JSON array incrementally.
+        schedules.csv streams one CSV row per payment instead.
+        Supports conditional GET via ETag; per-sale payloads
+        are served from the payload cache.
+        """
+        return conditional_get(
+            request,
+            self.get_queryset().schedule_validators(),
+            self.get_schedules_response
+        )
+    
+    def get_schedules_response(self):
+        if self.request.accepted_renderer.format == 'csv':
+            return schedule_csv_response()
+        
+        sales = self.get_queryset()
+        if self.request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return StreamingHttpResponse(
+                self.stream_schedules(sales),
+                content_type='application/json'
+            )
+        
+        return Response(get_schedules_payload(sales, self.stream_chunk_size))
+    
+    def stream_schedules(self, sales):
+        """
+        Yield the schedules payload as JSON text, one chunk of sales at a time.
+        Only stream_chunk_size sales and their ledger entries are held in
+        memory at once, so peak memory does not grow with the table.
+        """
+        encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+        rows = sales.schedule_validators_by_sale().iterator(chunk_size=self.stream_chunk_size)
+        chunk = {}
+        separator = ''
+        yield '['
+        for sale_id, version in get_versions(rows):
+            chunk[sale_id] = version
+            if len(chunk) >= self.stream_chunk_size:
+                yield separator + self.encode_schedules(chunk, encoder)
+                separator = ','
+                chunk = {}
+        if chunk:
+            yield separator + self.encode_schedules(chunk, encoder)
+        yield ']'
+    
+    def encode_schedules(self, versions, encoder):
+        """Serialize a chunk of sales as comma-separated JSON objects."""
+        return ','.join(encoder.encode(item) for item in get_schedule_payloads(versions))
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create and update many equipment sales in one request.
+        Expects a list of sales; rows with an id update that sale, rows
+        without one create a sale. Either every row is saved or, if any
+        row is invalid, none is and a list of per-row errors is returned.
         """
-        equipment_sales = self.get_queryset()
-        serializer = EquipmentSaleScheduleSerializer(equipment_sales, many=True)
-        return Response(serializer.data)
+        serializer = EquipmentSaleBulkSerializer(
+            data=request.data,
+            many=True,
+            max_length=self.bulk_max_size
+        )
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        sales = serializer.save()
+        sales_by_id = EquipmentSale.objects.with_structure().in_bulk([sale.pk for sale in sales])
+        response_serializer = EquipmentSaleSerializer(
+            [sales_by_id[sale.pk] for sale in sales],
+            many=True
+        )
+        created = any('id' not in row for row in serializer.validated_data)
+        return Response(
+            response_serializer.data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+    
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        url_name='import',
+        parser_classes=[MultiPartParser]
+    )
+    def import_file(self, request):
+        """
+        Import equipment sales from an uploaded CSV or JSON Lines file.
+        Expects the file in the 'file' field; the format is taken from the
+        'file_format' field or the file extension. Invalid rows are skipped
+        and reported with their line numbers.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': ['No file was submitted.']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        file_format = request.data.get('file_format') or get_file_format(upload.name)
+        if file_format not in FILE_FORMATS:
+            return Response(
+                {'file_format': [f"Expected one of: {', '.join(FILE_FORMATS)}"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        try:
+            result = import_sales(stream, file_format)
+        except (UnicodeDecodeError, SaleImportError) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'created': result.created,
+            'error_count': result.error_count,
+            'errors': result.errors,
+        }, status=status.HTTP_201_CREATED if result.created else status.HTTP_200_OK)
     
     @action(detail=True, methods=['post'])
     def assign_milestone(self, request, pk=None):
@@ -109,4 +268,80 @@ class EquipmentSaleViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def build_schedule_payloads(sale_ids):
+    """Serialize the schedules of the given sales, keyed by sale id."""
+    equipment_sales = EquipmentSale.objects.with_structure().filter(pk__in=sale_ids)
+    schedules = get_ledger_schedules(
+        PaymentScheduleEntry.objects.filter(sale_id__in=sale_ids)
+    )
+    serializer = EquipmentSaleScheduleSerializer(
+        equipment_sales,
+        many=True,
+        context={'milestone_schedules': schedules}
+    )
+    return {item['id']: item for item in serializer.data}
+
+
+def get_schedule_payload(pk, validators):
+    """
+    Schedule payload of one sale from the payload cache, or None.
+    validators are the sale's schedule_validators(), None if it does not exist.
+    """
+    if validators is None:
+        return None
+    return get_payload(SCHEDULE, pk, get_version(validators), build_schedule_payloads)
+
+
+def get_schedule_payloads(versions):
+    """
+    Schedule payloads of the sales in versions (sale id -> version, see
+    get_versions()) in order, from the payload cache.
+    """
+    payloads = get_payloads(SCHEDULE, versions, build_schedule_payloads)
+    return [payloads[pk] for pk in versions if pk in payloads]
+
+
+def get_schedules_payload(sales, chunk_size):
+    """
+    Schedule payloads of all the sales of a queryset, built chunk_size sales
+    at a time.
+    """
+    versions = list(get_versions(sales.schedule_validators_by_sale()))
+    payloads = []
+    for start in range(0, len(versions), chunk_size):
+        payloads.extend(get_schedule_payloads(dict(versions[start:start + chunk_size])))
+    return payloads
+
+
+class EquipmentSaleScheduleView(AsyncPayloadView):
+    """Async JSON version of EquipmentSaleViewSet.schedule."""
+    sync_view = staticmethod(get_action_view(EquipmentSaleViewSet, 'schedule', 'equipmentsale'))
+    
+    async def get_validators(self, pk):
+        return await EquipmentSale.objects.filter(pk=pk).aschedule_validators()
+    
+    async def get_payload(self, validators, pk):
+        return await sync_to_async(get_schedule_payload)(int(pk), validators)
+
+
+class EquipmentSaleSchedulesView(AsyncPayloadView):
+    """Async JSON version of EquipmentSaleViewSet.schedules; ?stream=true is served by the DRF action."""
+    sync_view = staticmethod(get_action_view(EquipmentSaleViewSet, 'schedules', 'equipmentsale'))
+    
+    def use_sync_view(self, request):
+        return (
+            super().use_sync_view(request)
+            or request.GET.get('stream', '').lower() in ('1', 'true', 'yes')
+        )
+    
+    async def get_validators(self):
+        return await EquipmentSale.objects.aschedule_validators()
+    
+    async def get_payload(self, validators):
+        return await sync_to_async(get_schedules_payload)(
+            EquipmentSale.objects.all(),
+            EquipmentSaleViewSet.stream_chunk_size
+        )
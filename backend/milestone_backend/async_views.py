@@ -0,0 +1,86 @@
+"""
+Async read endpoints.
+
+DRF views are synchronous. Under ASGI every request they handle holds a
+thread while it waits on the database. The schedule and timeline reads are
+the bulk of dashboard traffic, so their JSON responses are also served by
+plain Django async views. These check the conditional GET validators with
+the async ORM and serve 304s without a thread hop. Payloads come from the
+same sync functions as the DRF actions, called with sync_to_async, and are
+rendered with DRF's JSONRenderer, so the responses match. CSV exports and
+streamed responses are handed to the existing DRF action (see sync_view).
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+
+from .conditional import aconditional_get
+
+
+def get_action_view(viewset, action_name, basename):
+    """
+    Build the view of a ViewSet GET action the way a DRF router does,
+    including the @action options such as renderer_classes.
+    """
+    action = getattr(viewset, action_name)
+    return viewset.as_view(
+        {'get': action_name},
+        basename=basename,
+        detail=action.detail,
+        **action.kwargs
+    )
+
+
+class AsyncPayloadView(View):
+    """
+    Conditional GET of a cached JSON payload.
+
+    Subclasses implement get_validators() and get_payload() as coroutines
+    and set sync_view to the DRF view serving the same URL.
+    """
+
+    http_method_names = ['get', 'head', 'options']
+    # DRF view for the requests handled synchronously (see use_sync_view())
+    sync_view = None
+
+    async def get(self, request, **kwargs):
+        if self.use_sync_view(request):
+            return await sync_to_async(self.sync_view)(request, **kwargs)
+        try:
+            validators = await self.get_validators(**kwargs)
+        except (TypeError, ValueError):
+            # Malformed pk, answered with a 404 by respond()
+            validators = None
+        return await aconditional_get(request, validators, lambda: self.respond(validators, **kwargs))
+
+    def use_sync_view(self, request):
+        """Anything but plain JSON (e.g. ?format=csv) goes to the DRF view."""
+        return (
+            request.GET.get('format', 'json') != 'json'
+            or 'text/csv' in request.headers.get('Accept', '')
+        )
+
+    async def respond(self, validators, **kwargs):
+        try:
+            payload = await self.get_payload(validators, **kwargs)
+        except (TypeError, ValueError):
+            payload = None
+        if payload is None:
+            return self.render({'detail': 'Not found.'}, status=404)
+        return self.render(payload)
+
+    def render(self, data, status=200):
+        response = HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+        # Unrendered data, as on rest_framework.response.Response
+        response.data = data
+        return response
+
+    async def get_validators(self, **kwargs):
+        """Validator dict for conditional_get(), or None."""
+        raise NotImplementedError
+
+    async def get_payload(self, validators, **kwargs):
+        """The JSON payload given the get_validators() result, or None for a 404."""
+        raise NotImplementedError
@@ -0,0 +1,69 @@
+"""
+Conditional GET for the schedule and timeline endpoints.
+
+Each endpoint describes the data behind its payload with one aggregate
+query (latest updated_at values and row counts). The ETag is a hash of
+those values and the request path. When the client's If-None-Match still
+matches, a 304 is returned before anything is loaded or serialized.
+
+No Last-Modified is sent: deleting a sale or moving it to another project
+leaves the latest updated_at unchanged, and only the counts in the ETag
+notice it, so If-Modified-Since would get 304s for changed content.
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+def get_etag(request, validators):
+    """Hash the request path together with the validator values."""
+    data = repr((request.get_full_path(), sorted(validators.items())))
+    return quote_etag(hashlib.md5(data.encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_get(request, validators, respond):
+    """
+    Return 304 Not Modified if the client's cached copy is still current,
+    otherwise call respond() and attach the ETag header.
+
+    Args:
+        request: The incoming request
+        validators: Dict of timestamps and counts from one aggregate query,
+            or None when there is nothing to validate (e.g. a missing object)
+        respond: Callable building the full response
+
+    Returns:
+        HttpResponse
+    """
+    if validators is None:
+        return respond()
+
+    etag = get_etag(request, validators)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = respond()
+    return set_validator_headers(response, etag)
+
+
+async def aconditional_get(request, validators, respond):
+    """Async version of conditional_get(); respond is a coroutine function."""
+    if validators is None:
+        return await respond()
+
+    etag = get_etag(request, validators)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = await respond()
+    return set_validator_headers(response, etag)
+
+
+def set_validator_headers(response, etag):
+    """Attach the ETag to 200 and 304 responses."""
+    if response.status_code not in (200, 304):
+        return response
+    response.headers['ETag'] = etag
+    return response
@@ -0,0 +1,335 @@
+"""
+Project-wide middleware.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# QueryStats of the request being handled in the current context
+current_query_stats = ContextVar('current_query_stats', default=None)
+
+
+class QueryStats:
+    """Number of queries and cumulative database time of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0  # seconds
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding each query to the current request's QueryStats."""
+    stats = current_query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - start
+
+
+def install_query_recorder(connection, **kwargs):
+    """
+    Add record_query() to a connection's execute wrappers, once.
+    It goes first in the list: connection.execute_wrapper() pops the last
+    wrapper on exit, so when a connection is opened inside such a block an
+    appended recorder would be removed in place of the caller's wrapper.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def install_query_recorders(**kwargs):
+    """
+    Install record_query() on the connections already open in this thread.
+    Connected to request_started, whose receivers run in the thread that
+    handles the request's database work (also for async requests).
+    """
+    for connection in connections.all(initialized_only=True):
+        install_query_recorder(connection)
+
+
+def get_view_name(request):
+    """
+    Name of the view that handled a request, e.g. 'ProjectViewSet.timelines'
+    for a ViewSet action or 'ProjectTimelinesView.get' for a class-based view.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    func = match.func
+    viewset = getattr(func, 'cls', None)
+    actions = getattr(func, 'actions', None)
+    if viewset is not None and actions:
+        return f"{viewset.__name__}.{actions.get(request.method.lower(), request.method.lower())}"
+    view_class = getattr(func, 'view_class', viewset)
+    if view_class is not None:
+        return f"{view_class.__name__}.{request.method.lower()}"
+    return func.__qualname__
+
+
+class QueryTimingMiddleware:
+    """
+    Count the queries and database time of each request.
+
+    The totals are returned in Server-Timing ('db' and 'total' metrics) and
+    X-Query-Count headers. Requests with more than QUERY_TIMING_MAX_QUERIES
+    queries or taking longer than QUERY_TIMING_MAX_MS milliseconds are
+    logged as warnings together with the view name, so N+1 regressions
+    show up in the logs. Disabled with QUERY_TIMING_ENABLED = False.
+
+    Queries are recorded by an execute wrapper installed on every database
+    connection (see install_query_recorders()). It reports to the current request through a context
+    variable, which also covers queries that async views run in worker
+    threads. Streaming response bodies are produced after the headers are
+    sent and are not included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_TIMING_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.max_queries = getattr(settings, 'QUERY_TIMING_MAX_QUERIES', 50)
+        self.max_ms = getattr(settings, 'QUERY_TIMING_MAX_MS', 1000)
+        connection_created.connect(install_query_recorder, dispatch_uid='install_query_recorder')
+        request_started.connect(install_query_recorders, dispatch_uid='install_query_recorders')
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, start = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    async def __acall__(self, request):
+        stats, token, start = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_stats.reset(token)
+        return self.finish(request, response, stats, start)
+
+    def start(self):
+        stats = QueryStats()
+        return stats, current_query_stats.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, start):
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = stats.duration * 1000
+        response.headers['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", total;dur={total_ms:.1f}'
+        )
+        response.headers['X-Query-Count'] = str(stats.count)
+
+        if stats.count > self.max_queries or total_ms > self.max_ms:
+            logger.warning(
+                "%s %s (%s): %d queries, %.1f ms in the database, %.1f ms total",
+                request.method, request.path, get_view_name(request) or 'no view',
+                stats.count, db_ms, total_ms,
+            )
+        return response
+
+
+class SerializedWritesMiddleware:
+    """
+    Handle write requests (anything but GET, HEAD and OPTIONS) one at a time
+    within this process. Other write requests wait on a lock instead of
+    competing for SQLite's write lock, where the loser sleeps and retries
+    until busy_timeout. Reads are not affected.
+
+    Enabled by the SERIALIZE_WRITES setting. It cannot order writes across
+    several worker processes; those still rely on busy_timeout.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SERIALIZE_WRITES', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+        with self.lock:
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.method in SAFE_METHODS:
+            return await self.get_response(request)
+        # Wait for the lock in a worker thread, not on the event loop
+        acquire = asyncio.ensure_future(sync_to_async(self.lock.acquire, thread_sensitive=False)())
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The worker thread cannot be stopped and still takes the lock
+            # (e.g. when the client disconnected); release it once it has
+            acquire.add_done_callback(self.release_acquired)
+            raise
+        try:
+            return await self.get_response(request)
+        finally:
+            self.lock.release()
+
+    def release_acquired(self, acquire):
+        if not acquire.cancelled() and acquire.exception() is None:
+            self.lock.release()
+
+
+class ProfilingMiddleware:
+    """
+    Profile individual requests with cProfile.
+
+    Enabled by PROFILING_ENABLED. A request is profiled when it asks for it,
+    with an X-Profile header or a profile query parameter:
+
+    - 'file' (or '1'): the profile is written to PROFILING_DIR and its name
+      returned in an X-Profile-File header.
+    - 'summary': the response is replaced by a plain-text pstats summary
+      of the PROFILING_SUMMARY_LIMIT functions with the most cumulative time.
+
+    An X-Profile-Secret header must match PROFILING_SECRET. Without a
+    secret, requests can only ask for a profile under DEBUG, as a summary
+    exposes module paths and each profile blocks the others.
+    Independently, PROFILING_SAMPLE_RATE (0 to 1) profiles that share of
+    all requests to PROFILING_DIR, so it can be left on at a low rate.
+
+    Only one request per process is profiled at a time: Python's profiler
+    hook is process-wide (on 3.12+ a second one raises), so a request that
+    arrives while another is being profiled is served unprofiled.
+
+    Profile files are standard pstats dumps, e.g. for snakeviz or
+    python -m pstats. Under ASGI only the event loop thread is profiled, so
+    work that async views hand to worker threads is missing, and other
+    requests running on the loop meanwhile are included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    MODES = ('file', 'summary')
+
+    # Held while a request is being profiled
+    lock = threading.Lock()
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = Path(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.secret = getattr(settings, 'PROFILING_SECRET', '')
+        self.summary_limit = getattr(settings, 'PROFILING_SUMMARY_LIMIT', 40)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = self.get_mode(request)
+        if mode is None or not self.lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            response = profiler.runcall(self.get_response, request)
+        finally:
+            self.lock.release()
+        return self.finish(request, response, profiler, mode, start)
+
+    async def __acall__(self, request):
+        mode = self.get_mode(request)
+        if mode is None or not self.lock.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                response = await self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            self.lock.release()
+        return self.finish(request, response, profiler, mode, start)
+
+    def get_mode(self, request):
+        """'file', 'summary' or None when the request is not profiled."""
+        requested = request.headers.get('X-Profile') or request.GET.get('profile')
+        if requested and self.is_authorized(request):
+            if requested == '1':
+                return 'file'
+            if requested in self.MODES:
+                return requested
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'file'
+        return None
+
+    def is_authorized(self, request):
+        if not self.secret:
+            return settings.DEBUG
+        return hmac.compare_digest(request.headers.get('X-Profile-Secret', '').encode(), self.secret.encode())
+
+    def finish(self, request, response, profiler, mode, start):
+        duration_ms = (time.perf_counter() - start) * 1000
+        if mode == 'summary':
+            return HttpResponse(self.get_summary(profiler), content_type='text/plain; charset=utf-8')
+        response.headers['X-Profile-File'] = self.write(request, profiler, duration_ms)
+        return response
+
+    def get_summary(self, profiler):
+        out = io.StringIO()
+        stats = pstats.Stats(profiler, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.summary_limit)
+        return out.getvalue()
+
+    def write(self, request, profiler, duration_ms):
+        """Dump the profile to PROFILING_DIR; returns the file name."""
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        name = (
+            f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{request.method}-{slug}-{duration_ms:.0f}ms.prof"
+        )
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(self.directory / name)
+        return name
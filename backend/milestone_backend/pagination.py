@@ -0,0 +1,143 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are located with a WHERE clause on the view's ordering columns, e.g.
+``(created_at, id) < (last_created_at, last_id)``, rather than OFFSET, so
+fetching page 1000 costs the same index seek as fetching page 1.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opt-in keyset pagination.
+
+    Lists stay plain arrays unless the request passes ``page_size`` or
+    ``cursor``. Rows are ordered by the view's ``ordering`` attribute, whose
+    last field must be unique (e.g. ``('-created_at', '-id')``). Responses
+    have the form ``{"next": <url or null>, "results": [...]}``.
+    """
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    page_size = 100
+    max_page_size = 1000
+    ordering = ('-pk',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_size_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        self.request = request
+        self.ordering = tuple(getattr(view, 'ordering', None) or self.ordering)
+        self.current_page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            values = self.parse_position(queryset.model, self.decode_cursor(cursor))
+            queryset = queryset.filter(self.get_seek_filter(values))
+
+        page = list(queryset[:self.current_page_size + 1])
+        self.has_next = len(page) > self.current_page_size
+        page = page[:self.current_page_size]
+        self.last_values = self.get_position(page[-1]) if page else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position(self, obj):
+        """Values of the ordering fields for one row."""
+        return [getattr(obj, field.lstrip('-')) for field in self.ordering]
+
+    def parse_position(self, model, values):
+        """
+        Convert decoded cursor values with the ordering fields' to_python(),
+        so a tampered or stale cursor is a 404 rather than a query error.
+        """
+        if len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        parsed = []
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            model_field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            try:
+                value = model_field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+            if value is None:
+                raise NotFound('Invalid cursor')
+            parsed.append(value)
+        return parsed
+
+    def get_seek_filter(self, values):
+        """
+        Build the row-value comparison that skips everything up to and
+        including the given position, expanded into plain comparisons:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        if len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, values):
+        # Full isoformat: DjangoJSONEncoder would truncate microseconds
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        data = json.dumps(values, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+        if not isinstance(values, list):
+            raise NotFound('Invalid cursor')
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        query = self.request.query_params.copy()
+        query[self.cursor_query_param] = self.encode_cursor(self.last_values)
+        query[self.page_size_query_param] = str(self.current_page_size)
+        return self.request.build_absolute_uri(f'{self.request.path}?{query.urlencode()}')
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,168 @@
+"""
+Cache of serialized schedule and timeline payloads.
+
+Payloads are stored per object (one entry per sale schedule and per
+project timeline) in the Django cache selected by PAYLOAD_CACHE_ALIAS, so
+list endpoints only serialize the objects missing from the cache.
+
+Each entry is stored together with the version of the object it was built
+from: a hash of the object's conditional GET validators (see get_version()),
+which callers read from the database. An entry with another version is
+rebuilt, so a payload never outlives the data behind the ETag it is served
+with, even when several processes each keep their own local-memory cache.
+The model signal receivers in equipment/signals.py and projects/signals.py
+also drop entries whenever anything they contain changes, which frees them
+early in the process that made the change.
+
+Hit and miss counters are kept in the same cache (see get_stats()).
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+SCHEDULE = 'schedule'
+TIMELINE = 'timeline'
+NAMESPACES = (SCHEDULE, TIMELINE)
+
+
+def get_cache():
+    return caches[getattr(settings, 'PAYLOAD_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'PAYLOAD_CACHE_TIMEOUT', 300)
+
+
+def make_key(namespace, pk):
+    return f'payload:{namespace}:{pk}'
+
+
+def make_stats_key(namespace, counter):
+    return f'payload-stats:{namespace}:{counter}'
+
+
+def get_version(validators):
+    """
+    Hash one object's validator values, e.g. the result of
+    schedule_validators() on a queryset of one sale.
+    """
+    data = repr(sorted(validators.items()))
+    return hashlib.md5(data.encode(), usedforsecurity=False).hexdigest()
+
+
+def get_versions(rows):
+    """
+    Yield (pk, version) for rows of validators grouped by object, e.g.
+    schedule_validators_by_sale(); each row holds the object's id.
+    """
+    for row in rows:
+        pk = row.pop('id')
+        yield pk, get_version(row)
+
+
+def get_payload(namespace, pk, version, build):
+    """
+    Get one cached payload, building it on a miss.
+
+    Args:
+        namespace: SCHEDULE or TIMELINE
+        pk: Primary key of the sale or project
+        version: Current version of the object (see get_version())
+        build: Callable taking a list of pks and returning a dict of
+            pk -> payload; pks it leaves out (e.g. deleted objects) are
+            not cached
+
+    Returns:
+        The payload, or None if build() did not produce one
+    """
+    return get_payloads(namespace, {pk: version}, build).get(pk)
+
+
+def get_payloads(namespace, versions, build):
+    """
+    Get cached payloads for many objects, building the missing or outdated
+    ones with a single call to build(). versions maps each pk to the
+    object's current version. Returns a dict of pk -> payload.
+    """
+    cache = get_cache()
+    keys = {pk: make_key(namespace, pk) for pk in versions}
+    cached = cache.get_many(list(keys.values()))
+
+    payloads = {}
+    for pk, key in keys.items():
+        version, payload = cached.get(key, (None, None))
+        if version == versions[pk]:
+            payloads[pk] = payload
+    missing = [pk for pk in keys if pk not in payloads]
+    record(namespace, hits=len(payloads), misses=len(missing))
+
+    if missing:
+        built = build(missing)
+        cache.set_many(
+            {keys[pk]: (versions[pk], payload) for pk, payload in built.items()},
+            timeout=get_timeout()
+        )
+        payloads.update(built)
+    return payloads
+
+
+def invalidate(namespace, pks):
+    """
+    Drop the cached payloads of the given objects.
+    Runs immediately and again after the surrounding transaction commits,
+    so a payload rebuilt from not yet committed data does not survive.
+    """
+    keys = [make_key(namespace, pk) for pk in pks if pk is not None]
+    if not keys:
+        return
+    cache = get_cache()
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def record(namespace, hits=0, misses=0):
+    """Add to the hit and miss counters of a namespace."""
+    cache = get_cache()
+    for counter, count in (('hits', hits), ('misses', misses)):
+        if not count:
+            continue
+        key = make_stats_key(namespace, counter)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, count, timeout=None)
+
+
+def get_stats():
+    """
+    Get hit and miss counters per namespace, e.g.
+    {'schedule': {'hits': 10, 'misses': 2, 'hit_rate': 0.833}, ...}
+    """
+    cache = get_cache()
+    keys = [make_stats_key(ns, counter) for ns in NAMESPACES for counter in ('hits', 'misses')]
+    values = cache.get_many(keys)
+
+    stats = {}
+    for namespace in NAMESPACES:
+        hits = values.get(make_stats_key(namespace, 'hits'), 0)
+        misses = values.get(make_stats_key(namespace, 'misses'), 0)
+        total = hits + misses
+        stats[namespace] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 3) if total else None,
+        }
+    return stats
+
+
+def reset_stats():
+    """Zero the hit and miss counters."""
+    get_cache().delete_many([
+        make_stats_key(ns, counter) for ns in NAMESPACES for counter in ('hits', 'misses')
+    ])
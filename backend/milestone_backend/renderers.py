@@ -0,0 +1,26 @@
+import csv
+import io
+
+from rest_framework.renderers import BaseRenderer
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Declares text/csv for content negotiation (``.csv`` suffix or
+    ``?format=csv``). Views stream the actual CSV themselves; this renderer
+    only renders what goes through a regular Response, such as error
+    details, as key,value rows.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        items = data.items() if isinstance(data, dict) else enumerate(data)
+        for key, value in items:
+            writer.writerow([key, value])
+        return buffer.getvalue().encode(self.charset)
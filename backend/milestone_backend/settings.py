@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from .sqlite import get_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -45,7 +48,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'milestone_backend.middleware.QueryTimingMiddleware',
+    'milestone_backend.middleware.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'milestone_backend.middleware.SerializedWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,13 +84,39 @@ WSGI_APPLICATION = 'milestone_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DATABASE_PROFILE=production enables WAL, tuned pragmas, IMMEDIATE
+# transactions and persistent connections (see milestone_backend/sqlite.py)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': get_database(
+        os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        os.environ.get('DATABASE_PROFILE', 'default'),
+    )
 }
 
+# Per-request query count and database time, returned in Server-Timing and
+# X-Query-Count headers; requests over either threshold are logged
+# (milestone_backend.middleware.QueryTimingMiddleware)
+QUERY_TIMING_ENABLED = True
+QUERY_TIMING_MAX_QUERIES = 50
+QUERY_TIMING_MAX_MS = 1000
+
+# Opt-in cProfile of single requests (X-Profile: file|summary header or
+# ?profile= parameter, which needs PROFILING_SECRET unless DEBUG) and of a
+# random share of all requests (milestone_backend.middleware.ProfilingMiddleware)
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_SECRET = os.environ.get('PROFILING_SECRET', '')
+
+# Handle write requests one at a time per process
+# (milestone_backend.middleware.SerializedWritesMiddleware)
+SERIALIZE_WRITES = os.environ.get('SERIALIZE_WRITES') == '1'
+
+# Holiday calendars milestone structures can count business days with:
+# name -> dotted path of a function returning the holidays (dates or
+# YYYY-MM-DD strings). Each is loaded once, on first use.
+HOLIDAY_CALENDARS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -127,6 +159,23 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache used for serialized schedule and timeline payloads
+# (milestone_backend/payload_cache.py). Local memory is per process; entries
+# are versioned, so several workers stay consistent, but pointing
+# PAYLOAD_CACHE_ALIAS at a shared backend lets them reuse each other's payloads.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'milestone-payloads',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+PAYLOAD_CACHE_ALIAS = 'default'
+PAYLOAD_CACHE_TIMEOUT = 300  # seconds
+
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -135,8 +184,12 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
+    # Opt-in: only applies when a request passes ?page_size= or ?cursor=
+    'DEFAULT_PAGINATION_CLASS': 'milestone_backend.pagination.KeysetPagination',
 }
 
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development
 CORS_ALLOW_CREDENTIALS = True
+# Let the frontend read the QueryTimingMiddleware headers
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'X-Query-Count']
@@ -0,0 +1,72 @@
+"""
+SQLite database profiles.
+
+The 'default' profile is a plain SQLite file, as created by startproject.
+The 'production' profile is meant for serving concurrent requests from one
+database file:
+
+- WAL journaling lets readers run alongside a writer.
+- synchronous=NORMAL only syncs at WAL checkpoints (safe under WAL).
+- mmap_size and cache_size keep hot pages in memory.
+- busy_timeout makes a connection wait for the write lock instead of
+  failing with "database is locked".
+- Transactions start with BEGIN IMMEDIATE, so a transaction that reads
+  before it writes takes the write lock up front. Upgrading a read lock
+  later fails at once, without honouring busy_timeout.
+- Connections are kept open between requests (CONN_MAX_AGE).
+
+The pragmas are applied by Django's init_command, which runs on every new
+connection.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+PROFILES = ('default', 'production')
+
+PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'cache_size': -64 * 1024,  # negative: KiB, i.e. 64 MiB per connection
+    'busy_timeout': 5000,  # milliseconds
+    'temp_store': 'MEMORY',
+}
+
+PRODUCTION_CONN_MAX_AGE = 600  # seconds
+
+
+def get_init_command(pragmas):
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in pragmas.items())
+
+
+def get_database(path, profile='default'):
+    """
+    Build a DATABASES entry for an SQLite file.
+
+    Args:
+        path: Path of the database file
+        profile: 'default' or 'production'
+
+    Returns:
+        Dict for settings.DATABASES
+    """
+    if profile not in PROFILES:
+        raise ImproperlyConfigured(
+            f"Unknown database profile {profile!r}, expected one of: {', '.join(PROFILES)}"
+        )
+
+    database = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+    }
+    if profile == 'production':
+        database.update({
+            'CONN_MAX_AGE': PRODUCTION_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': get_init_command(PRODUCTION_PRAGMAS),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        })
+    return database
@@ -0,0 +1,317 @@
+import asyncio
+import pstats
+import tempfile
+import threading
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from projects.models import Project
+from .middleware import ProfilingMiddleware, QueryTimingMiddleware, SerializedWritesMiddleware, record_query
+from .sqlite import PRODUCTION_PRAGMAS, get_database
+
+
+class SQLiteProfileTest(SimpleTestCase):
+    """Test cases for the SQLite database profiles."""
+
+    def test_default_profile(self):
+        """Test that the default profile is a plain database file."""
+        database = get_database('db.sqlite3')
+
+        self.assertEqual(database, {'ENGINE': 'django.db.backends.sqlite3', 'NAME': 'db.sqlite3'})
+
+    def test_unknown_profile(self):
+        """Test that an unknown profile is rejected."""
+        with self.assertRaises(ImproperlyConfigured):
+            get_database('db.sqlite3', 'fast')
+
+    def test_production_pragmas(self):
+        """Test that new production connections get the pragmas applied."""
+        with tempfile.TemporaryDirectory() as tmp:
+            settings_dict = {
+                'TIME_ZONE': None,
+                'AUTOCOMMIT': True,
+                'ATOMIC_REQUESTS': False,
+                'CONN_MAX_AGE': 0,
+                'CONN_HEALTH_CHECKS': False,
+                **get_database(str(Path(tmp) / 'db.sqlite3'), 'production'),
+            }
+            wrapper = DatabaseWrapper(settings_dict)
+            # Open the connection directly; SimpleTestCase blocks ensure_connection()
+            connection = wrapper.get_new_connection(wrapper.get_connection_params())
+            try:
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                    value = connection.execute(f'PRAGMA {pragma}').fetchone()[0]
+                    expected = {'WAL': 'wal', 'NORMAL': 1}.get(PRODUCTION_PRAGMAS[pragma], PRODUCTION_PRAGMAS[pragma])
+                    self.assertEqual(value, expected, pragma)
+            finally:
+                connection.close()
+
+        self.assertEqual(wrapper.transaction_mode, 'IMMEDIATE')
+
+
+class SerializedWritesMiddlewareTest(SimpleTestCase):
+    """Test cases for the in-process write lock."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    @override_settings(SERIALIZE_WRITES=False)
+    def test_disabled(self):
+        """Test that the middleware removes itself unless enabled."""
+        with self.assertRaises(MiddlewareNotUsed):
+            SerializedWritesMiddleware(lambda request: HttpResponse())
+
+    @override_settings(SERIALIZE_WRITES=True)
+    def test_writes_hold_lock(self):
+        """Test that writes run under the lock and reads do not."""
+        held = {}
+
+        def get_response(request):
+            held[request.method] = SerializedWritesMiddleware.lock.locked()
+            return HttpResponse()
+
+        middleware = SerializedWritesMiddleware(get_response)
+        middleware(self.factory.get('/'))
+        middleware(self.factory.post('/'))
+
+        self.assertEqual(held, {'GET': False, 'POST': True})
+        self.assertFalse(SerializedWritesMiddleware.lock.locked())
+
+    @override_settings(SERIALIZE_WRITES=True)
+    def test_writes_do_not_overlap(self):
+        """Test that concurrent writes are handled one at a time."""
+        active = []
+        overlaps = []
+
+        def get_response(request):
+            active.append(request)
+            overlaps.append(len(active) > 1)
+            threading.Event().wait(0.01)
+            active.remove(request)
+            return HttpResponse()
+
+        middleware = SerializedWritesMiddleware(get_response)
+        threads = [
+            threading.Thread(target=middleware, args=(self.factory.post('/'),)) for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(overlaps, [False] * 4)
+
+    @override_settings(SERIALIZE_WRITES=True)
+    def test_async_writes_hold_lock(self):
+        """Test that the middleware stays async in front of async views."""
+        held = {}
+
+        async def get_response(request):
+            held[request.method] = SerializedWritesMiddleware.lock.locked()
+            return HttpResponse()
+
+        middleware = SerializedWritesMiddleware(get_response)
+        asyncio.run(middleware(self.factory.get('/')))
+        asyncio.run(middleware(self.factory.post('/')))
+
+        self.assertEqual(held, {'GET': False, 'POST': True})
+        self.assertFalse(SerializedWritesMiddleware.lock.locked())
+
+    @override_settings(SERIALIZE_WRITES=True)
+    def test_cancelled_async_write_releases_lock(self):
+        """Test that a write cancelled while waiting for the lock does not keep it."""
+        async def get_response(request):
+            await asyncio.sleep(0.05)
+            return HttpResponse()
+
+        middleware = SerializedWritesMiddleware(get_response)
+
+        async def run():
+            slow = asyncio.create_task(middleware(self.factory.post('/')))
+            await asyncio.sleep(0.01)
+            queued = asyncio.create_task(middleware(self.factory.post('/')))
+            await asyncio.sleep(0.01)
+            queued.cancel()
+            await slow
+            with self.assertRaises(asyncio.CancelledError):
+                await queued
+            # Let the worker thread take and hand back the lock
+            await asyncio.sleep(0.05)
+
+        asyncio.run(run())
+
+        self.assertFalse(SerializedWritesMiddleware.lock.locked())
+
+
+class QueryTimingMiddlewareTest(TestCase):
+    """Test cases for the per-request query instrumentation."""
+
+    def setUp(self):
+        for i in range(3):
+            Project.objects.create(name=f'Timing Project {i}', start_date='2024-01-01')
+
+    def test_headers(self):
+        """Test that the query count and timings are returned as headers."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('project-list'))
+
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[0-9.]+;desc="{len(queries)} queries", total;dur=[0-9.]+$'
+        )
+
+    async def test_async_view_queries_are_counted(self):
+        """Test that queries run by async views are included."""
+        response = await self.async_client.get(reverse('project-timelines'))
+
+        self.assertGreater(int(response['X-Query-Count']), 0)
+
+    def test_connection_opened_inside_execute_wrapper(self):
+        """Test that a caller's execute wrapper is still the one removed at the end of its block."""
+        QueryTimingMiddleware(lambda request: HttpResponse())
+        wrappers = []
+
+        def blocker(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        def run():
+            # New thread, so the connection is opened inside the block
+            try:
+                with connection.execute_wrapper(blocker):
+                    connection.cursor().execute('SELECT 1')
+                wrappers.extend(connection.execute_wrappers)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+
+        self.assertEqual(wrappers, [record_query])
+
+    @override_settings(QUERY_TIMING_MAX_QUERIES=1)
+    def test_slow_request_logged(self):
+        """Test that requests over the query threshold are logged with the view name."""
+        with self.assertLogs('milestone_backend.middleware', 'WARNING') as logs:
+            self.client.get(reverse('project-list'))
+
+        self.assertIn('GET /api/projects/ (ProjectViewSet.list)', logs.output[0])
+
+    def test_fast_request_not_logged(self):
+        """Test that requests under the thresholds are not logged."""
+        with self.assertNoLogs('milestone_backend.middleware', 'WARNING'):
+            self.client.get(reverse('project-list'), {'view': 'summary'})
+
+
+class ProfilingMiddlewareTest(TestCase):
+    """Test cases for the opt-in request profiler."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.url = reverse('project-list')
+
+    def profiles(self):
+        return sorted(Path(self.tmp.name).glob('*.prof'))
+
+    def test_disabled_by_default(self):
+        """Test that profiling requests are ignored unless enabled."""
+        response = self.client.get(self.url, {'profile': 'summary'})
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware(lambda request: HttpResponse())
+
+    def test_summary(self):
+        """Test that ?profile=summary returns a pstats summary instead of the response."""
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, DEBUG=True):
+            response = self.client.get(self.url, {'profile': 'summary'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertIn('function calls', response.content.decode())
+        self.assertEqual(self.profiles(), [])
+
+    def test_profile_file(self):
+        """Test that X-Profile: file writes a pstats dump."""
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, DEBUG=True):
+            response = self.client.get(self.url, headers={'X-Profile': 'file'})
+
+        self.assertEqual(response['Content-Type'], 'application/json')
+        [profile] = self.profiles()
+        self.assertEqual(profile.name, response['X-Profile-File'])
+        self.assertIn('-GET-api-projects-', profile.name)
+        self.assertGreater(pstats.Stats(str(profile)).total_calls, 0)
+
+    def test_secret(self):
+        """Test that a configured secret must be sent along."""
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, PROFILING_SECRET='s3cret'):
+            response = self.client.get(self.url, headers={'X-Profile': 'file'})
+            self.assertNotIn('X-Profile-File', response)
+
+            response = self.client.get(self.url, headers={'X-Profile': 'file', 'X-Profile-Secret': 's3cret'})
+            self.assertIn('X-Profile-File', response)
+
+    def test_no_secret_outside_debug(self):
+        """Test that without a secret, requests cannot ask for a profile unless DEBUG is on."""
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name):
+            summary = self.client.get(self.url, {'profile': 'summary'})
+            response = self.client.get(self.url, headers={'X-Profile': 'file', 'X-Profile-Secret': ''})
+
+        self.assertEqual(summary['Content-Type'], 'application/json')
+        self.assertNotIn('X-Profile-File', response)
+        self.assertEqual(self.profiles(), [])
+
+    def test_sampling(self):
+        """Test that sampled requests are profiled to disk without asking."""
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, PROFILING_SAMPLE_RATE=1.0):
+            self.client.get(self.url)
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, PROFILING_SAMPLE_RATE=0.0):
+            # New client: middleware settings are read when it is loaded
+            self.client_class().get(self.url)
+
+        self.assertEqual(len(self.profiles()), 1)
+
+    def test_concurrent_profiled_requests(self):
+        """Test that a request arriving while another is profiled is served unprofiled."""
+        started = threading.Event()
+        release = threading.Event()
+        responses = {}
+
+        def get_response(request):
+            if request.path == '/slow/':
+                started.set()
+                release.wait(5)
+            return HttpResponse()
+
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, DEBUG=True):
+            middleware = ProfilingMiddleware(get_response)
+            factory = RequestFactory()
+            slow = threading.Thread(target=lambda: responses.update(
+                slow=middleware(factory.get('/slow/', {'profile': 'file'}))
+            ))
+            slow.start()
+            started.wait(5)
+            responses['fast'] = middleware(factory.get('/fast/', {'profile': 'file'}))
+            release.set()
+            slow.join()
+
+        self.assertIn('X-Profile-File', responses['slow'])
+        self.assertNotIn('X-Profile-File', responses['fast'])
+        self.assertEqual(len(self.profiles()), 1)
+        self.assertFalse(ProfilingMiddleware.lock.locked())
+
+    async def test_async_view(self):
+        """Test profiling a request served by an async view."""
+        with self.settings(PROFILING_ENABLED=True, PROFILING_DIR=self.tmp.name, DEBUG=True):
+            response = await self.async_client.get(reverse('project-timelines'), {'profile': 'summary'})
+
+        self.assertIn('function calls', response.content.decode())
@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class MilestonesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'milestones'
+
+    def ready(self):
+        from django.conf import settings
+        from django.utils.module_loading import import_string
+        from utils.helpers import register_holiday_calendar
+        from . import signals  # noqa: F401
+
+        for name, loader_path in getattr(settings, 'HOLIDAY_CALENDARS', {}).items():
+            # Imported on first use, like the holidays themselves
+            register_holiday_calendar(name, lambda path=loader_path: import_string(path)())
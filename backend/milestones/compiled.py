@@ -0,0 +1,97 @@
+"""
+In-process cache of compiled PaymentMilestoneStructures.
+
+Many sales share the same structure, so the ordered milestones and their
+cumulative day offsets are compiled once per structure and reused until a
+structure or one of its milestones is saved or deleted (see signals.py).
+"""
+
+import threading
+
+from django.db.models import F
+from utils.calculations import compile_milestone_structure
+from utils.helpers import get_business_calendar
+from .models import PaymentMilestoneStructure, PaymentMilestone
+
+
+_compiled_structures = {}
+_lock = threading.Lock()
+
+
+def _is_stale(compiled, structure):
+    """Check whether a cached entry is older than the given structure instance."""
+    if structure is None or compiled.updated_at is None or structure.updated_at is None:
+        return False
+    return structure.updated_at > compiled.updated_at
+
+
+def get_compiled_structure(structure):
+    """
+    Get the compiled form of a PaymentMilestoneStructure.
+    Accepts a structure instance or id. Passing an instance also lets the
+    cache detect changes made by other processes through its updated_at.
+    """
+    if isinstance(structure, PaymentMilestoneStructure):
+        return get_compiled_structures([structure])[structure.id]
+    return get_compiled_structures([structure])[structure]
+
+
+def get_compiled_structures(structures):
+    """
+    Get compiled structures for many structures at once.
+    Accepts structure instances or ids and returns a dict keyed by id.
+    Milestones of every structure missing from the cache are loaded with
+    a single query, which also brings the structure's business day settings.
+    """
+    instances = {}
+    for structure in structures:
+        if isinstance(structure, PaymentMilestoneStructure):
+            instances[structure.id] = structure
+        else:
+            instances.setdefault(structure, None)
+
+    compiled = {}
+    with _lock:
+        for structure_id, instance in instances.items():
+            entry = _compiled_structures.get(structure_id)
+            if entry is not None and not _is_stale(entry, instance):
+                compiled[structure_id] = entry
+
+    missing = [structure_id for structure_id in instances if structure_id not in compiled]
+    if missing:
+        milestones_by_structure = {structure_id: [] for structure_id in missing}
+        calendars = {structure_id: None for structure_id in missing}
+        for milestone in PaymentMilestone.objects.filter(
+            structure_id__in=missing
+        ).annotate(
+            business_days=F('structure__business_days'),
+            holiday_calendar=F('structure__holiday_calendar'),
+        ).order_by('structure_id', 'order'):
+            milestones_by_structure[milestone.structure_id].append(milestone)
+            if milestone.business_days:
+                calendars[milestone.structure_id] = get_business_calendar(milestone.holiday_calendar)
+
+        with _lock:
+            for structure_id, milestones in milestones_by_structure.items():
+                instance = instances[structure_id]
+                entry = compile_milestone_structure(
+                    milestones,
+                    updated_at=instance.updated_at if instance is not None else None,
+                    business_calendar=calendars[structure_id]
+                )
+                _compiled_structures[structure_id] = entry
+                compiled[structure_id] = entry
+
+    return compiled
+
+
+def invalidate_compiled_structure(structure_id):
+    """Drop the cached compiled form of a structure."""
+    with _lock:
+        _compiled_structures.pop(structure_id, None)
+
+
+def clear_compiled_structures():
+    """Drop every cached compiled structure."""
+    with _lock:
+        _compiled_structures.clear()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from milestones.models import PaymentMilestoneStructure
+
+
+class Command(BaseCommand):
+    help = "Find milestone structures whose payment percentages exceed 100%."
+
+    def handle(self, *args, **options):
+        structures = list(
+            PaymentMilestoneStructure.objects.over_allocated()
+            .order_by('name')
+            .values_list('id', 'name', 'total_percentage')
+        )
+        for pk, name, total_percentage in structures:
+            self.stderr.write(f"Structure {pk} ({name}): {total_percentage}%")
+        if structures:
+            raise CommandError(f"{len(structures)} milestone structures exceed 100%")
+        self.stdout.write(self.style.SUCCESS("All milestone structures are within 100%"))
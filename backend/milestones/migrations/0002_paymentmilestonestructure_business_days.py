@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('milestones', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentmilestonestructure',
+            name='business_days',
+            field=models.BooleanField(default=False, help_text='Count days after previous and net terms in business days instead of calendar days'),
+        ),
+        migrations.AddField(
+            model_name='paymentmilestonestructure',
+            name='holiday_calendar',
+            field=models.CharField(blank=True, help_text='Holiday calendar (HOLIDAY_CALENDARS setting) for business days; blank for weekends only', max_length=50),
+        ),
+    ]
@@ -1,5 +1,27 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Sum
 from django.core.validators import MinValueValidator, MaxValueValidator
+from utils.helpers import get_business_calendar, get_holiday_calendar_names
+
+
+# Percentages have 2 decimal places, so a real over-allocation is at least
+# 100.01. SQLite sums decimals as floats (e.g. 100.00000000000001), hence the
+# comparison against half a step above 100.
+OVER_ALLOCATED_THRESHOLD = Decimal('100.005')
+
+
+class PaymentMilestoneStructureQuerySet(models.QuerySet):
+    """QuerySet with the integrity checks run over many structures."""
+
+    def over_allocated(self):
+        """
+        Structures whose milestone percentages add up to more than 100%,
+        annotated with total_percentage. Runs as one GROUP BY ... HAVING query.
+        """
+        return self.annotate(
+            total_percentage=Sum('milestones__payment_percentage')
+        ).filter(total_percentage__gt=OVER_ALLOCATED_THRESHOLD)
 
 
 class PaymentMilestoneStructure(models.Model):
@@ -9,15 +31,53 @@ class PaymentMilestoneStructure(models.Model):
     """
     name = models.CharField(max_length=100, unique=True, help_text="Unique name for this milestone structure")
     description = models.TextField(blank=True, help_text="Optional description of this milestone structure")
+    business_days = models.BooleanField(
+        default=False,
+        help_text="Count days after previous and net terms in business days instead of calendar days"
+    )
+    holiday_calendar = models.CharField(
+        max_length=50,
+        blank=True,
+        help_text="Holiday calendar (HOLIDAY_CALENDARS setting) for business days; blank for weekends only"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PaymentMilestoneStructureQuerySet.as_manager()
+
+    # Fields that change the schedules of the structure's sales
+    SCHEDULE_FIELDS = ('business_days', 'holiday_calendar')
+
     class Meta:
         ordering = ['name']
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_schedule_values = instance.get_schedule_values()
+        return instance
+
+    def get_schedule_values(self):
+        return tuple(self.__dict__.get(field) for field in self.SCHEDULE_FIELDS)
+
+    def schedule_changed(self):
+        """Check whether the day counting changed since the structure was loaded or saved."""
+        loaded = getattr(self, '_loaded_schedule_values', None)
+        return loaded is None or loaded != self.get_schedule_values()
+
+    def get_business_calendar(self):
+        """The numpy.busdaycalendar for the schedules, or None when counting calendar days."""
+        return get_business_calendar(self.holiday_calendar) if self.business_days else None
+
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        if self.holiday_calendar and self.holiday_calendar not in get_holiday_calendar_names():
+            raise ValidationError({'holiday_calendar': f"Unknown holiday calendar: {self.holiday_calendar}"})
+
 
 class PaymentMilestone(models.Model):
     """
@@ -59,12 +119,13 @@ class PaymentMilestone(models.Model):
     def clean(self):
         from django.core.exceptions import ValidationError
         
-        # Ensure payment percentages don't exceed 100% total
+        # Ensure payment percentages don't exceed 100% total; the siblings
+        # are summed by the database instead of being loaded
         if self.structure_id:
-            total_percentage = sum(
-                milestone.payment_percentage 
-                for milestone in self.structure.milestones.exclude(id=self.id)
-            ) + self.payment_percentage
+            siblings_total = PaymentMilestone.objects.filter(
+                structure_id=self.structure_id
+            ).exclude(id=self.id).aggregate(total=Sum('payment_percentage'))['total']
+            total_percentage = (siblings_total or Decimal('0')) + self.payment_percentage
             
             if total_percentage > 100:
                 raise ValidationError(
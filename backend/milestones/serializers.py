@@ -1,5 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
+from utils.helpers import get_holiday_calendar_names
+from utils.validators import validate_payment_percentages
 from .models import PaymentMilestoneStructure, PaymentMilestone
+from .signals import defer_milestones_changed
 
 
 class PaymentMilestoneSerializer(serializers.ModelSerializer):
@@ -16,44 +20,138 @@ class PaymentMilestoneStructureSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = PaymentMilestoneStructure
-        fields = ['id', 'name', 'description', 'milestones', 'created_at', 'updated_at']
+        fields = [
+            'id', 'name', 'description', 'business_days', 'holiday_calendar',
+            'milestones', 'created_at', 'updated_at'
+        ]
         read_only_fields = ['created_at', 'updated_at']
 
 
+class PaymentMilestoneWriteSerializer(PaymentMilestoneSerializer):
+    """Nested milestone accepted on structure writes; id identifies an existing milestone."""
+    id = serializers.IntegerField(required=False)
+
+
 class PaymentMilestoneStructureCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating PaymentMilestoneStructure with milestones."""
-    milestones = PaymentMilestoneSerializer(many=True)
+    milestones = PaymentMilestoneWriteSerializer(many=True)
     
     class Meta:
         model = PaymentMilestoneStructure
-        fields = ['name', 'description', 'milestones']
+        fields = ['name', 'description', 'business_days', 'holiday_calendar', 'milestones']
+    
+    def validate_holiday_calendar(self, value):
+        if value and value not in get_holiday_calendar_names():
+            raise serializers.ValidationError(f"Unknown holiday calendar: {value}")
+        return value
+    
+    def validate_milestones(self, value):
+        """
+        Check that orders and ids are not repeated within the payload and that
+        the percentages add up to at most 100%. The payload replaces all of the
+        structure's milestones, so the total is summed in memory without
+        querying the existing ones.
+        """
+        orders = [milestone.get('order', 0) for milestone in value]
+        if len(set(orders)) != len(orders):
+            raise serializers.ValidationError("Milestone orders must be unique")
+        ids = [milestone['id'] for milestone in value if 'id' in milestone]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError("A milestone cannot be listed twice")
+        is_valid, error_message = validate_payment_percentages(value)
+        if not is_valid:
+            raise serializers.ValidationError(error_message)
+        return value
     
     def create(self, validated_data):
         milestones_data = validated_data.pop('milestones')
-        structure = PaymentMilestoneStructure.objects.create(**validated_data)
-        
-        for milestone_data in milestones_data:
-            PaymentMilestone.objects.create(structure=structure, **milestone_data)
-        
+        with transaction.atomic():
+            structure = PaymentMilestoneStructure.objects.create(**validated_data)
+            # A new structure has no sales, so there is nothing to notify
+            PaymentMilestone.objects.bulk_create([
+                PaymentMilestone(structure=structure, **self.milestone_fields(milestone_data))
+                for milestone_data in milestones_data
+            ])
         return structure
     
     def update(self, instance, validated_data):
         milestones_data = validated_data.pop('milestones', None)
         
-        # Update structure fields
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
-        
-        # Update milestones if provided
-        if milestones_data is not None:
-            # Delete existing milestones
-            instance.milestones.all().delete()
+        # One ledger resync when both the day counting and milestones change
+        with transaction.atomic(), defer_milestones_changed():
+            # Update structure fields
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
             
-            # Create new milestones
-            for milestone_data in milestones_data:
-                PaymentMilestone.objects.create(structure=instance, **milestone_data)
+            # Update milestones if provided
+            if milestones_data is not None:
+                self.update_milestones(instance, milestones_data)
         
         return instance
-
-
+    
+    @staticmethod
+    def milestone_fields(milestone_data):
+        return {field: value for field, value in milestone_data.items() if field != 'id'}
+    
+    def update_milestones(self, structure, milestones_data):
+        """
+        Apply the incoming milestones as a diff against the existing ones.
+        Incoming milestones are matched by id, or by order when they have no
+        id. Matched milestones keep their ids and are updated only if they
+        changed, unmatched existing ones are deleted and the rest created,
+        with a constant number of queries.
+        """
+        existing = {milestone.id: milestone for milestone in structure.milestones.all()}
+        by_order = {milestone.order: milestone for milestone in existing.values()}
+        
+        unknown = [data['id'] for data in milestones_data if 'id' in data and data['id'] not in existing]
+        if unknown:
+            raise serializers.ValidationError({
+                'milestones': [f"Milestone {pk} does not belong to this structure" for pk in unknown]
+            })
+        
+        matched = {data['id'] for data in milestones_data if 'id' in data}
+        kept = []
+        new = []
+        update_fields = set()
+        for data in milestones_data:
+            fields = self.milestone_fields(data)
+            milestone = existing.get(data.get('id'))
+            if milestone is None:
+                candidate = by_order.get(fields.get('order', 0))
+                if candidate is not None and candidate.id not in matched:
+                    milestone = candidate
+                    matched.add(candidate.id)
+            if milestone is None:
+                new.append(PaymentMilestone(structure=structure, **fields))
+                continue
+            changed = {field for field, value in fields.items() if getattr(milestone, field) != value}
+            for field in changed:
+                setattr(milestone, field, fields[field])
+            update_fields |= changed
+            kept.append((milestone, changed))
+        
+        removed = [pk for pk in existing if pk not in matched]
+        changed_milestones = [milestone for milestone, changed in kept if changed]
+        moved = [milestone for milestone, changed in kept if 'order' in changed]
+        
+        with defer_milestones_changed() as changed_structures:
+            if removed:
+                PaymentMilestone.objects.filter(id__in=removed).delete()
+            if moved:
+                # Park reordered milestones on unused orders first, so the
+                # (structure, order) unique constraint holds while swapping
+                final_orders = [milestone.order for milestone in moved]
+                offset = max([*by_order, *final_orders, *(m.order for m in new)]) + 1
+                for i, milestone in enumerate(moved):
+                    milestone.order = offset + i
+                PaymentMilestone.objects.bulk_update(moved, ['order'])
+                for milestone, order in zip(moved, final_orders):
+                    milestone.order = order
+            if changed_milestones:
+                PaymentMilestone.objects.bulk_update(changed_milestones, sorted(update_fields))
+            if new:
+                PaymentMilestone.objects.bulk_create(new)
+            if removed or changed_milestones or new:
+                changed_structures.add(structure.pk)
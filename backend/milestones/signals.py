@@ -0,0 +1,79 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+from django.utils import timezone
+from .models import PaymentMilestoneStructure, PaymentMilestone
+from .compiled import invalidate_compiled_structure
+
+
+# Sent with structure_id after the milestones of a structure were changed
+milestones_changed = Signal()
+
+
+def notify_milestones_changed(structure_id):
+    """
+    Record that the milestones of a structure changed.
+    Drops the compiled structure, bumps the structure's updated_at so other
+    processes notice the change as well, then sends milestones_changed.
+    Call this directly after bulk operations, which bypass model signals.
+    """
+    invalidate_compiled_structure(structure_id)
+    PaymentMilestoneStructure.objects.filter(pk=structure_id).update(updated_at=timezone.now())
+    milestones_changed.send(sender=PaymentMilestoneStructure, structure_id=structure_id)
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def defer_milestones_changed():
+    """
+    Collect milestone change notifications raised inside the block and
+    send one per structure when it exits successfully, instead of one per
+    saved or deleted milestone. Yields the set of pending structure ids so
+    callers doing bulk operations can add to it.
+    """
+    pending = getattr(_deferred, 'structure_ids', None)
+    if pending is not None:
+        # Nested: the outermost block sends the notifications
+        yield pending
+        return
+    
+    _deferred.structure_ids = set()
+    try:
+        yield _deferred.structure_ids
+        structure_ids = _deferred.structure_ids
+    finally:
+        _deferred.structure_ids = None
+    for structure_id in sorted(structure_ids):
+        notify_milestones_changed(structure_id)
+
+
+def _schedules_changed(structure_id):
+    pending = getattr(_deferred, 'structure_ids', None)
+    if pending is not None:
+        pending.add(structure_id)
+    else:
+        notify_milestones_changed(structure_id)
+
+
+@receiver(post_save, sender=PaymentMilestoneStructure)
+@receiver(post_delete, sender=PaymentMilestoneStructure)
+def structure_changed(sender, instance, **kwargs):
+    invalidate_compiled_structure(instance.pk)
+
+
+@receiver(post_save, sender=PaymentMilestoneStructure)
+def structure_schedule_changed(sender, instance, created, **kwargs):
+    # Switching between calendar and business days moves every due date
+    if not created and instance.schedule_changed():
+        _schedules_changed(instance.pk)
+    instance._loaded_schedule_values = instance.get_schedule_values()
+
+
+@receiver(post_save, sender=PaymentMilestone)
+@receiver(post_delete, sender=PaymentMilestone)
+def milestone_changed(sender, instance, **kwargs):
+    _schedules_changed(instance.structure_id)
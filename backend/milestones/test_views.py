@@ -2,7 +2,11 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
+from datetime import date
 from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from equipment.models import EquipmentSale, PaymentScheduleEntry
 from .models import PaymentMilestoneStructure, PaymentMilestone
 
 
@@ -45,6 +49,19 @@ class PaymentMilestoneStructureAPITest(APITestCase):
         self.assertEqual(structure.description, 'A test milestone structure')
         self.assertEqual(structure.milestones.count(), 2)
     
+    def test_create_business_day_structure(self):
+        """Test creating a structure counting business days and rejecting unknown calendars."""
+        url = reverse('paymentmilestonestructure-list')
+        response = self.client.post(
+            url, {**self.structure_data, 'business_days': True, 'holiday_calendar': 'unknown'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('holiday_calendar', response.data)
+        
+        response = self.client.post(url, {**self.structure_data, 'business_days': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(PaymentMilestoneStructure.objects.get().business_days)
+    
     def test_create_milestone_structure_duplicate_name(self):
         """Test creating a milestone structure with duplicate name."""
         # Create first structure
@@ -157,6 +174,172 @@ class PaymentMilestoneStructureAPITest(APITestCase):
         self.assertEqual(PaymentMilestoneStructure.objects.count(), 0)
 
 
+class PaymentMilestoneStructureDiffUpdateAPITest(APITestCase):
+    """Test cases for diff-based milestone updates on structure writes."""
+    
+    def setUp(self):
+        """Set up a structure with three milestones and a sale using it."""
+        self.structure = PaymentMilestoneStructure.objects.create(name='Diff Structure')
+        self.milestones = [
+            PaymentMilestone.objects.create(
+                structure=self.structure,
+                name=f'Milestone {i}',
+                payment_percentage=Decimal('25.00'),
+                net_terms_days=0,
+                days_after_previous=10 * i,
+                order=i
+            )
+            for i in range(3)
+        ]
+        self.sale = EquipmentSale.objects.create(
+            name='Diff Sale',
+            quantity=1,
+            total_amount=Decimal('1000.00'),
+            milestone_structure=self.structure,
+            project_start_date=date(2024, 1, 1)
+        )
+        self.url = reverse('paymentmilestonestructure-detail', kwargs={'pk': self.structure.pk})
+    
+    def milestone_data(self, milestone, **changes):
+        data = {
+            'id': milestone.id,
+            'name': milestone.name,
+            'payment_percentage': str(milestone.payment_percentage),
+            'net_terms_days': milestone.net_terms_days,
+            'days_after_previous': milestone.days_after_previous,
+            'order': milestone.order,
+        }
+        data.update(changes)
+        return data
+    
+    def put(self, milestones):
+        return self.client.put(self.url, {'name': 'Diff Structure', 'milestones': milestones}, format='json')
+    
+    def test_update_keeps_ids(self):
+        """Test that edited milestones keep their ids and removed ones are deleted."""
+        first, second, third = self.milestones
+        response = self.put([
+            self.milestone_data(first, payment_percentage='50.00'),
+            self.milestone_data(third, order=1),
+            {'name': 'Added', 'payment_percentage': '25.00', 'order': 2},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        milestones = list(self.structure.milestones.order_by('order'))
+        self.assertEqual([m.name for m in milestones], ['Milestone 0', 'Milestone 2', 'Added'])
+        self.assertEqual(milestones[0].id, first.id)
+        self.assertEqual(milestones[0].payment_percentage, Decimal('50.00'))
+        self.assertEqual(milestones[1].id, third.id)
+        self.assertFalse(PaymentMilestone.objects.filter(id=second.id).exists())
+    
+    def test_swap_orders(self):
+        """Test that milestones can trade orders despite the unique constraint."""
+        first, second, third = self.milestones
+        response = self.put([
+            self.milestone_data(first, order=2),
+            self.milestone_data(second),
+            self.milestone_data(third, order=0),
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(self.structure.milestones.order_by('order').values_list('id', flat=True)),
+            [third.id, second.id, first.id]
+        )
+    
+    def test_match_by_order_without_ids(self):
+        """Test that milestones sent without ids are matched by order."""
+        response = self.put([
+            {'name': 'Renamed', 'payment_percentage': '25.00', 'order': 0},
+            {'name': 'Milestone 1', 'payment_percentage': '25.00', 'days_after_previous': 10, 'order': 1},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(self.structure.milestones.order_by('order').values_list('id', 'name')),
+            [(self.milestones[0].id, 'Renamed'), (self.milestones[1].id, 'Milestone 1')]
+        )
+    
+    def test_update_syncs_ledger_once(self):
+        """Test that the sale's ledger follows the new milestones."""
+        first, second, _ = self.milestones
+        self.put([
+            self.milestone_data(first, payment_percentage='40.00'),
+            self.milestone_data(second, payment_percentage='60.00'),
+        ])
+        
+        entries = PaymentScheduleEntry.objects.filter(sale=self.sale).order_by('order')
+        self.assertEqual(
+            [(e.milestone_id, e.payment_amount) for e in entries],
+            [(first.id, Decimal('400.00')), (second.id, Decimal('600.00'))]
+        )
+    
+    def test_update_query_count(self):
+        """Test that the number of queries does not grow with the milestones."""
+        def count_queries(size):
+            milestones = [
+                {'name': f'M{i}', 'payment_percentage': '1.00', 'days_after_previous': i, 'order': i}
+                for i in range(size)
+            ]
+            self.put(milestones)
+            changed = [dict(m, days_after_previous=m['days_after_previous'] + 1) for m in milestones]
+            with CaptureQueriesContext(connection) as queries:
+                self.put(changed[:-1] + [{'name': 'New', 'payment_percentage': '1.00', 'order': size + 1}])
+            return len(queries)
+        
+        self.assertEqual(count_queries(3), count_queries(15))
+    
+    def test_invalid_milestone_payloads(self):
+        """Test rejection of foreign ids and repeated orders."""
+        other = PaymentMilestoneStructure.objects.create(name='Other Structure')
+        foreign = PaymentMilestone.objects.create(structure=other, name='Foreign', payment_percentage=Decimal('10.00'))
+        
+        response = self.put([self.milestone_data(foreign)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.put([
+            self.milestone_data(self.milestones[0]),
+            self.milestone_data(self.milestones[1], order=0),
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.structure.milestones.count(), 3)
+    
+    def test_create_query_count(self):
+        """Test that creating a structure inserts its milestones in one query."""
+        def count_queries(size):
+            data = {
+                'name': f'Created {size}',
+                'milestones': [
+                    {'name': f'M{i}', 'payment_percentage': '1.00', 'order': i} for i in range(size)
+                ],
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('paymentmilestonestructure-list'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+        
+        self.assertEqual(count_queries(2), count_queries(20))
+
+
+class PaymentMilestoneStructurePaginationAPITest(APITestCase):
+    """Test cases for keyset pagination of the structures list."""
+    
+    def test_structures_paginated_by_name(self):
+        """Test that structures are paged in name order."""
+        for name in ['Delta', 'Alpha', 'Echo', 'Charlie', 'Bravo']:
+            PaymentMilestoneStructure.objects.create(name=name)
+        url = reverse('paymentmilestonestructure-list')
+        
+        first = self.client.get(url, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        third = self.client.get(second.data['next'])
+        
+        self.assertEqual([s['name'] for s in first.data['results']], ['Alpha', 'Bravo'])
+        self.assertEqual([s['name'] for s in second.data['results']], ['Charlie', 'Delta'])
+        self.assertEqual([s['name'] for s in third.data['results']], ['Echo'])
+        self.assertIsNone(third.data['next'])
+
+
 class PaymentMilestoneAPITest(APITestCase):
     """Test cases for PaymentMilestone API endpoints."""
     
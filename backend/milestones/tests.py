@@ -1,9 +1,14 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
 from decimal import Decimal
 from datetime import date, timedelta
 from .models import PaymentMilestoneStructure, PaymentMilestone
+from .compiled import get_compiled_structure, get_compiled_structures, clear_compiled_structures
 
 
 class PaymentMilestoneStructureModelTest(TestCase):
@@ -202,4 +207,149 @@ class PaymentMilestoneIntegrationTest(TestCase):
         milestones = structure.milestones.all()
         self.assertEqual(len(milestones), 2)
         self.assertIn(milestone1, milestones)
-        self.assertIn(milestone2, milestones)
\ No newline at end of file
+        self.assertIn(milestone2, milestones)
+
+
+class CompiledStructureTest(TestCase):
+    """Test cases for compiled, cached milestone structures."""
+    
+    def setUp(self):
+        """Set up a structure with three milestones."""
+        clear_compiled_structures()
+        self.structure = PaymentMilestoneStructure.objects.create(name="Compiled Structure")
+        for i, (percentage, days, net_terms) in enumerate([(20, 0, 0), (30, 15, 10), (50, 45, 30)]):
+            PaymentMilestone.objects.create(
+                structure=self.structure,
+                name=f"Milestone {i + 1}",
+                payment_percentage=Decimal(percentage),
+                net_terms_days=net_terms,
+                days_after_previous=days,
+                order=i
+            )
+    
+    def test_compiled_offsets(self):
+        """Test that cumulative offsets and vectors are derived once."""
+        compiled = get_compiled_structure(self.structure.id)
+        
+        self.assertEqual(len(compiled), 3)
+        self.assertEqual(compiled.names, ("Milestone 1", "Milestone 2", "Milestone 3"))
+        self.assertEqual(compiled.start_days.tolist(), [0, 0, 15])
+        self.assertEqual(compiled.end_days.tolist(), [0, 15, 60])
+        self.assertEqual(compiled.net_terms_days.tolist(), [0, 10, 30])
+        self.assertEqual(
+            compiled.payment_percentages,
+            (Decimal('20'), Decimal('30'), Decimal('50'))
+        )
+    
+    def test_compiled_structure_is_cached(self):
+        """Test that a compiled structure is reused without queries."""
+        compiled = get_compiled_structure(self.structure.id)
+        
+        with self.assertNumQueries(0):
+            self.assertIs(get_compiled_structure(self.structure.id), compiled)
+    
+    def test_bulk_compile_uses_single_query(self):
+        """Test that compiling many structures loads milestones once."""
+        other = PaymentMilestoneStructure.objects.create(name="Other Structure")
+        
+        with self.assertNumQueries(1):
+            compiled = get_compiled_structures([self.structure.id, other.id])
+        
+        self.assertEqual(len(compiled[self.structure.id]), 3)
+        self.assertEqual(len(compiled[other.id]), 0)
+    
+    def test_milestone_save_invalidates(self):
+        """Test that editing a milestone invalidates the compiled structure."""
+        get_compiled_structure(self.structure.id)
+        
+        milestone = self.structure.milestones.get(order=1)
+        milestone.days_after_previous = 20
+        milestone.save()
+        
+        self.assertEqual(get_compiled_structure(self.structure.id).end_days.tolist(), [0, 20, 65])
+    
+    def test_milestone_delete_invalidates(self):
+        """Test that deleting a milestone invalidates the compiled structure."""
+        get_compiled_structure(self.structure.id)
+        
+        self.structure.milestones.get(order=2).delete()
+        
+        self.assertEqual(len(get_compiled_structure(self.structure.id)), 2)
+    
+    def test_milestone_change_touches_structure(self):
+        """Test that milestone changes bump the structure's updated_at."""
+        stale = PaymentMilestoneStructure.objects.get(pk=self.structure.pk)
+        get_compiled_structure(stale)
+        
+        self.structure.milestones.get(order=0).delete()
+        fresh = PaymentMilestoneStructure.objects.get(pk=self.structure.pk)
+        
+        self.assertGreater(fresh.updated_at, stale.updated_at)
+        self.assertEqual(len(get_compiled_structure(fresh)), 2)
+
+
+class PaymentPercentageIntegrityTest(TestCase):
+    """Test cases for set-based payment percentage checks."""
+    
+    def setUp(self):
+        """Set up one valid and one over-allocated structure."""
+        self.valid = PaymentMilestoneStructure.objects.create(name="Valid")
+        self.invalid = PaymentMilestoneStructure.objects.create(name="Invalid")
+        for i in range(10):
+            PaymentMilestone.objects.create(
+                structure=self.valid, name=f"V{i}", payment_percentage=Decimal('10.00'), order=i
+            )
+            PaymentMilestone.objects.create(
+                structure=self.invalid, name=f"I{i}", payment_percentage=Decimal('11.00'), order=i
+            )
+    
+    def test_clean_uses_one_query(self):
+        """Test that clean() sums sibling percentages in the database."""
+        milestone = self.valid.milestones.get(order=0)
+        milestone.payment_percentage = Decimal('10.00')
+        
+        with CaptureQueriesContext(connection) as queries:
+            milestone.clean()
+        self.assertEqual(len(queries), 1)
+        
+        milestone.payment_percentage = Decimal('10.01')
+        with self.assertRaises(ValidationError):
+            milestone.clean()
+    
+    def test_over_allocated(self):
+        """Test that over-allocated structures are found in one query."""
+        with self.assertNumQueries(1):
+            structures = list(PaymentMilestoneStructure.objects.over_allocated())
+        
+        self.assertEqual(structures, [self.invalid])
+        self.assertEqual(structures[0].total_percentage, Decimal('110.00'))
+    
+    def test_over_allocated_float_sums(self):
+        """Test that totals of exactly 100% are not flagged though SQLite sums them as floats."""
+        # 82.79 + 8.06 + 9.15 is 100.00000000000001 in floating point
+        exact = PaymentMilestoneStructure.objects.create(name="Exact")
+        for i, percentage in enumerate(['82.79', '8.06', '9.15']):
+            PaymentMilestone.objects.create(
+                structure=exact, name=f"T{i}", payment_percentage=Decimal(percentage), order=i
+            )
+        over = PaymentMilestoneStructure.objects.create(name="Just Over")
+        for i, percentage in enumerate(['50.00', '50.01']):
+            PaymentMilestone.objects.create(
+                structure=over, name=f"J{i}", payment_percentage=Decimal(percentage), order=i
+            )
+        
+        structures = set(PaymentMilestoneStructure.objects.over_allocated())
+        
+        self.assertEqual(structures, {self.invalid, over})
+    
+    def test_check_command(self):
+        """Test the integrity check command."""
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_milestone_percentages', stdout=StringIO(), stderr=err)
+        self.assertIn("Invalid", err.getvalue())
+        
+        self.invalid.milestones.filter(order=0).delete()
+        out = StringIO()
+        call_command('check_milestone_percentages', stdout=out)
+        self.assertIn("within 100%", out.getvalue())
@@ -15,6 +15,8 @@ class PaymentMilestoneStructureViewSet(viewsets.ModelViewSet):
     Provides CRUD operations for milestone structures and their milestones.
     """
     queryset = PaymentMilestoneStructure.objects.all()
+    # Keyset pagination order; the last field must be unique
+    ordering = ('name', 'id')
     
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -4,7 +4,7 @@ from .models import Project
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ['name', 'start_date', 'equipment_sales_count', 'total_value', 'created_at']
+    list_display = ['name', 'start_date', 'sales_count', 'sales_total', 'created_at']
     list_filter = ['start_date', 'created_at']
     search_fields = ['name', 'description']
     readonly_fields = ['created_at', 'updated_at', 'total_value', 'equipment_sales_count']
@@ -22,3 +22,14 @@ class ProjectAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+    
+    @admin.display(description='Equipment sales count', ordering='_equipment_sales_count')
+    def sales_count(self, obj):
+        return obj.equipment_sales_count
+    
+    @admin.display(description='Total value', ordering='_total_value')
+    def sales_total(self, obj):
+        return obj.total_value
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_at'], name='projects_pr_created_6b02e3_idx'),
+        ),
+    ]
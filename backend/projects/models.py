@@ -1,7 +1,83 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import Count, DecimalField, Max, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator
 
 
+class ProjectQuerySet(models.QuerySet):
+    """QuerySet with the prefetch plans used by the project endpoints."""
+
+    TIMELINE_VALIDATORS = {
+        'projects_updated_at': Max('updated_at'),
+        'sales_updated_at': Max('equipment_sales__updated_at'),
+        'structures_updated_at': Max('equipment_sales__milestone_structure__updated_at'),
+        'projects': Count('id', distinct=True),
+        'sales': Count('equipment_sales', distinct=True),
+    }
+
+    def with_totals(self):
+        """
+        Annotate each project's sales total and count in the same query.
+        Project.total_value and Project.equipment_sales_count use these
+        annotations when present instead of querying per project.
+        """
+        return self.annotate(
+            _total_value=Coalesce(
+                Sum('equipment_sales__total_amount'),
+                Value(Decimal('0')),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            ),
+            _equipment_sales_count=Count('equipment_sales'),
+        )
+
+    def timeline_validators(self):
+        """
+        Aggregate what the timelines of these projects depend on into one
+        row: the latest project, sale and structure updated_at and the
+        number of projects and sales. Returns None when there are no projects.
+        """
+        validators = self.order_by().aggregate(**self.TIMELINE_VALIDATORS)
+        return validators if validators['projects'] else None
+
+    async def atimeline_validators(self):
+        """Async version of timeline_validators()."""
+        validators = await self.order_by().aaggregate(**self.TIMELINE_VALIDATORS)
+        return validators if validators['projects'] else None
+
+    def timeline_validators_by_project(self):
+        """
+        timeline_validators() of each project in one GROUP BY query, as
+        dicts that also hold the project id, in the queryset's order.
+        """
+        # Meta.ordering is not applied to GROUP BY queries
+        ordering = self.query.order_by or self.model._meta.ordering
+        return self.values('id').annotate(**self.TIMELINE_VALIDATORS).order_by(*ordering)
+
+    def with_sales(self):
+        """
+        Prefetch equipment sales with their structures and milestones, as
+        nested by ProjectSerializer. Costs three queries in total.
+        """
+        from equipment.models import EquipmentSale
+
+        sales = EquipmentSale.objects.with_structure().order_by('-created_at', 'id')
+        return self.prefetch_related(Prefetch('equipment_sales', queryset=sales))
+
+    def with_timeline(self):
+        """
+        Prefetch everything ProjectTimelineSerializer needs, including the
+        ledger entries behind get_project_timeline(). The number of queries
+        is constant regardless of how many projects and sales are loaded.
+        """
+        from equipment.models import PaymentScheduleEntry
+
+        entries = PaymentScheduleEntry.objects.select_related('milestone').order_by('order')
+        return self.with_sales().prefetch_related(
+            Prefetch('equipment_sales__schedule_entries', queryset=entries)
+        )
+
+
 class Project(models.Model):
     """
     Top-level project that contains multiple equipment sales.
@@ -18,8 +94,13 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProjectQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return self.name
@@ -27,35 +108,55 @@ class Project(models.Model):
     @property
     def total_value(self):
         """Calculate total value of all equipment sales in this project."""
+        if hasattr(self, '_total_value'):
+            return self._total_value
         return sum(sale.total_amount for sale in self.equipment_sales.all())
 
     @property
     def equipment_sales_count(self):
         """Get count of equipment sales in this project."""
+        if hasattr(self, '_equipment_sales_count'):
+            return self._equipment_sales_count
         return self.equipment_sales.count()
 
     def get_project_timeline(self):
         """
         Generate timeline data for the entire project including all equipment sales.
         Returns data formatted for gantt chart visualization.
+        Reads the materialized payment ledger instead of recomputing schedules,
+        using prefetched sales and entries when available.
         """
-        timeline_data = []
+        from equipment.models import PaymentScheduleEntry
         
-        for sale in self.equipment_sales.all():
-            sale_schedule = sale.get_milestone_schedule()
-            for milestone in sale_schedule:
-                timeline_data.append({
-                    'sale_id': sale.id,
-                    'sale_name': sale.name,
-                    'milestone_id': milestone['id'],
-                    'milestone_name': milestone['name'],
-                    'start_days': milestone['start_days'],
-                    'end_days': milestone['end_days'],
-                    'payment_percentage': milestone['payment_percentage'],
-                    'payment_amount': milestone['payment_amount'],
-                    'due_date': milestone['due_date'],
-                    'payment_due_date': milestone['payment_due_date'],
-                    'net_terms_days': milestone['net_terms_days'],
-                })
+        sales = None
+        if 'equipment_sales' in getattr(self, '_prefetched_objects_cache', {}):
+            sales = self.equipment_sales.all()
+        
+        if sales is not None and all(
+            'schedule_entries' in getattr(sale, '_prefetched_objects_cache', {}) for sale in sales
+        ):
+            # Loaded through Project.objects.with_timeline(): no queries needed
+            entries = (entry for sale in sales for entry in sale.schedule_entries.all())
+        else:
+            entries = PaymentScheduleEntry.objects.filter(sale__project=self).select_related(
+                'sale', 'milestone'
+            ).order_by('-sale__created_at', 'sale_id', 'order')
+        
+        timeline_data = []
+        for entry in entries:
+            milestone = entry.to_schedule_row()
+            timeline_data.append({
+                'sale_id': entry.sale_id,
+                'sale_name': entry.sale.name,
+                'milestone_id': milestone['id'],
+                'milestone_name': milestone['name'],
+                'start_days': milestone['start_days'],
+                'end_days': milestone['end_days'],
+                'payment_percentage': milestone['payment_percentage'],
+                'payment_amount': milestone['payment_amount'],
+                'due_date': milestone['due_date'],
+                'payment_due_date': milestone['payment_due_date'],
+                'net_terms_days': milestone['net_terms_days'],
+            })
         
         return timeline_data
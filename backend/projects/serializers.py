@@ -19,6 +19,24 @@ class ProjectSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
+class ProjectSummarySerializer(serializers.ModelSerializer):
+    """
+    Lightweight Project representation without nested sales.
+    Expects a queryset built with Project.objects.with_totals().
+    """
+    total_value = serializers.ReadOnlyField()
+    equipment_sales_count = serializers.ReadOnlyField()
+    
+    class Meta:
+        model = Project
+        fields = [
+            'id', 'name', 'start_date', 'description',
+            'total_value', 'equipment_sales_count',
+            'created_at', 'updated_at'
+        ]
+        read_only_fields = ['created_at', 'updated_at']
+
+
 class ProjectTimelineSerializer(serializers.ModelSerializer):
     """Serializer for Project with timeline data for gantt chart."""
     equipment_sales = EquipmentSaleSerializer(many=True, read_only=True)
@@ -38,3 +56,20 @@ class ProjectTimelineSerializer(serializers.ModelSerializer):
     def get_project_timeline(self, obj):
         """Get the project timeline data for gantt chart."""
         return obj.get_project_timeline()
+
+
+class CashFlowQuerySerializer(serializers.Serializer):
+    """Serializer for validating cash-flow report query parameters."""
+    granularity = serializers.ChoiceField(
+        choices=['day', 'week', 'month', 'quarter'],
+        default='month'
+    )
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    project = serializers.ListField(child=serializers.IntegerField(), required=False)
+    
+    def validate(self, attrs):
+        """Validate that the date range is not inverted."""
+        if 'start' in attrs and 'end' in attrs and attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must be on or before end")
+        return attrs
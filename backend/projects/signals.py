@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from milestone_backend import payload_cache
+from .models import Project
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    payload_cache.invalidate(payload_cache.TIMELINE, [instance.pk])
@@ -0,0 +1,577 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from decimal import Decimal
+from datetime import date
+from milestones.models import PaymentMilestoneStructure, PaymentMilestone
+from equipment.models import EquipmentSale
+from milestone_backend import payload_cache
+from .models import Project
+from .views import get_timelines_payload
+
+
+class CashFlowAPITest(APITestCase):
+    """Test cases for the portfolio cash-flow endpoint."""
+
+    def setUp(self):
+        """Set up two projects with vendor and customer sales."""
+        self.structure = PaymentMilestoneStructure.objects.create(name='Cash Flow Structure')
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name='Deposit',
+            payment_percentage=Decimal('40.00'),
+            net_terms_days=0,
+            days_after_previous=0,
+            order=0
+        )
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name='Balance',
+            payment_percentage=Decimal('60.00'),
+            net_terms_days=15,
+            days_after_previous=45,
+            order=1
+        )
+
+        self.project1 = Project.objects.create(name='Project 1', start_date=date(2024, 1, 1))
+        self.project2 = Project.objects.create(name='Project 2', start_date=date(2024, 1, 1))
+
+        # Payments due 2024-01-10 and 2024-03-10
+        EquipmentSale.objects.create(
+            name='Vendor Sale',
+            sale_type='vendor',
+            quantity=1,
+            total_amount=Decimal('1000.00'),
+            milestone_structure=self.structure,
+            project=self.project1,
+            project_start_date=date(2024, 1, 10)
+        )
+        # Payments due 2024-01-20 and 2024-03-20
+        EquipmentSale.objects.create(
+            name='Customer Sale',
+            sale_type='customer',
+            quantity=1,
+            total_amount=Decimal('3000.00'),
+            milestone_structure=self.structure,
+            project=self.project2,
+            project_start_date=date(2024, 1, 20)
+        )
+        self.url = reverse('cashflow')
+
+    def test_monthly_cash_flow(self):
+        """Test that payments are bucketed by month and split by sale type."""
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['granularity'], 'month')
+        self.assertEqual(response.data['buckets'], [
+            {
+                'period': '2024-01-01', 'inflow': 1200.0, 'outflow': 400.0,
+                'net': 800.0, 'cumulative_net': 800.0, 'payments': 2,
+            },
+            {
+                'period': '2024-03-01', 'inflow': 1800.0, 'outflow': 600.0,
+                'net': 1200.0, 'cumulative_net': 2000.0, 'payments': 2,
+            },
+        ])
+
+    def test_cash_flow_granularity(self):
+        """Test day and quarter buckets."""
+        response = self.client.get(self.url, {'granularity': 'day'})
+        self.assertEqual(
+            [bucket['period'] for bucket in response.data['buckets']],
+            ['2024-01-10', '2024-01-20', '2024-03-10', '2024-03-20']
+        )
+
+        response = self.client.get(self.url, {'granularity': 'quarter'})
+        self.assertEqual(len(response.data['buckets']), 1)
+        self.assertEqual(response.data['buckets'][0]['period'], '2024-01-01')
+        self.assertEqual(response.data['buckets'][0]['net'], 2000.0)
+
+    def test_cash_flow_filters(self):
+        """Test filtering by project and payment due date range."""
+        response = self.client.get(self.url, {'project': self.project1.id})
+        self.assertEqual(
+            [(b['inflow'], b['outflow']) for b in response.data['buckets']],
+            [(0.0, 400.0), (0.0, 600.0)]
+        )
+
+        response = self.client.get(self.url, {'start': '2024-02-01', 'end': '2024-03-15'})
+        self.assertEqual(len(response.data['buckets']), 1)
+        self.assertEqual(response.data['buckets'][0]['outflow'], 600.0)
+        self.assertEqual(response.data['buckets'][0]['inflow'], 0.0)
+
+    def test_cash_flow_invalid_parameters(self):
+        """Test that invalid query parameters are rejected."""
+        response = self.client.get(self.url, {'granularity': 'year'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(self.url, {'start': '2024-03-01', 'end': '2024-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProjectTimelineQueryTest(APITestCase):
+    """Test that the timeline endpoints use a constant number of queries."""
+
+    def setUp(self):
+        """Set up projects with sales spread over two structures."""
+        self.structures = []
+        for s in range(2):
+            structure = PaymentMilestoneStructure.objects.create(name=f'Structure {s}')
+            for i in range(3):
+                PaymentMilestone.objects.create(
+                    structure=structure,
+                    name=f'Milestone {i}',
+                    payment_percentage=Decimal('25.00'),
+                    net_terms_days=10 * i,
+                    days_after_previous=30 * i,
+                    order=i
+                )
+            self.structures.append(structure)
+        self.projects = [
+            Project.objects.create(name=f'Project {p}', start_date=date(2024, 1, 1))
+            for p in range(2)
+        ]
+        self.add_sales(2)
+
+    def add_sales(self, count):
+        for project in self.projects:
+            for i in range(count):
+                EquipmentSale.objects.create(
+                    name=f'{project.name} Sale {i}',
+                    quantity=1,
+                    total_amount=Decimal('1000.00') * (i + 1),
+                    milestone_structure=self.structures[i % 2],
+                    project=project,
+                    project_start_date=date(2024, 1, 1)
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_timelines_query_budget(self):
+        """Test that /timelines/ issues the same queries for 4 or 40 sales."""
+        url = reverse('project-timelines')
+        small, _ = self.count_queries(url)
+
+        self.add_sales(20)
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        # Validators, project ids, projects and three prefetches
+        self.assertLessEqual(large, 6)
+        self.assertEqual(len(response.data[0]['project_timeline']), 22 * 3)
+
+    def test_timeline_query_budget(self):
+        """Test that a single project timeline does not grow with its sales."""
+        url = reverse('project-timeline', kwargs={'pk': self.projects[0].pk})
+        small, _ = self.count_queries(url)
+
+        self.add_sales(20)
+        large, response = self.count_queries(url)
+
+        self.assertEqual(small, large)
+        self.assertEqual(response.data['equipment_sales_count'], 22)
+        self.assertEqual(len(response.data['equipment_sales']), 22)
+
+    def test_list_query_budget(self):
+        """Test that the project list does not grow with the number of sales."""
+        url = reverse('project-list')
+        small, _ = self.count_queries(url)
+
+        self.add_sales(20)
+        large, _ = self.count_queries(url)
+
+        self.assertEqual(small, large)
+
+    def test_prefetched_timeline_matches_ledger_query(self):
+        """Test that the prefetched timeline equals the unprefetched one."""
+        self.add_sales(3)
+        project = Project.objects.with_timeline().get(pk=self.projects[1].pk)
+
+        with self.assertNumQueries(0):
+            prefetched = project.get_project_timeline()
+
+        self.assertEqual(prefetched, Project.objects.get(pk=project.pk).get_project_timeline())
+
+    def test_paginated_list_query_budget(self):
+        """Test that a page of projects is fetched with a keyset query."""
+        url = reverse('project-list')
+        first = self.client.get(url, {'page_size': 1})
+        self.assertEqual(first.data['results'][0]['id'], self.projects[1].id)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first.data['next'])
+
+        self.assertEqual(second.data['results'][0]['id'], self.projects[0].id)
+        self.assertIsNone(second.data['next'])
+        self.assertFalse(any('OFFSET' in q['sql'] for q in queries.captured_queries))
+
+
+class ProjectSummaryAPITest(APITestCase):
+    """Test the ?view=summary mode of the project endpoints."""
+
+    def setUp(self):
+        """Set up two projects with two sales each."""
+        self.structure = PaymentMilestoneStructure.objects.create(name='Summary Structure')
+        PaymentMilestone.objects.create(
+            structure=self.structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+        self.projects = [
+            Project.objects.create(name=f'Project {p}', start_date=date(2024, 1, 1))
+            for p in range(2)
+        ]
+        self.add_sales(2)
+
+    def add_sales(self, count):
+        for project in self.projects:
+            for i in range(count):
+                EquipmentSale.objects.create(
+                    name=f'{project.name} Sale {i}',
+                    quantity=1,
+                    total_amount=Decimal('1000.00') * (i + 1),
+                    milestone_structure=self.structure,
+                    project=project,
+                    project_start_date=date(2024, 1, 1)
+                )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_summary_list(self):
+        """Test that summaries carry DB-side totals and no nested sales."""
+        response = self.client.get(reverse('project-list'), {'view': 'summary'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        project = response.data[0]
+        self.assertNotIn('equipment_sales', project)
+        self.assertEqual(project['equipment_sales_count'], 2)
+        self.assertEqual(Decimal(project['total_value']), Decimal('3000.00'))
+
+    def test_summary_list_single_query(self):
+        """Test that the summary list is a single aggregate query."""
+        url = reverse('project-list') + '?view=summary'
+        self.add_sales(20)
+        Project.objects.create(name='Empty Project', start_date=date(2024, 1, 1))
+
+        queries, response = self.count_queries(url)
+
+        self.assertEqual(queries, 1)
+        empty = next(p for p in response.data if p['name'] == 'Empty Project')
+        self.assertEqual(empty['equipment_sales_count'], 0)
+        self.assertEqual(Decimal(empty['total_value']), Decimal('0'))
+
+    def test_summary_retrieve(self):
+        """Test that a single project can be retrieved as a summary."""
+        url = reverse('project-detail', kwargs={'pk': self.projects[0].pk})
+        response = self.client.get(url, {'view': 'summary'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('equipment_sales', response.data)
+        self.assertEqual(response.data['equipment_sales_count'], 2)
+
+    def test_annotations_match_properties(self):
+        """Test that with_totals() agrees with the unannotated properties."""
+        for project in Project.objects.with_totals():
+            plain = Project.objects.get(pk=project.pk)
+            self.assertEqual(project.total_value, plain.total_value)
+            self.assertEqual(project.equipment_sales_count, plain.equipment_sales_count)
+
+
+class ProjectTimelineConditionalGetTest(APITestCase):
+    """Test cases for ETag on the timeline endpoints."""
+
+    def setUp(self):
+        """Set up a project with two sales."""
+        structure = PaymentMilestoneStructure.objects.create(name='Conditional Structure')
+        PaymentMilestone.objects.create(
+            structure=structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+        self.project = Project.objects.create(name='Conditional Project', start_date=date(2024, 1, 1))
+        self.sales = [
+            EquipmentSale.objects.create(
+                name=f'Conditional Sale {i}',
+                quantity=1,
+                total_amount=Decimal('500.00'),
+                milestone_structure=structure,
+                project=self.project,
+                project_start_date=date(2024, 1, 1)
+            )
+            for i in range(2)
+        ]
+        self.url = reverse('project-timeline', kwargs={'pk': self.project.pk})
+
+    def test_timeline_not_modified(self):
+        """Test that a repeat timeline request is answered with one query."""
+        response = self.client.get(self.url)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_timelines_not_modified(self):
+        """Test conditional GET on the all-projects timelines."""
+        url = reverse('project-timelines')
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_sale_changes_invalidate_timeline(self):
+        """Test that editing or removing a sale changes the timeline ETag."""
+        etag = self.client.get(self.url)['ETag']
+
+        self.sales[0].total_amount = Decimal('900.00')
+        self.sales[0].save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        etag = response['ETag']
+        self.sales[1].delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['equipment_sales']), 1)
+
+
+class PayloadCacheTest(APITestCase):
+    """Test caching and invalidation of timeline payloads."""
+
+    def setUp(self):
+        """Set up two projects and a sale in the first one."""
+        payload_cache.get_cache().clear()
+        self.structure = PaymentMilestoneStructure.objects.create(name='Cached Structure')
+        self.milestone = PaymentMilestone.objects.create(
+            structure=self.structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+        self.project1 = Project.objects.create(name='Cached Project 1', start_date=date(2024, 1, 1))
+        self.project2 = Project.objects.create(name='Cached Project 2', start_date=date(2024, 1, 1))
+        self.sale = EquipmentSale.objects.create(
+            name='Cached Sale',
+            quantity=1,
+            total_amount=Decimal('500.00'),
+            milestone_structure=self.structure,
+            project=self.project1,
+            project_start_date=date(2024, 1, 1)
+        )
+        self.url1 = reverse('project-timeline', kwargs={'pk': self.project1.pk})
+        self.url2 = reverse('project-timeline', kwargs={'pk': self.project2.pk})
+
+    def test_timeline_served_from_cache(self):
+        """Test that a cached timeline only costs the validator query."""
+        first = self.client.get(self.url1)
+
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url1)
+
+        self.assertEqual(second.data, first.data)
+        stats = self.client.get(reverse('payload-cache-stats')).data
+        self.assertEqual(stats['timeline']['hits'], 1)
+        self.assertEqual(stats['timeline']['misses'], 1)
+        self.assertEqual(stats['timeline']['hit_rate'], 0.5)
+
+    def test_timelines_reuse_project_payloads(self):
+        """Test that /timelines/ only serializes projects missing from the cache."""
+        self.client.get(self.url1)
+
+        response = self.client.get(reverse('project-timelines'))
+
+        self.assertEqual(len(response.data), 2)
+        stats = payload_cache.get_stats()['timeline']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_project_change_invalidates(self):
+        """Test that renaming a project drops its cached timeline."""
+        self.client.get(self.url1)
+
+        self.project1.name = 'Renamed Project'
+        self.project1.save()
+
+        self.assertEqual(self.client.get(self.url1).data['name'], 'Renamed Project')
+
+    def test_change_from_another_process_rebuilds(self):
+        """Test that a cached timeline is rebuilt after a change whose invalidation this process missed."""
+        self.client.get(self.url1)
+        self.client.get(reverse('project-timelines'))
+
+        # update() sends no signals, as for a change made by another worker
+        Project.objects.filter(pk=self.project1.pk).update(name='Renamed Elsewhere', updated_at=timezone.now())
+
+        self.assertEqual(self.client.get(self.url1).data['name'], 'Renamed Elsewhere')
+        timelines = self.client.get(reverse('project-timelines')).data
+        self.assertIn('Renamed Elsewhere', [project['name'] for project in timelines])
+
+    def test_moved_sale_invalidates_both_projects(self):
+        """Test that moving a sale refreshes the old and the new project."""
+        self.client.get(self.url1)
+        self.client.get(self.url2)
+
+        sale = EquipmentSale.objects.get(pk=self.sale.pk)
+        sale.project = self.project2
+        sale.save()
+
+        self.assertEqual(self.client.get(self.url1).data['equipment_sales'], [])
+        self.assertEqual(len(self.client.get(self.url2).data['equipment_sales']), 1)
+
+    def test_milestone_change_invalidates(self):
+        """Test that editing a milestone refreshes timelines using its structure."""
+        self.client.get(self.url1)
+
+        self.milestone.net_terms_days = 60
+        self.milestone.save()
+
+        timeline = self.client.get(self.url1).data['project_timeline']
+        self.assertEqual(timeline[0]['net_terms_days'], 60)
+
+
+class ProjectTimelineCSVExportTest(APITestCase):
+    """Test the per-project CSV export of payments."""
+
+    def setUp(self):
+        """Set up two projects with one sale each."""
+        structure = PaymentMilestoneStructure.objects.create(name='Export Structure')
+        PaymentMilestone.objects.create(
+            structure=structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+        self.projects = [
+            Project.objects.create(name=f'Export Project {p}', start_date=date(2024, 1, 1))
+            for p in range(2)
+        ]
+        for project in self.projects:
+            EquipmentSale.objects.create(
+                name=f'{project.name} Sale',
+                quantity=1,
+                total_amount=Decimal('1000.00'),
+                milestone_structure=structure,
+                project=project,
+                project_start_date=date(2024, 1, 1)
+            )
+
+    def test_project_timeline_csv(self):
+        """Test that only the project's payments are exported."""
+        project = self.projects[1]
+        response = self.client.get(f'/api/projects/{project.pk}/timeline.csv')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(f'project-{project.pk}-payment-schedule.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        lines = content.strip().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('Export Project 1 Sale', lines[1])
+
+    def test_missing_project_csv(self):
+        """Test that an unknown project returns 404."""
+        response = self.client.get('/api/projects/99999/timeline.csv')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProjectTimelineAsyncTest(APITestCase):
+    """Test cases for the async timeline endpoints."""
+
+    def setUp(self):
+        """Set up two projects with one sale each."""
+        payload_cache.get_cache().clear()
+        structure = PaymentMilestoneStructure.objects.create(name='Async Structure')
+        PaymentMilestone.objects.create(
+            structure=structure,
+            name='Full Payment',
+            payment_percentage=Decimal('100.00'),
+            net_terms_days=30,
+            days_after_previous=0,
+            order=0
+        )
+        self.projects = [
+            Project.objects.create(name=f'Async Project {p}', start_date=date(2024, 1, 1))
+            for p in range(2)
+        ]
+        for project in self.projects:
+            EquipmentSale.objects.create(
+                name=f'{project.name} Sale',
+                quantity=1,
+                total_amount=Decimal('1000.00'),
+                milestone_structure=structure,
+                project=project,
+                project_start_date=date(2024, 1, 1)
+            )
+
+    def test_views_are_async(self):
+        """Test that the timeline URLs resolve to async views."""
+        for url in [reverse('project-timelines'), reverse('project-timeline', kwargs={'pk': 1})]:
+            self.assertTrue(resolve(url).func.view_class.view_is_async)
+
+    async def test_concurrent_timelines(self):
+        """Test that concurrent requests get the same payload as the DRF action."""
+        url = reverse('project-timelines')
+        responses = await asyncio.gather(*[self.async_client.get(url) for _ in range(5)])
+
+        for response in responses:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                [project['name'] for project in response.json()],
+                ['Async Project 1', 'Async Project 0']
+            )
+        self.assertEqual(len({response['ETag'] for response in responses}), 1)
+
+    async def test_shares_payload_cache_with_drf_action(self):
+        """Test that the async view serves the payloads cached by the DRF action's builder."""
+        payloads = await sync_to_async(get_timelines_payload)()
+        await sync_to_async(payload_cache.reset_stats)()
+
+        response = await self.async_client.get(reverse('project-timelines'))
+        self.assertEqual(response.json(), payloads)
+        stats = await sync_to_async(payload_cache.get_stats)()
+        self.assertEqual(stats['timeline']['hits'], 2)
+        self.assertEqual(stats['timeline']['misses'], 0)
+
+    async def test_timeline_not_modified(self):
+        """Test conditional GET and 404s on the async timeline."""
+        url = reverse('project-timeline', kwargs={'pk': self.projects[0].pk})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()['equipment_sales_count'], 1)
+
+        cached = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        for pk in ['99999', 'abc']:
+            missing = await self.async_client.get(f'/api/projects/{pk}/timeline/')
+            self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_csv_uses_drf_action(self):
+        """Test that ?format=csv is still served by the DRF action."""
+        url = reverse('project-timeline', kwargs={'pk': self.projects[1].pk})
+        response = await self.async_client.get(url, {'format': 'csv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
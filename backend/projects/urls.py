@@ -1,10 +1,21 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProjectViewSet
+from .views import (
+    ProjectViewSet,
+    ProjectTimelineView,
+    ProjectTimelinesView,
+    CashFlowView,
+    PayloadCacheStatsView
+)
 
 router = DefaultRouter()
 router.register(r'projects', ProjectViewSet)
 
 urlpatterns = [
+    path('cashflow/', CashFlowView.as_view(), name='cashflow'),
+    path('cache/stats/', PayloadCacheStatsView.as_view(), name='payload-cache-stats'),
+    # Async JSON reads; take precedence over the router's routes for the same paths
+    path('projects/timelines/', ProjectTimelinesView.as_view(), name='project-timelines'),
+    path('projects/<str:pk>/timeline/', ProjectTimelineView.as_view(), name='project-timeline'),
     path('', include(router.urls)),
 ]
@@ -1,39 +1,201 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+from equipment.models import PaymentScheduleEntry
+from equipment.exports import schedule_csv_response
+from equipment.ledger import get_cash_flow
+from milestone_backend.conditional import conditional_get
+from milestone_backend.async_views import AsyncPayloadView, get_action_view
+from milestone_backend.payload_cache import TIMELINE, get_payload, get_payloads, get_stats, get_version, get_versions
+from milestone_backend.renderers import CSVRenderer
 from .models import Project
-from .serializers import ProjectSerializer, ProjectTimelineSerializer
+from .serializers import (
+    ProjectSerializer,
+    ProjectSummarySerializer,
+    ProjectTimelineSerializer,
+    CashFlowQuerySerializer
+)
 
 
 class ProjectViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Projects.
     Provides CRUD operations for projects and timeline data.
+    Pass ?view=summary to list or retrieve projects without nested sales.
     """
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
+    # Keyset pagination order; the last field must be unique
+    ordering = ('-created_at', '-id')
+    
+    def get_queryset(self):
+        """
+        Attach the prefetch plan matching the serializer in use, so the
+        number of queries does not grow with the number of sales.
+        """
+        queryset = super().get_queryset()
+        if self.action in ['timeline', 'timelines']:
+            return queryset.with_timeline()
+        if self.is_summary():
+            return queryset.with_totals()
+        if self.action in ['list', 'retrieve']:
+            return queryset.with_sales()
+        return queryset
+    
+    def is_summary(self):
+        """Check for ?view=summary on list and retrieve."""
+        return (
+            self.action in ['list', 'retrieve']
+            and self.request.query_params.get('view') == 'summary'
+        )
     
     def get_serializer_class(self):
         if self.action == 'timeline':
             return ProjectTimelineSerializer
+        if self.is_summary():
+            return ProjectSummarySerializer
         return ProjectSerializer
     
-    @action(detail=True, methods=['get'])
-    def timeline(self, request, pk=None):
+    @action(
+        detail=True,
+        methods=['get'],
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer]
+    )
+    def timeline(self, request, pk=None, format=None):
         """
         Get the timeline for a specific project.
         Returns data formatted for gantt chart visualization.
+        timeline.csv streams the project's payments as CSV instead.
+        Supports conditional GET via ETag; the payload
+        itself is served from the payload cache.
         """
-        project = self.get_object()
-        serializer = self.get_serializer(project)
-        return Response(serializer.data)
+        try:
+            validators = Project.objects.filter(pk=pk).timeline_validators()
+        except (TypeError, ValueError):
+            # Malformed pk, answered with a 404 by get_timeline_response()
+            validators = None
+        return conditional_get(request, validators, lambda: self.get_timeline_response(validators))
+    
+    def get_timeline_response(self, validators):
+        try:
+            pk = int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+        if self.request.accepted_renderer.format == 'csv':
+            if not Project.objects.filter(pk=pk).exists():
+                raise Http404
+            return schedule_csv_response(
+                PaymentScheduleEntry.objects.filter(sale__project_id=pk),
+                filename=f'project-{pk}-payment-schedule.csv'
+            )
+        payload = get_timeline_payload(pk, validators)
+        if payload is None:
+            raise Http404
+        return Response(payload)
     
     @action(detail=False, methods=['get'])
     def timelines(self, request):
         """
         Get timelines for all projects.
         Returns data formatted for gantt chart visualization.
+        Supports conditional GET via ETag; per-project
+        payloads are served from the payload cache.
         """
-        projects = self.get_queryset()
-        serializer = ProjectTimelineSerializer(projects, many=True)
-        return Response(serializer.data)
+        return conditional_get(
+            request,
+            Project.objects.timeline_validators(),
+            self.get_timelines_response
+        )
+    
+    def get_timelines_response(self):
+        return Response(get_timelines_payload())
+
+
+def build_timeline_payloads(project_ids):
+    """Serialize the timelines of the given projects, keyed by project id."""
+    projects = Project.objects.with_timeline().filter(pk__in=project_ids)
+    serializer = ProjectTimelineSerializer(projects, many=True)
+    return {item['id']: item for item in serializer.data}
+
+
+def get_timeline_payload(pk, validators):
+    """
+    Timeline payload of one project from the payload cache, or None.
+    validators are the project's timeline_validators(), None if it does not exist.
+    """
+    if validators is None:
+        return None
+    return get_payload(TIMELINE, pk, get_version(validators), build_timeline_payloads)
+
+
+def get_timelines_payload():
+    """Timeline payloads of all projects, from the payload cache."""
+    versions = dict(get_versions(Project.objects.timeline_validators_by_project()))
+    payloads = get_payloads(TIMELINE, versions, build_timeline_payloads)
+    return [payloads[pk] for pk in versions if pk in payloads]
+
+
+class ProjectTimelineView(AsyncPayloadView):
+    """Async JSON version of ProjectViewSet.timeline."""
+    sync_view = staticmethod(get_action_view(ProjectViewSet, 'timeline', 'project'))
+    
+    async def get_validators(self, pk):
+        return await Project.objects.filter(pk=pk).atimeline_validators()
+    
+    async def get_payload(self, validators, pk):
+        return await sync_to_async(get_timeline_payload)(int(pk), validators)
+
+
+class ProjectTimelinesView(AsyncPayloadView):
+    """Async JSON version of ProjectViewSet.timelines."""
+    sync_view = staticmethod(get_action_view(ProjectViewSet, 'timelines', 'project'))
+    
+    async def get_validators(self):
+        return await Project.objects.atimeline_validators()
+    
+    async def get_payload(self, validators):
+        return await sync_to_async(get_timelines_payload)()
+
+
+class CashFlowView(APIView):
+    """
+    Portfolio cash flow bucketed by payment due date.
+    Query parameters: granularity (day, week, month or quarter; default
+    month), start and end (YYYY-MM-DD, inclusive) and project (repeatable).
+    Customer sales count as inflows and vendor sales as outflows.
+    """
+    
+    def get(self, request):
+        params = CashFlowQuerySerializer(data={
+            **request.query_params.dict(),
+            'project': request.query_params.getlist('project'),
+        })
+        if not params.is_valid():
+            return Response(params.errors, status=status.HTTP_400_BAD_REQUEST)
+        filters = params.validated_data
+        
+        entries = PaymentScheduleEntry.objects.all()
+        if filters.get('project'):
+            entries = entries.filter(sale__project_id__in=filters['project'])
+        if 'start' in filters:
+            entries = entries.filter(payment_due_date__gte=filters['start'])
+        if 'end' in filters:
+            entries = entries.filter(payment_due_date__lte=filters['end'])
+        
+        return Response({
+            'granularity': filters['granularity'],
+            'buckets': get_cash_flow(entries, filters['granularity']),
+        })
+
+
+class PayloadCacheStatsView(APIView):
+    """
+    Hit and miss counters of the schedule and timeline payload cache.
+    """
+    
+    def get(self, request):
+        return Response(get_stats())
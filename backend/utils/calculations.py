@@ -5,15 +5,103 @@ This module contains mathematical and financial calculation functions
 that can be used across the application.
 """
 
+from dataclasses import dataclass
 from decimal import Decimal
 from datetime import timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .helpers import get_business_calendar
+
+
+@dataclass(frozen=True, eq=False)
+class CompiledMilestoneStructure:
+    """
+    Precomputed, read-only view of a milestone structure.
+    
+    Holds the per-milestone vectors every schedule calculation needs, with the
+    cumulative day offsets already derived, so a structure shared by many
+    sales is only walked once. With a business_calendar, the day offsets
+    and net terms count business days of that numpy.busdaycalendar.
+    """
+    ids: Tuple[Optional[int], ...]
+    names: Tuple[str, ...]
+    payment_percentages: Tuple[Decimal, ...]
+    net_terms_days: np.ndarray
+    days_after_previous: np.ndarray
+    start_days: np.ndarray
+    end_days: np.ndarray
+    updated_at: Any = None
+    business_calendar: Optional[np.busdaycalendar] = None
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def _milestone_value(milestone: Any, key: str, default: Any = None) -> Any:
+    """Read a field from a milestone given as a dictionary or an object."""
+    if isinstance(milestone, dict):
+        return milestone.get(key, default)
+    return getattr(milestone, key, default)
+
+
+def compile_milestone_structure(
+    milestones: Sequence[Any],
+    updated_at: Any = None,
+    business_calendar: Optional[np.busdaycalendar] = None
+) -> CompiledMilestoneStructure:
+    """
+    Compile an ordered list of milestones into a CompiledMilestoneStructure.
+    
+    Args:
+        milestones: Milestone dictionaries or PaymentMilestone-like objects,
+                   already sorted by order
+        updated_at: Optional timestamp of the source structure, used by
+                   callers that cache the result
+        business_calendar: numpy.busdaycalendar to count days in business
+                   days (see utils.helpers.get_business_calendar), or None
+                   for calendar days
+    
+    Returns:
+        CompiledMilestoneStructure with cumulative start/end day offsets
+    """
+    days = np.array(
+        [_milestone_value(m, 'days_after_previous', 0) for m in milestones],
+        dtype=np.int64,
+    )
+    net_terms = np.array(
+        [_milestone_value(m, 'net_terms_days', 0) for m in milestones],
+        dtype=np.int64,
+    )
+    end_days = np.cumsum(days)
+    start_days = end_days - days
+    
+    # Compiled structures are shared between requests, so keep them immutable
+    for array in (days, net_terms, start_days, end_days):
+        array.setflags(write=False)
+    
+    return CompiledMilestoneStructure(
+        ids=tuple(_milestone_value(m, 'id') for m in milestones),
+        names=tuple(_milestone_value(m, 'name', '') for m in milestones),
+        payment_percentages=tuple(
+            Decimal(str(_milestone_value(m, 'payment_percentage', 0))) for m in milestones
+        ),
+        net_terms_days=net_terms,
+        days_after_previous=days,
+        start_days=start_days,
+        end_days=end_days,
+        updated_at=updated_at,
+        business_calendar=business_calendar,
+    )
 
 
 def calculate_payment_schedule(
     total_amount: Decimal,
-    milestones: List[Dict[str, Any]],
-    project_start_date: str
+    milestones: Union[List[Dict[str, Any]], CompiledMilestoneStructure],
+    project_start_date: str,
+    business_days: bool = False,
+    calendar: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Calculate payment schedule based on milestone structure.
@@ -21,46 +109,207 @@ def calculate_payment_schedule(
     Args:
         total_amount: Total amount for the project
         milestones: List of milestone dictionaries with payment_percentage, 
-                   days_after_previous, net_terms_days
+                   days_after_previous, net_terms_days, or an already
+                   compiled structure
         project_start_date: Start date in ISO format (YYYY-MM-DD)
+        business_days: Count days after previous and net terms in business
+                      days (ignored for a compiled structure, which carries
+                      its own calendar)
+        calendar: Name of a registered holiday calendar (business_days only)
     
     Returns:
         List of dictionaries with calculated payment information
     """
     from datetime import datetime
     
-    schedule = []
-    cumulative_days = 0
+    if not isinstance(milestones, CompiledMilestoneStructure):
+        milestones = compile_milestone_structure(
+            milestones,
+            business_calendar=get_business_calendar(calendar) if business_days else None
+        )
+    
     start_date = datetime.strptime(project_start_date, '%Y-%m-%d').date()
+    return [
+        {key: value for key, value in row.items() if key != 'id'}
+        for row in iter_payment_schedule(total_amount, milestones, start_date)
+    ]
+
+
+def iter_payment_schedule(
+    total_amount: Decimal,
+    compiled: CompiledMilestoneStructure,
+    start_date: Any
+):
+    """
+    Yield the payment schedule rows of one sale from a compiled structure.
     
-    for milestone in milestones:
-        # Calculate start and end dates
-        start_days = cumulative_days
-        end_days = cumulative_days + milestone.get('days_after_previous', 0)
-        
-        # Calculate payment amounts
-        payment_percentage = Decimal(str(milestone.get('payment_percentage', 0)))
+    start_days and end_days are always calendar days from the start date to
+    the milestone's start and due date (what the Gantt chart plots), also
+    when the structure counts business days.
+    
+    Args:
+        total_amount: Total amount for the sale
+        compiled: Compiled milestone structure
+        start_date: Project start date (date object)
+    
+    Yields:
+        Dictionaries with calculated payment information
+    """
+    total_amount = Decimal(str(total_amount))
+    if compiled.business_calendar is None:
+        start_days = compiled.start_days.tolist()
+        end_days = compiled.end_days.tolist()
+        due_dates = [start_date + timedelta(days=days) for days in end_days]
+        payment_due_dates = [
+            due_date + timedelta(days=days)
+            for due_date, days in zip(due_dates, compiled.net_terms_days.tolist())
+        ]
+    else:
+        due_dates, payment_due_dates = calculate_due_dates(
+            [start_date], compiled.end_days, compiled.net_terms_days, compiled.business_calendar
+        )
+        start_days, end_days = get_calendar_offsets([start_date], due_dates)
+        start_days = start_days[0].tolist()
+        end_days = end_days[0].tolist()
+        due_dates = due_dates[0].tolist()
+        payment_due_dates = payment_due_dates[0].tolist()
+    
+    for col, (milestone_id, name, payment_percentage, net_terms_days) in enumerate(zip(
+        compiled.ids,
+        compiled.names,
+        compiled.payment_percentages,
+        compiled.net_terms_days.tolist(),
+    )):
         payment_amount = (total_amount * payment_percentage) / 100
         
-        # Calculate dates
-        due_date = start_date + timedelta(days=end_days)
-        net_terms_days = milestone.get('net_terms_days', 0)
-        payment_due_date = due_date + timedelta(days=net_terms_days)
-        
-        schedule.append({
-            'name': milestone.get('name', ''),
-            'start_days': start_days,
-            'end_days': end_days,
+        yield {
+            'id': milestone_id,
+            'name': name,
+            'start_days': start_days[col],
+            'end_days': end_days[col],
             'payment_percentage': float(payment_percentage),
             'payment_amount': float(payment_amount),
-            'due_date': due_date.isoformat(),
-            'payment_due_date': payment_due_date.isoformat(),
+            'due_date': due_dates[col].isoformat(),
+            'payment_due_date': payment_due_dates[col].isoformat(),
             'net_terms_days': net_terms_days,
-        })
-        
-        cumulative_days = end_days
+        }
+
+
+def calculate_due_dates(
+    start_dates: Sequence[Any],
+    end_days: np.ndarray,
+    net_terms_days: np.ndarray,
+    business_calendar: Optional[np.busdaycalendar] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calculate milestone due dates and payment due dates for many sales.
+    
+    In business days, a start date that is not a business day is moved to
+    the next one first; both offsets are then counted with
+    numpy.busday_offset, which is constant time per date.
+    
+    Args:
+        start_dates: Project start date of each sale (date or YYYY-MM-DD)
+        end_days: Cumulative days from the start to each milestone
+        net_terms_days: Net terms of each milestone
+        business_calendar: numpy.busdaycalendar, or None for calendar days
+    
+    Returns:
+        Tuple of (due_dates, payment_due_dates), datetime64[D] arrays of
+        shape (sales, milestones)
+    """
+    starts = np.asarray(start_dates, dtype='datetime64[D]')[:, np.newaxis]
+    if business_calendar is None:
+        due_dates = starts + end_days
+        return due_dates, due_dates + net_terms_days
+    due_dates = np.busday_offset(starts, end_days, roll='forward', busdaycal=business_calendar)
+    payment_due_dates = np.busday_offset(due_dates, net_terms_days, busdaycal=business_calendar)
+    return due_dates, payment_due_dates
+
+
+def get_calendar_offsets(
+    start_dates: Sequence[Any],
+    due_dates: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Calendar days from each sale's start date to each milestone's start
+    (the previous milestone's due date) and due date.
+    
+    Returns:
+        Tuple of (start_days, end_days), int64 arrays of shape (sales, milestones)
+    """
+    starts = np.asarray(start_dates, dtype='datetime64[D]')[:, np.newaxis]
+    end_days = (due_dates - starts).astype(np.int64)
+    start_days = np.zeros_like(end_days)
+    start_days[:, 1:] = end_days[:, :-1]
+    return start_days, end_days
+
+
+def _to_hundredths(values: Sequence[Any]) -> np.ndarray:
+    """
+    Convert amounts or percentages with two decimal places to exact integers.
+
+    Working in hundredths keeps the batch engine exact: the product of an
+    amount in cents and a percentage in hundredths is an integer, so the
+    only rounding happens once, in the final conversion to float.
+    """
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iuf':
+        return np.rint(values * 100).astype(np.int64)
+    return np.array(
+        [int(Decimal(str(value)) * 100) for value in values],
+        dtype=np.int64,
+    )
+
+
+def calculate_payment_schedules_batch(
+    total_amounts: Sequence[Any],
+    start_dates: Sequence[Any],
+    days_after_previous: Sequence[int],
+    payment_percentages: Sequence[Any],
+    net_terms_days: Sequence[int],
+    business_calendar: Optional[np.busdaycalendar] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate payment schedules for many sales sharing one milestone structure.
+    
+    Produces the same figures as calculate_payment_schedule, but for every
+    sale at once using NumPy cumulative sums and datetime64 arithmetic.
+    
+    Args:
+        total_amounts: Total amount of each sale (Decimal, float or str)
+        start_dates: Project start date of each sale (date or YYYY-MM-DD)
+        days_after_previous: Days after previous milestone, in milestone order
+        payment_percentages: Payment percentage of each milestone
+        net_terms_days: Net terms of each milestone
+        business_calendar: numpy.busdaycalendar to count the days in
+                          business days, or None for calendar days
+    
+    Returns:
+        Dictionary of arrays of shape (sales, milestones): start_days and
+        end_days (calendar days from the start date, also with a
+        business_calendar), due_dates, payment_due_dates (datetime64[D]),
+        payment_amounts (float64) and payment_amount_units (exact amounts
+        in millionths, int64).
+    """
+    days = np.asarray(days_after_previous, dtype=np.int64)
+    net_terms = np.asarray(net_terms_days, dtype=np.int64)
+    
+    due_dates, payment_due_dates = calculate_due_dates(start_dates, np.cumsum(days), net_terms, business_calendar)
+    start_days, end_days = get_calendar_offsets(start_dates, due_dates)
+    
+    # cents * hundredths-of-a-percent is exact; scale back down in one step
+    amount_cents = _to_hundredths(total_amounts)
+    percentage_hundredths = _to_hundredths(payment_percentages)
+    payment_amount_units = np.outer(amount_cents, percentage_hundredths)
     
-    return schedule
+    return {
+        'start_days': start_days,
+        'end_days': end_days,
+        'due_dates': due_dates,
+        'payment_due_dates': payment_due_dates,
+        'payment_amounts': payment_amount_units / 1_000_000,
+        'payment_amount_units': payment_amount_units,
+    }
 
 
 def calculate_unit_price(total_amount: Decimal, quantity: int) -> Decimal:
@@ -6,9 +6,19 @@ across different parts of the application.
 """
 
 from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional, Union
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Iterable, Optional, Union
 import json
 
+import numpy as np
+
+
+# Business days are Monday to Friday unless a calendar says otherwise
+DEFAULT_WEEKMASK = '1111100'
+
+# Registered holiday calendars: name -> (loader, weekmask)
+_holiday_calendars: Dict[str, tuple] = {}
+
 
 def get_current_date_string() -> str:
     """
@@ -49,30 +59,34 @@ def add_days_to_date(date_string: str, days: int) -> str:
         raise ValueError(f"Invalid date format: {date_string}. Use YYYY-MM-DD")
 
 
-def get_date_range(start_date: str, end_date: str) -> List[str]:
+def get_date_range(
+    start_date: str,
+    end_date: str,
+    business_days: bool = False,
+    calendar: Optional[str] = None
+) -> List[str]:
     """
     Get list of dates between start and end date (inclusive).
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        business_days: Only include business days
+        calendar: Name of a registered holiday calendar (business_days only)
     
     Returns:
         List of date strings in ISO format
     """
     try:
-        start = datetime.strptime(start_date, '%Y-%m-%d').date()
-        end = datetime.strptime(end_date, '%Y-%m-%d').date()
-        
-        dates = []
-        current = start
-        while current <= end:
-            dates.append(current.isoformat())
-            current += timedelta(days=1)
-        
-        return dates
+        start = np.datetime64(datetime.strptime(start_date, '%Y-%m-%d').date(), 'D')
+        end = np.datetime64(datetime.strptime(end_date, '%Y-%m-%d').date(), 'D')
     except ValueError:
         raise ValueError("Invalid date format. Use YYYY-MM-DD")
+    
+    dates = np.arange(start, end + 1, dtype='datetime64[D]')
+    if business_days:
+        dates = dates[np.is_busday(dates, busdaycal=get_business_calendar(calendar))]
+    return np.datetime_as_string(dates).tolist()
 
 
 def safe_json_loads(json_string: str, default: Any = None) -> Any:
@@ -225,13 +239,110 @@ def is_weekend(date_string: str) -> bool:
         return False
 
 
-def get_business_days_between(start_date: str, end_date: str) -> int:
+def register_holiday_calendar(
+    name: str,
+    loader: Callable[[], Iterable[Any]],
+    weekmask: str = DEFAULT_WEEKMASK
+) -> None:
     """
-    Calculate number of business days between two dates.
+    Register a holiday calendar for the business day functions.
+    
+    The loader is called once, on first use of the calendar, and the result
+    is cached; registering a name again replaces the calendar.
+    
+    Args:
+        name: Calendar name, e.g. stored on a milestone structure
+        loader: Callable returning the holidays as dates or YYYY-MM-DD strings
+        weekmask: Working days from Monday to Sunday, e.g. '1111100'
+    """
+    _holiday_calendars[name] = (loader, weekmask)
+    get_business_calendar.cache_clear()
+
+
+def get_holiday_calendar_names() -> List[str]:
+    """
+    Get the names of the registered holiday calendars.
+    
+    Returns:
+        Sorted list of calendar names
+    """
+    return sorted(_holiday_calendars)
+
+
+@lru_cache(maxsize=None)
+def get_business_calendar(name: Optional[str] = None) -> np.busdaycalendar:
+    """
+    Get a NumPy business day calendar, loading its holidays on first use.
+    
+    Args:
+        name: Registered holiday calendar name; None or '' for weekends only
+    
+    Returns:
+        numpy.busdaycalendar for busday_count / busday_offset / is_busday
+    """
+    if not name:
+        return np.busdaycalendar(weekmask=DEFAULT_WEEKMASK)
+    if name not in _holiday_calendars:
+        raise ValueError(f"Unknown holiday calendar: {name}")
+    loader, weekmask = _holiday_calendars[name]
+    holidays = np.array([str(holiday) for holiday in loader()], dtype='datetime64[D]')
+    return np.busdaycalendar(weekmask=weekmask, holidays=holidays)
+
+
+def is_business_day(date_string: str, calendar: Optional[str] = None) -> bool:
+    """
+    Check if a date is a business day.
+    
+    Args:
+        date_string: Date in ISO format (YYYY-MM-DD)
+        calendar: Name of a registered holiday calendar
+    
+    Returns:
+        True if date is a business day, False otherwise
+    """
+    try:
+        date_obj = datetime.strptime(date_string, '%Y-%m-%d').date()
+    except ValueError:
+        return False
+    return bool(np.is_busday(date_obj, busdaycal=get_business_calendar(calendar)))
+
+
+def add_business_days(date_string: str, days: int, calendar: Optional[str] = None) -> str:
+    """
+    Add business days to a date string.
+    
+    A date that is not a business day is first moved to the next business
+    day (the previous one when days is negative).
+    
+    Args:
+        date_string: Date in ISO format (YYYY-MM-DD)
+        days: Number of business days to add (can be negative)
+        calendar: Name of a registered holiday calendar
+    
+    Returns:
+        New date in ISO format (YYYY-MM-DD)
+    """
+    try:
+        original_date = datetime.strptime(date_string, '%Y-%m-%d').date()
+    except ValueError:
+        raise ValueError(f"Invalid date format: {date_string}. Use YYYY-MM-DD")
+    new_date = np.busday_offset(
+        original_date,
+        days,
+        roll='forward' if days >= 0 else 'backward',
+        busdaycal=get_business_calendar(calendar)
+    )
+    return str(new_date)
+
+
+def get_business_days_between(start_date: str, end_date: str, calendar: Optional[str] = None) -> int:
+    """
+    Calculate number of business days between two dates (inclusive).
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        calendar: Name of a registered holiday calendar
     
     Returns:
         Number of business days
@@ -239,15 +350,8 @@ def get_business_days_between(start_date: str, end_date: str) -> int:
     try:
         start = datetime.strptime(start_date, '%Y-%m-%d').date()
         end = datetime.strptime(end_date, '%Y-%m-%d').date()
-        
-        business_days = 0
-        current = start
-        
-        while current <= end:
-            if current.weekday() < 5:  # Monday = 0, Friday = 4
-                business_days += 1
-            current += timedelta(days=1)
-        
-        return business_days
     except ValueError:
         return 0
+    if end < start:
+        return 0
+    return int(np.busday_count(start, end + timedelta(days=1), busdaycal=get_business_calendar(calendar)))
@@ -0,0 +1,59 @@
+import unittest
+from datetime import date
+from .helpers import (
+    add_business_days, get_business_days_between, get_date_range, register_holiday_calendar
+)
+
+
+class BusinessDaysTest(unittest.TestCase):
+    """Test cases for business day helpers."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.loads = 0
+        
+        def load_holidays():
+            cls.loads += 1
+            return ['2024-01-01', date(2024, 1, 15)]
+        
+        register_holiday_calendar('test', load_holidays)
+    
+    def test_get_business_days_between(self):
+        """Test counting business days, inclusive of both dates."""
+        self.assertEqual(get_business_days_between('2024-01-01', '2024-01-31'), 23)
+        self.assertEqual(get_business_days_between('2024-01-06', '2024-01-07'), 0)
+        self.assertEqual(get_business_days_between('2024-01-31', '2024-01-01'), 0)
+        self.assertEqual(get_business_days_between('2000-01-01', '2099-12-31'), 26089)
+        self.assertEqual(get_business_days_between('2024-01-01', '2024-01-31', 'test'), 21)
+        self.assertEqual(get_business_days_between('invalid', '2024-01-31'), 0)
+    
+    def test_add_business_days(self):
+        """Test rolling dates by business days."""
+        self.assertEqual(add_business_days('2024-01-05', 1), '2024-01-08')
+        self.assertEqual(add_business_days('2024-01-06', 0), '2024-01-08')
+        self.assertEqual(add_business_days('2024-01-08', -1), '2024-01-05')
+        self.assertEqual(add_business_days('2023-12-29', 1, 'test'), '2024-01-02')
+    
+    def test_get_date_range(self):
+        """Test calendar and business day ranges."""
+        self.assertEqual(
+            get_date_range('2024-01-05', '2024-01-08'),
+            ['2024-01-05', '2024-01-06', '2024-01-07', '2024-01-08']
+        )
+        self.assertEqual(get_date_range('2024-01-05', '2024-01-08', business_days=True), ['2024-01-05', '2024-01-08'])
+        self.assertEqual(get_date_range('2024-01-08', '2024-01-05'), [])
+    
+    def test_holiday_calendar_loaded_once(self):
+        """Test that a calendar's holidays are loaded on first use only."""
+        get_business_days_between('2024-01-01', '2024-01-31', 'test')
+        add_business_days('2024-01-12', 1, 'test')
+        self.assertEqual(self.loads, 1)
+    
+    def test_unknown_calendar(self):
+        """Test that an unknown calendar name is rejected."""
+        with self.assertRaises(ValueError):
+            add_business_days('2024-01-01', 1, 'unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()